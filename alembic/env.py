@@ -10,7 +10,7 @@ from alembic import context
 from app.config import settings as fastapi_settings
 from app.db import engine
 from app.models.stores import Store, Product, Purchase, PurchaseItem, StoreReview, ProductReview # noqa
-from app.models.services import Service, AppointmentSlots, Appointment, ServiceReview  # noqa
+from app.models.services import Service, AppointmentSlots, Appointment, ServiceReview, SlotOccupancy  # noqa
 from app.models.addresses import Address, StoreAddressLink, ServiceAddressLink  # noqa
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,43 @@
+"""empty message
+
+Revision ID: 3f9a6c2e7b15
+Revises: 5b2e7c1d9a40
+Create Date: 2024-05-13 18:21:47.903114
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a6c2e7b15'
+down_revision = '5b2e7c1d9a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Range types and GiST indexes are PostgreSQL only, other databases keep filtering
+    # appointments by their start and end columns
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Needed to include the service_id (an equality column) in the GiST index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    # start and end are naive UTC timestamps (see TZDateTime), so tsrange is used. A tstzrange
+    # would need a timezone dependent cast, which generated columns don't allow
+    op.execute(
+        'ALTER TABLE appointments '
+        'ADD COLUMN period tsrange GENERATED ALWAYS AS (tsrange(start, "end", \'[)\')) STORED'
+    )
+    op.execute(
+        'CREATE INDEX ix_appointments_service_id_period ON appointments '
+        'USING gist (service_id, period)'
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_appointments_service_id_period')
+    op.execute('ALTER TABLE appointments DROP COLUMN IF EXISTS period')
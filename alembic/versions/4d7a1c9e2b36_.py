@@ -0,0 +1,31 @@
+"""empty message
+
+Revision ID: 4d7a1c9e2b36
+Revises: 9b1e5f3a7c24
+Create Date: 2024-05-28 10:12:41.508312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d7a1c9e2b36'
+down_revision = '9b1e5f3a7c24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Other dialects store enums as plain strings
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("ALTER TYPE paymentstatus ADD VALUE IF NOT EXISTS 'EXPIRED'")
+
+
+def downgrade():
+    # PostgreSQL can't drop enum values, expired payments are marked as cancelled instead
+    for table in ('appointments', 'purchases'):
+        op.execute(
+            sa.text(f"UPDATE {table} SET payment_status = 'CANCELLED' WHERE payment_status = 'EXPIRED'")
+        )
@@ -0,0 +1,43 @@
+"""empty message
+
+Revision ID: 7c4d2b9e1a58
+Revises: e2a94c7f6d13
+Create Date: 2024-05-24 16:38:05.271940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4d2b9e1a58'
+down_revision = 'e2a94c7f6d13'
+branch_labels = None
+depends_on = None
+
+SEARCHABLE_TABLES = ('stores', 'products', 'services')
+
+
+def upgrade():
+    # Trigram indexes serve the name searches (ILIKE '%name%') and their ranking, they are
+    # only created on PostgreSQL when pg_trgm is available, otherwise names keep being scanned
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        return
+    pg_trgm_available = connection.execute(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    ).first()
+    if pg_trgm_available is None:
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in SEARCHABLE_TABLES:
+        op.execute(f'CREATE INDEX ix_{table}_name_trgm ON {table} USING gin (name gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in SEARCHABLE_TABLES:
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_name_trgm')
@@ -0,0 +1,47 @@
+"""empty message
+
+Revision ID: 9b1e5f3a7c24
+Revises: 7c4d2b9e1a58
+Create Date: 2024-05-27 11:05:52.630418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1e5f3a7c24'
+down_revision = '7c4d2b9e1a58'
+branch_labels = None
+depends_on = None
+
+# In the order of their bits in the mask
+CATEGORIES = (
+    'ALIMENTOS',
+    'JUGUETES',
+    'HIGIENE_Y_CUIDADO',
+    'VIAJES',
+    'ACCESORIOS',
+    'SALUD_Y_BIENESTAR',
+    'CORREAS_Y_COLLARES',
+    'CUCHAS',
+    'CAMAS',
+    'PLATOS_Y_COMEDEROS',
+)
+
+
+def upgrade():
+    op.add_column(
+        'products', sa.Column('category_mask', sa.Integer(), nullable=False, server_default='0')
+    )
+    bits = ' '.join(f"WHEN '{category}' THEN {1 << i}" for i, category in enumerate(CATEGORIES))
+    op.execute(
+        'UPDATE products SET category_mask = COALESCE(('
+        f'SELECT SUM(CASE product_categories.category {bits} END) FROM product_categories '
+        'WHERE product_categories.store_id = products.store_id '
+        'AND product_categories.product_id = products.id), 0)'
+    )
+
+
+def downgrade():
+    op.drop_column('products', 'category_mask')
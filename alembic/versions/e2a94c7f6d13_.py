@@ -0,0 +1,44 @@
+"""empty message
+
+Revision ID: e2a94c7f6d13
+Revises: b5f0e3d8c461
+Create Date: 2024-05-20 09:12:44.105836
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a94c7f6d13'
+down_revision = 'b5f0e3d8c461'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The location is only added on PostgreSQL when PostGIS is available, otherwise nearby
+    # addresses keep being looked up by their geohash and coordinates
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        return
+    postgis_available = connection.execute(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'postgis'")
+    ).first()
+    if postgis_available is None:
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS postgis')
+    op.execute(
+        'ALTER TABLE addresses ADD COLUMN location geography(Point, 4326) GENERATED ALWAYS AS '
+        '(geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326))) STORED'
+    )
+    op.execute('CREATE INDEX ix_addresses_location ON addresses USING gist (location)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_addresses_location')
+    op.execute('ALTER TABLE addresses DROP COLUMN IF EXISTS location')
@@ -26,6 +26,25 @@ class Settings(BaseSettings):
     GOOGLE_MAPS_URL: str = "https://maps.googleapis.com/maps/api/geocode/json"
     GOOGLE_MAPS_API_KEY: str
 
+    # Cache of available appointments. A TTL of 0 disables it. If a URL is set, the cache is
+    # shared between replicas through Redis, otherwise each replica keeps its own LRU cache
+    AVAILABILITY_CACHE_TTL: int = Field(ge=0, default=30)
+    AVAILABILITY_CACHE_MAX_SIZE: int = Field(gt=0, default=4096)
+    AVAILABILITY_CACHE_URL: str | None = None
+
+    # Appointments and purchases whose payment wasn't started after this many minutes are
+    # expired, checking every EXPIRY_SWEEP_INTERVAL seconds (0 disables it)
+    PAYMENT_EXPIRATION_MINUTES: int = Field(gt=0, default=60)
+    EXPIRY_SWEEP_INTERVAL: int = Field(ge=0, default=300)
+    EXPIRY_SWEEP_BATCH_SIZE: int = Field(gt=0, default=100)
+
+    # Nearby lookups are narrowed down by an in-memory index of the locations of the stores and
+    # services, loaded at startup and updated by the writes of this replica. It is reloaded
+    # every SPATIAL_INDEX_REFRESH_INTERVAL seconds (0 disables it) to catch up with the writes
+    # of other replicas
+    SPATIAL_INDEX_ENABLED: bool = True
+    SPATIAL_INDEX_REFRESH_INTERVAL: int = Field(ge=0, default=60)
+
     # Images containers settings
     STORAGE_CONNECTION_STRING: str
     PRODUCTS_IMAGES_CONTAINER: str
@@ -59,6 +78,8 @@ class TestingSettings(Settings):
     PAYMENTS_API_KEY: str = "API_KEY"
     GOOGLE_MAPS_URL: str = "https://map_url"
     GOOGLE_MAPS_API_KEY: str = "API_KEY"
+    EXPIRY_SWEEP_INTERVAL: int = 0
+    SPATIAL_INDEX_ENABLED: bool = False
 
     __test__ = False  # Prevent pytest from discovering this class as a test class
 
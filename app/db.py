@@ -1,7 +1,7 @@
 from contextlib import asynccontextmanager
 import logging
 from asyncio import sleep
-from typing import AsyncGenerator, AsyncIterator
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable
 
 from fastapi import FastAPI, HTTPException, status
 from sqlalchemy.ext.asyncio import create_async_engine
@@ -25,12 +25,38 @@ SessionLocal = async_sessionmaker(
 )
 
 
+# Key of the session's info where the callbacks to run after committing are kept
+AFTER_COMMIT_CALLBACKS = "after_commit_callbacks"
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """
+    Schedules `callback` to run once the changes of the session are committed. It doesn't
+    run if they are rolled back. The owner of the session has to run `run_after_commit`.
+    """
+    db.info.setdefault(AFTER_COMMIT_CALLBACKS, []).append(callback)
+
+
+async def run_after_commit(db: AsyncSession) -> None:
+    """
+    Runs the callbacks scheduled with `after_commit`. Failures are logged, since the changes
+    are already committed.
+    """
+    callbacks: list[Callable[[], Awaitable[None]]] = db.info.pop(AFTER_COMMIT_CALLBACKS, [])
+    for callback in callbacks:
+        try:
+            await callback()
+        except Exception as e:
+            logging.error("Error running callback after committing", exc_info=e)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as db:
         try:
             yield db
         except Exception:
             logging.debug("Request returned an error: rolling back database changes")
+            db.info.pop(AFTER_COMMIT_CALLBACKS, None)
             await db.rollback()
             raise
 
@@ -38,10 +64,12 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await db.commit()
         except Exception as e:
             logging.error("Error committing database changes", exc_info=e)
+            db.info.pop(AFTER_COMMIT_CALLBACKS, None)
             await db.rollback()
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to persist database changes"
             ) from e
+        await run_after_commit(db)
 
 
 @asynccontextmanager
@@ -1,2 +1,6 @@
 class RecordNotFound(Exception):
     pass
+
+
+class InvalidCursor(Exception):
+    pass
@@ -1,6 +1,7 @@
+from contextlib import asynccontextmanager
 import logging
 import os
-from typing import Any
+from typing import Any, AsyncIterator
 
 from fastapi import FastAPI
 from fastapi.openapi.utils import get_openapi
@@ -12,6 +13,8 @@ from app.router import api_router
 from .log import setup_logs
 from .config import settings
 from .db import run_migrations
+from .services.expiry import run_expiry_sweeper
+from .services.spatial_index import run_spatial_indexes
 
 setup_logs()
 
@@ -42,9 +45,15 @@ def custom_openapi() -> dict[str, Any]:
     return app.openapi_schema
 
 
+@asynccontextmanager
+async def lifespan(new_app: FastAPI) -> AsyncIterator[None]:
+    async with run_migrations(new_app), run_spatial_indexes(), run_expiry_sweeper():
+        yield
+
+
 def create_app() -> FastAPI:
     logging.info("Starting...")
-    new_app = FastAPI(title=settings.app_name, lifespan=run_migrations, debug=settings.DEBUG)
+    new_app = FastAPI(title=settings.app_name, lifespan=lifespan, debug=settings.DEBUG)
     new_app.include_router(api_router)
     new_app.openapi = custom_openapi  # type: ignore[method-assign]
     add_exception_handlers(new_app)
@@ -2,9 +2,11 @@ from enum import StrEnum
 
 from pydantic import field_validator, ValidationInfo
 from pydantic_extra_types.country import CountryAlpha2
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Connection, Index, UniqueConstraint, event
+from sqlalchemy.orm import Mapper
 from sqlmodel import SQLModel, Field
 
+from .geohash import GEOHASH_PRECISION, encode
 from .util import Coordinates, Id, TimestampModel, UUIDModel
 from .constants.addresses import MISSING_APARTMENT_MSG
 
@@ -47,6 +49,22 @@ class AddressRead(AddressBase, Coordinates):
 class Address(AddressRead, UUIDModel, TimestampModel, table=True):
     __tablename__ = "addresses"
 
+    # Kept in sync with the coordinates when the address is saved (see set_address_geohash)
+    geohash: str | None = Field(default=None, max_length=GEOHASH_PRECISION, index=True)
+
+    __table_args__ = (
+        # Used to narrow down the nearby addresses to a bounding box
+        Index("ix_addresses_latitude_longitude", "latitude", "longitude"),
+    )
+
+
+@event.listens_for(Address, "before_insert")
+@event.listens_for(Address, "before_update")
+def set_address_geohash(
+    _mapper: Mapper[Address], _connection: Connection, address: Address
+) -> None:
+    address.geohash = encode(address.latitude, address.longitude)
+
 
 # Required attributes for creating a new record
 class AddressCreate(AddressBase):
@@ -0,0 +1,85 @@
+"""
+Geohashes of coordinates (see https://en.wikipedia.org/wiki/Geohash).
+
+A geohash of precision `p` identifies a cell of a grid that splits the world in 32^p cells,
+and every geohash starts with the geohash of the bigger cell that contains it. So the
+addresses inside a cell are the ones whose geohash starts with the geohash of the cell.
+"""
+
+from math import floor
+
+ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Precision of the geohash stored for every address (cells of about 1.2km x 0.6km)
+GEOHASH_PRECISION = 6
+# Nearby lookups use the smallest cells that cover the range with at most this many cells
+MAX_COVERING_CELLS = 9
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, long_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars: list[str] = []
+    bits, char = 0, 0
+    even = True  # Bits alternate between longitude (even) and latitude (odd)
+    while len(chars) < precision:
+        value, bounds = (longitude, long_range) if even else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        char <<= 1
+        if value >= mid:
+            char |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(ALPHABET[char])
+            bits, char = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """
+    Returns the height (latitude) and width (longitude) in degrees of the cells of a precision
+    """
+    lat_bits = 5 * precision // 2
+    long_bits = 5 * precision - lat_bits
+    return 180 / 2**lat_bits, 360 / 2**long_bits
+
+
+def covering_cells(
+    min_lat: float, max_lat: float, min_long: float, max_long: float
+) -> list[str] | None:
+    """
+    Returns the geohashes of the smallest cells (up to GEOHASH_PRECISION) that cover the
+    given box with at most MAX_COVERING_CELLS cells, or None if the box is too big.
+    """
+    min_lat, max_lat = max(min_lat, -90), min(max_lat, 90)
+    min_long, max_long = max(min_long, -180), min(max_long, 180)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = _cell_indexes(min_lat + 90, max_lat + 90, height, 180)
+        columns = _cell_indexes(min_long + 180, max_long + 180, width, 360)
+        if len(rows) * len(columns) <= MAX_COVERING_CELLS:
+            return [
+                encode(-90 + (r + 0.5) * height, -180 + (c + 0.5) * width, precision)
+                for r in rows
+                for c in columns
+            ]
+    return None
+
+
+def _cell_indexes(low: float, high: float, size: float, total: float) -> range:
+    # A box ending exactly at the end of the world belongs to the last cell
+    return range(floor(low / size), min(floor(high / size) + 1, round(total / size)))
+
+
+def prefix_upper_bound(prefix: str) -> str | None:
+    """
+    Returns the first geohash (in lexicographic order) after all the ones starting with
+    `prefix`, or None if there is none.
+    """
+    for i in range(len(prefix) - 1, -1, -1):
+        index = ALPHABET.index(prefix[i])
+        if index < len(ALPHABET) - 1:
+            return prefix[:i] + ALPHABET[index + 1]
+    return None
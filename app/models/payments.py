@@ -10,8 +10,13 @@ class PaymentStatus(StrEnum):
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     CANCELLED = "cancelled"
+    # Never started before the payment expired, can still be completed by a late payment
+    EXPIRED = "expired"
 
 
+# Payments that haven't been cancelled
+OPEN_PAYMENT_STATUSES = [PaymentStatus.CREATED, PaymentStatus.IN_PROGRESS, PaymentStatus.COMPLETED]
+
 PaymentStatusUpdate = Literal[
     PaymentStatus.IN_PROGRESS, PaymentStatus.COMPLETED, PaymentStatus.CANCELLED
 ]
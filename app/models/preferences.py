@@ -1,3 +1,4 @@
+from datetime import datetime
 from decimal import Decimal
 from enum import StrEnum
 from typing import Literal, Sequence, TypedDict, TypeVar, Generic, NotRequired
@@ -31,6 +32,8 @@ class PreferenceData(TypedDict, Generic[M]):
     items: Sequence[PreferenceItem]
     marketplace_fee: NotRequired[Decimal]
     shipments: NotRequired[PreferenceShipment]
+    expires: NotRequired[bool]
+    expiration_date_to: NotRequired[datetime]
     metadata: M
 
 
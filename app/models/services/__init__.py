@@ -20,7 +20,11 @@ from .appointments import (
     AvailableAppointment,
     AvailableAppointmentsForSlots,
     AvailableAppointmentsList,
+    AvailableAppointmentsCount,
+    AvailabilitySummary,
+    ServiceAvailableAppointments,
 )
+from .slot_occupancy import SlotOccupancy
 
 __all__ = [
     "Service",
@@ -40,4 +44,8 @@ __all__ = [
     "AvailableAppointment",
     "AvailableAppointmentsForSlots",
     "AvailableAppointmentsList",
+    "AvailableAppointmentsCount",
+    "AvailabilitySummary",
+    "ServiceAvailableAppointments",
+    "SlotOccupancy",
 ]
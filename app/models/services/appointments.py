@@ -1,8 +1,9 @@
 from datetime import datetime
 from decimal import Decimal
+from enum import StrEnum
 from typing import Generator
 
-from sqlalchemy import PrimaryKeyConstraint
+from sqlalchemy import Index, PrimaryKeyConstraint
 from sqlmodel import Field, Relationship
 from pydantic import PositiveInt, BaseModel, AwareDatetime
 
@@ -34,6 +35,8 @@ class Appointment(AppointmentBase, table=True):
     __table_args__ = (
         # Make sure the order of the PK is (service_id, id)
         PrimaryKeyConstraint("service_id", "id"),
+        # Used to find the expired payments
+        Index("ix_appointments_payment_status_created_at", "payment_status", "created_at"),
     )
 
 
@@ -53,6 +56,21 @@ class AvailableAppointmentsForSlots(BaseModel):
     available_appointments: list[AvailableAppointment]
 
 
+class AvailabilitySummary(StrEnum):
+    DAY = "day"
+    HOUR = "hour"
+
+
+class AvailableAppointmentsCount(BaseModel):
+    start: datetime  # start of the day or hour, in the service's timezone
+    amount: PositiveInt
+
+
+class ServiceAvailableAppointments(BaseModel):
+    service_id: Id
+    available_appointments: list[AvailableAppointmentsForSlots]
+
+
 class AvailableAppointmentsList(list[AvailableAppointmentsForSlots]):
     def iterate_appointments(
         self,
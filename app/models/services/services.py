@@ -1,10 +1,10 @@
-from typing import Sequence
+from typing import TYPE_CHECKING, Sequence
 from enum import StrEnum
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
 from sqlmodel import Field, Relationship, SQLModel
-from sqlalchemy import PrimaryKeyConstraint, String
+from sqlalchemy import Index, PrimaryKeyConstraint, String
 
 from ..addresses import Address, AddressRead, AddressCreate, ServiceAddressLink
 from ..util import Id, TimestampModel, OptionalImageUrlModel, UUIDModel
@@ -12,6 +12,9 @@ from ..reviews import ReviewRead, ReviewsRatingAverage, set_review_rating_averag
 from .appointment_slots import AppointmentSlotsBase, AppointmentSlots, AppointmentSlotsList
 from .util import Timezone, DEFAULT_TIMEZONE
 
+if TYPE_CHECKING:
+    from .slot_occupancy import SlotOccupancy
+
 
 class ServiceCategory(StrEnum):
     GROOMING = "grooming"  # estética e higiene
@@ -28,7 +31,7 @@ class ServiceBase(SQLModel):
     appointment_days_in_advance: int = Field(ge=0)
     # How close the service provider needs to be to the uer
     # in order to be available for the user
-    customer_range_km: float
+    customer_range_km: float = Field(ge=0)
     # If True, the service is provided at the service's address
     is_home_service: bool = False
     category: ServiceCategory
@@ -44,6 +47,10 @@ class ServicePublic(UUIDModel, ReviewsRatingAverage, ServiceBase):
 class ServiceRead(ServicePublic, OptionalImageUrlModel):
     appointment_slots: Sequence[AppointmentSlotsBase]
     address: AddressRead
+    # Start of the first available appointment, only set in service listings
+    next_available: datetime | None = None
+    # Distance to the caller's address, only set in nearby listings
+    distance_km: float | None = None
 
 
 # Actual data in database table (Base + id + timestamps)
@@ -67,6 +74,17 @@ class Service(ServicePublic, TimestampModel, table=True):
     _reviews: list["ServiceReview"] = Relationship(
         sa_relationship_kwargs={"cascade": "all, delete-orphan"}
     )
+    # Not populated, only used for deleting the slots occupancy when a service is deleted
+    _slot_occupancy: list["SlotOccupancy"] = Relationship(
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+    )
+
+    __table_args__ = (
+        # Used to find the largest range when looking up nearby services
+        Index("ix_services_customer_range_km", "customer_range_km"),
+        # Used to find the services that might be missing from the spatial index
+        Index("ix_services_updated_at", "updated_at"),
+    )
 
     def to_tz(self, dt: datetime) -> datetime:
         """
@@ -0,0 +1,24 @@
+from sqlalchemy import PrimaryKeyConstraint
+from sqlmodel import Field, SQLModel
+from pydantic import AwareDatetime
+
+from ..util import Id, TZDateTime
+
+
+class SlotOccupancy(SQLModel, table=True):
+    """
+    Amount of non-cancelled appointments that overlap with an appointment slot of a service.
+    Slots without appointments don't have a row.
+    """
+
+    __tablename__ = "slot_occupancy"
+
+    service_id: Id = Field(foreign_key="services.id", primary_key=True)
+    slot_start: AwareDatetime = Field(sa_type=TZDateTime, primary_key=True)
+    slot_end: AwareDatetime = Field(sa_type=TZDateTime)
+    amount: int = Field(ge=0)
+
+    __table_args__ = (
+        # Make sure the order of the PK is (service_id, slot_start)
+        PrimaryKeyConstraint("service_id", "slot_start"),
+    )
@@ -7,6 +7,8 @@ from .products import (
     ProductCategories,
     ProductReview,
     ProductReviewRead,
+    categories_mask,
+    mask_categories,
 )
 from .purchases import Purchase, PurchaseRead, PurchaseItem, PurchaseItemRead
 
@@ -23,6 +25,8 @@ __all__ = [
     "ProductReviewRead",
     "Category",
     "ProductCategories",
+    "categories_mask",
+    "mask_categories",
     "Purchase",
     "PurchaseRead",
     "PurchaseItem",
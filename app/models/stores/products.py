@@ -1,6 +1,6 @@
 from decimal import Decimal
 from enum import StrEnum
-from typing import Any
+from typing import Any, Iterable
 
 from pydantic import field_validator, model_validator
 from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint, UniqueConstraint
@@ -13,6 +13,8 @@ from .stores import Store
 MAX_CATEGORIES_PER_PRODUCT = 3
 
 
+# The position of each category is its bit in `Product.category_mask`, so new categories
+# have to be added at the end
 class Category(StrEnum):
     ALIMENTOS = "alimentos"
     JUGUETES = "juguetes"
@@ -25,6 +27,21 @@ class Category(StrEnum):
     CAMAS = "camas"
     PLATOS_Y_COMEDEROS = "platos_y_comederos"
 
+    @property
+    def bit(self) -> int:
+        return 1 << list(Category).index(self)
+
+
+def categories_mask(categories: Iterable[Category]) -> int:
+    mask = 0
+    for category in categories:
+        mask |= category.bit
+    return mask
+
+
+def mask_categories(mask: int) -> list[Category]:
+    return [category for category in Category if mask & category.bit]
+
 
 class ProductCategories(SQLModel, table=True):
     __tablename__ = "product_categories"
@@ -54,13 +71,15 @@ class ProductPublic(ProductBase, ReviewsRatingAverage, UUIDModel):
 
 class ProductRead(ProductPublic, OptionalImageUrlModel):
     categories: list[Category]
+    # Distance to the caller's address, only set in nearby listings
+    distance_km: float | None = None
 
     @model_validator(mode="before")
     @classmethod
     def check_categories_format(cls, data: Any) -> Any:
         if isinstance(data, Product):
             new_data = data.model_dump()
-            new_data["categories"] = [c.category for c in data._categories]
+            new_data["categories"] = mask_categories(data.category_mask)
             return new_data
 
         return data
@@ -70,11 +89,11 @@ class ProductRead(ProductPublic, OptionalImageUrlModel):
 class Product(ProductPublic, TimestampModel, table=True):
     __tablename__ = "products"
 
+    # Bits of the categories of the product (see `Category.bit`), which are also in
+    # `_categories`. Products are read and filtered by it, so the categories aren't loaded
+    category_mask: int = Field(default=0)
     _categories: list[ProductCategories] = Relationship(
-        sa_relationship_kwargs={
-            "lazy": "selectin",
-            "cascade": "all, delete-orphan",
-        }
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"}
     )
 
     store: "Store" = Relationship(
@@ -1,7 +1,7 @@
 from decimal import Decimal
 from typing import Sequence
 
-from sqlalchemy import ForeignKeyConstraint, PrimaryKeyConstraint
+from sqlalchemy import ForeignKeyConstraint, Index, PrimaryKeyConstraint
 from sqlmodel import Relationship, Field
 
 from ..payments import PaymentStatusModel
@@ -71,4 +71,6 @@ class Purchase(PurchasePublic, table=True):
 
     __table_args__ = (
         PrimaryKeyConstraint("store_id", "id"),  # Make sure the order of the PK is (store_id, id)
+        # Used to find the expired payments
+        Index("ix_purchases_payment_status_created_at", "payment_status", "created_at"),
     )
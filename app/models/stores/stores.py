@@ -1,7 +1,7 @@
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import PrimaryKeyConstraint
+from sqlalchemy import Index, PrimaryKeyConstraint
 from sqlmodel import Field, Relationship, SQLModel
 from pydantic import field_validator
 
@@ -46,6 +46,8 @@ class StorePublic(UUIDModel, StoreBase, ReviewsRatingAverage):
 # What the user gets from the API (Public + image + address)
 class StoreRead(StorePublic, OptionalImageUrlModel):
     address: AddressRead
+    # Distance to the caller's address, only set in nearby listings
+    distance_km: float | None = None
 
 
 # Actual data in database table (Base + id + timestamps)
@@ -69,6 +71,11 @@ class Store(StorePublic, TimestampModel, table=True):
         sa_relationship_kwargs={"cascade": "all, delete-orphan"}
     )
 
+    __table_args__ = (
+        # Used to find the stores that might be missing from the spatial index
+        Index("ix_stores_updated_at", "updated_at"),
+    )
+
     @property
     def range_km(self) -> float:
         return self.delivery_range_km
@@ -1,6 +1,6 @@
 # pylint: disable=E1102 # bugged with func.now()
 from enum import StrEnum
-from math import pi, radians, cos
+from math import asin, cos, pi, radians, sin, sqrt
 from uuid import UUID, uuid4
 from datetime import datetime, timezone
 from typing import Any, BinaryIO, ClassVar, Protocol
@@ -15,6 +15,10 @@ class HealthCheck(BaseModel):
 
 
 Id = UUID
+# Distance in km and id of the last record of a page of nearby records
+DistanceCursor = tuple[float, Id]
+# Values of the sort keys of the last record of a page, followed by its primary key
+KeysetCursor = list[Any]
 
 
 class UUIDModel(SQLModel):
@@ -100,20 +104,40 @@ class Coordinates(SQLModel):
     KM_PER_DEG_LAT: ClassVar[float] = 2 * pi * EARTH_RADIUS_KM / 360.0
 
     def within(self, other: "Coordinates", max_distance_km: float) -> bool:
-        return other.distance_to_squared(self) <= max_distance_km**2
+        return other.distance_to(self) <= max_distance_km
 
-    def distance_to_squared(self, other: "Coordinates") -> float:
-        """
-        Based on https://stackoverflow.com/a/5207131
-        Should be decently accurate for small distances (a few km)
-        """
-        km_per_deg_long = self.KM_PER_DEG_LAT * cos(radians(self.latitude))
+    def distance_to(self, other: "Coordinates") -> float:
+        return great_circle_distance(self.latitude, self.longitude, other.latitude, other.longitude)
 
-        return (self.KM_PER_DEG_LAT * (other.latitude - self.latitude)) ** 2 + (
-            km_per_deg_long * (other.longitude - self.longitude)
-        ) ** 2
+
+def great_circle_distance(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """
+    Distance in km between two points of a sphere the size of the Earth, using the haversine
+    formula. Every range check uses this distance: the nearby filters (see
+    `app.repositories.util.distance_to_addresses`), the spatial index and the checkout.
+    """
+    lat1_rad, lat2_rad = radians(lat1), radians(lat2)
+    h = (
+        sin((lat2_rad - lat1_rad) / 2) ** 2
+        + cos(lat1_rad) * cos(lat2_rad) * sin(radians(long2 - long1) / 2) ** 2
+    )
+    return 2 * Coordinates.EARTH_RADIUS_KM * asin(min(1.0, sqrt(h)))
 
 
 class SortOrder(StrEnum):
     ASCENDING = "asc"
     DESCENDING = "desc"
+
+
+class CountMode(StrEnum):
+    """
+    How listings count their records: all of them, up to `CAPPED_COUNT` (enough to show
+    "20+" without counting the rest) or not at all
+    """
+
+    EXACT = "exact"
+    CAPPED = "capped"
+    NONE = "none"
+
+
+CAPPED_COUNT = 20
@@ -1,17 +1,42 @@
-from typing import Any, Sequence, Type, TypeVar, Generic
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Sequence, Type, TypeVar, Generic
 from abc import ABC
 
+from pydantic import AwareDatetime, TypeAdapter, ValidationError
 from sqlmodel import AutoString, select, and_, func
-from sqlmodel.sql.expression import SelectOfScalar
+from sqlmodel.sql.expression import Select, SelectOfScalar
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy import asc, desc, ColumnExpressionArgument
-from sqlalchemy.orm import InstrumentedAttribute, RelationshipProperty
+from sqlalchemy import (
+    asc,
+    desc,
+    literal,
+    tuple_,
+    ColumnElement,
+    ColumnExpressionArgument,
+    Label,
+    Row,
+)
+from sqlalchemy.orm import InstrumentedAttribute, RelationshipProperty, class_mapper
 
-from app.exceptions.repository import RecordNotFound
-from app.models.util import SortOrder
+from app.db import after_commit
+from app.exceptions.repository import InvalidCursor, RecordNotFound
+from app.models.util import CAPPED_COUNT, CountMode, KeysetCursor, SortOrder
+from .util import has_trigram_search, text_relevance
 
 T = TypeVar("T")  # Model
 PK = TypeVar("PK")  # Primary key type
+# Keys that a listing is sorted by, all of them in the same order
+SortKeys = tuple[list[ColumnElement[Any]], SortOrder]
+
+
+@dataclass
+class Page(Generic[T]):
+    records: Sequence[T]
+    # Amount of records of the whole listing, as the `CountMode` of the page says
+    total: int | None
+    # Sort keys of the last record, for the next page to start after. None on the last page
+    next_cursor: KeysetCursor | None = None
 
 
 class BaseRepository(Generic[T, PK], ABC):
@@ -48,10 +73,6 @@ class BaseRepository(Generic[T, PK], ABC):
         initial, *rest = where_clauses
         return and_(initial, *rest)
 
-    def _list_select(self, **filters: Any) -> SelectOfScalar[T]:
-        query = select(self.cls)
-        return query.where(self._common_filters(**filters))
-
     async def get_all(
         self,
         skip: int = 0,
@@ -60,14 +81,30 @@ class BaseRepository(Generic[T, PK], ABC):
         sort_order: SortOrder = SortOrder.ASCENDING,
         **filters: Any,
     ) -> Sequence[T]:
-        query = self._list_select(**filters)
-        order_func = asc if sort_order == SortOrder.ASCENDING else desc
-        if sort_by is not None:
-            self._get_column(sort_by)
-            query = query.order_by(order_func(getattr(self.cls, sort_by)))
-        query = query.offset(skip).limit(limit)
-        result = await self.db.exec(query)
-        return result.all()
+        page = await self.get_page(
+            skip, limit, sort_by, sort_order, count=CountMode.NONE, **filters
+        )
+        return page.records
+
+    async def get_page(
+        self,
+        skip: int = 0,
+        limit: int | None = None,
+        sort_by: str | None = None,
+        sort_order: SortOrder = SortOrder.ASCENDING,
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+        **filters: Any,
+    ) -> Page[T]:
+        """
+        Returns a page of the records that match the filters in a stable order (see
+        `_sort_keys`), and their amount counted as `count` says. If `cursor` is given, the
+        page starts after the record it points to (see `_get_keyset_page`).
+        """
+        sort = await self._sort_keys(sort_by, sort_order, **filters)
+        where = self._common_filters(**filters)
+        return await self._get_keyset_page(where, sort, skip, limit, cursor, count)
 
     async def get_by_id(self, record_id: PK) -> T | None:
         return await self.db.get(self.cls, record_id)
@@ -94,16 +131,180 @@ class BaseRepository(Generic[T, PK], ABC):
         await self.db.delete(existing)
         await self.db.flush()
 
+    def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """
+        Runs `callback` once the changes made through this repository are committed,
+        e.g. to invalidate caches of the changed records. See `app.db.after_commit`.
+        """
+        after_commit(self.db, callback)
+
     async def count_all(self, **filters: Any) -> int:
-        query = self._count_select(**filters)
-        result = await self.db.exec(query)
-        return result.one()
+        return await self._count(self._common_filters(**filters))
+
+    async def count_with_mode(self, mode: CountMode, **filters: Any) -> int | None:
+        """
+        Counts the records that match the filters as `mode` says. The capped count stops at
+        `CAPPED_COUNT` + 1 records, so a result over `CAPPED_COUNT` means there are more.
+        """
+        return await self._count_with_mode(self._common_filters(**filters), mode)
 
-    def _count_select(self, **filters: Any) -> SelectOfScalar[int]:
+    async def _count(self, where: ColumnExpressionArgument[bool] | bool) -> int:
         # pylint bug: https://github.com/pylint-dev/pylint/issues/8138
         query = select(func.count()).select_from(self.cls)  # pylint: disable=not-callable
-        query = query.where(self._common_filters(**filters))
-        return query
+        result = await self.db.exec(query.where(where))
+        return result.one()
+
+    async def _count_with_mode(
+        self, where: ColumnExpressionArgument[bool] | bool, mode: CountMode
+    ) -> int | None:
+        if mode == CountMode.NONE:
+            return None
+        if mode == CountMode.EXACT:
+            return await self._count(where)
+        query = select(literal(1)).select_from(self.cls).where(where)
+        result = await self.db.exec(self._capped_count(query))
+        return result.one()
+
+    @staticmethod
+    def _capped_count(query: SelectOfScalar[Any]) -> SelectOfScalar[int]:
+        """
+        Counts the rows of `query` up to `CAPPED_COUNT` + 1, without going through the rest
+        """
+        capped = query.limit(CAPPED_COUNT + 1).subquery()
+        return select(func.count()).select_from(capped)  # pylint: disable=not-callable
+
+    @staticmethod
+    def _total() -> Label[int]:
+        """
+        Column with the amount of rows that the query matches before its offset and limit
+        """
+        return func.count().over().label("total")  # pylint: disable=not-callable
+
+    async def _get_page(
+        self, query: Select[Any], past_start: bool, count: Callable[[], Awaitable[int]]
+    ) -> tuple[Sequence[Row[Any]], int]:
+        """
+        Runs a `query` for a page whose last column is `_total()`, and returns its rows and
+        the total, so that listings don't need a second query for it. Only a page past the
+        last record has no rows to read the total from, in which case it's counted with
+        `count` instead if the page doesn't start at the first record (`past_start`).
+        """
+        result = await self.db.exec(query)
+        rows = result.all()
+        if rows:
+            return rows, rows[0][-1]
+        return rows, await count() if past_start else 0
+
+    async def _get_keyset_page(
+        self,
+        where: ColumnExpressionArgument[bool] | bool,
+        sort: SortKeys,
+        skip: int,
+        limit: int | None,
+        cursor: KeysetCursor | None,
+        count: CountMode,
+    ) -> Page[T]:
+        """
+        Returns a page of the records that match `where` in the order of the `sort` keys,
+        which starts `skip` records after the one that `cursor` has the sort keys of (or at
+        the first record). Since the cursor is compared with the sort keys, a page deep into
+        the listing doesn't go through the previous ones like an offset does.
+        The total of a first page counted exactly is read from its query (see `_get_page`),
+        otherwise it's counted apart.
+        """
+        counted_in_query = cursor is None and count == CountMode.EXACT
+        total_column = [self._total()] if counted_in_query else []
+        query = self._keyset_select(where, sort, cursor, *total_column).offset(skip).limit(limit)
+        total: int | None
+        if counted_in_query:
+            rows, total = await self._get_page(query, skip > 0, lambda: self._count(where))
+        else:
+            result = await self.db.exec(query)
+            rows, total = result.all(), await self._count_with_mode(where, count)
+
+        next_cursor = None
+        if limit is not None and len(rows) == limit:
+            keys_end = len(sort[0]) + 1
+            next_cursor = list(rows[-1][1:keys_end])
+        return Page([row[0] for row in rows], total, next_cursor)
+
+    def _keyset_select(
+        self,
+        where: ColumnExpressionArgument[bool] | bool,
+        sort: SortKeys,
+        cursor: KeysetCursor | None,
+        *columns: Label[Any],
+    ) -> Select[Any]:
+        """
+        Selects the records that match `where` and come after `cursor`, sorted by the `sort`
+        keys, followed by the values of the keys (to read the next cursor from) and `columns`
+        """
+        keys, sort_order = sort
+        order_func = asc if sort_order == SortOrder.ASCENDING else desc
+        labels = [key.label(f"sort_key_{i}") for i, key in enumerate(keys)]
+        query: Select[Any] = select(self.cls, *labels, *columns)  # type: ignore[assignment]
+        query = query.where(where)
+        if cursor is not None:
+            query = query.where(self._after(sort, cursor))
+        return query.order_by(*(order_func(key) for key in keys))
+
+    async def _sort_keys(
+        self, sort_by: str | None, sort_order: SortOrder, **filters: Any
+    ) -> SortKeys:
+        """
+        Keys that listings are sorted by: `sort_by`, or if there is none the relevance of the
+        records for the text filters (see `text_relevance`), and then the primary key, so that
+        no two records tie and pages can start after any of them (see `_after`).
+        """
+        if sort_by is not None:
+            return [self._get_column(sort_by).expression, *self._primary_key()], sort_order
+        searches = []
+        for col_name, v in filters.items():
+            if v is None or "." in col_name:
+                continue
+            col = self._get_column(col_name)
+            if isinstance(col.type, AutoString):
+                searches.append((col, v))
+        relevance = []
+        if searches:
+            trigram = await has_trigram_search(self.db)
+            relevance = [text_relevance(col, v, trigram) for col, v in searches]
+        return [*relevance, *self._primary_key()], SortOrder.ASCENDING
+
+    def _primary_key(self) -> list[ColumnElement[Any]]:
+        return list(class_mapper(self.cls).primary_key)
+
+    def _after(self, sort: SortKeys, cursor: KeysetCursor) -> ColumnElement[bool]:
+        """
+        Filter for the records that come after the one with the `cursor` values of the sort
+        keys. It's a single row value comparison, which the indexes on the keys can serve.
+        """
+        keys, sort_order = sort
+        if len(cursor) != len(keys):
+            raise InvalidCursor
+        values = [literal(self._cursor_value(k, v), k.type) for k, v in zip(keys, cursor)]
+        if sort_order == SortOrder.ASCENDING:
+            return tuple_(*keys) > tuple_(*values)
+        return tuple_(*keys) < tuple_(*values)
+
+    def _cursor_value(self, key: ColumnElement[Any], value: Any) -> Any:
+        """
+        Parses a value of a cursor as the type of its sort key, and raises `InvalidCursor` if
+        it isn't one
+        """
+        try:
+            python_type: Any = key.type.python_type
+        except NotImplementedError:
+            # Custom column types (like sqlmodel's UUIDs) don't tell it, the model's field does
+            field = getattr(self.cls, "model_fields", {}).get(getattr(key, "key", None))
+            python_type = field.annotation if field is not None else str
+        if python_type is datetime:
+            # The timestamp columns are stored in UTC, so they're compared with aware datetimes
+            python_type = AwareDatetime
+        try:
+            return TypeAdapter(python_type).validate_python(value)
+        except ValidationError as e:
+            raise InvalidCursor from e
 
     def _get_column(
         self, col_name: str, cls: Type[Any] | None = None
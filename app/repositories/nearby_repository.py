@@ -1,10 +1,25 @@
-from typing import Any, Callable, Generic, Protocol, Sequence, Type, TypeVar, ParamSpec
+from datetime import datetime
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Collection,
+    Generic,
+    Protocol,
+    Sequence,
+    Type,
+    TypeVar,
+    ParamSpec,
+)
 
-from sqlalchemy import ColumnExpressionArgument, Exists
+from sqlalchemy import ColumnElement, ColumnExpressionArgument, ScalarSelect, literal, tuple_
+from sqlalchemy.orm import aliased
 from sqlmodel import select, func, and_
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.models.util import CountMode, DistanceCursor, Id
 from .base_repository import BaseRepository
+from .util import has_address_locations
 
 T = TypeVar("T")  # Model
 PK = TypeVar("PK")  # Primary key type
@@ -21,46 +36,191 @@ class NearbyRepository(BaseRepository[T, PK], Generic[T, PK, P]):
         self,
         repository_class: Type[T],
         session: AsyncSession,
-        distance_filter: Callable[[float, float], Exists],
+        distance_filter: Callable[
+            [float, float, float, bool, Collection[Id] | None], ColumnElement[bool]
+        ],
+        max_range_getter: Callable[[], Awaitable[float]],
+        distance: Callable[[float, float, bool], ScalarSelect[float]],
         extra_filter_getter: ExtraFilterGetter[P] | None = None,
     ) -> None:
         super().__init__(repository_class, session)
+        # The distance filter also takes the largest range of the records, so that only
+        # the addresses near enough for it are checked, whether to use the geodesic
+        # distance to the address locations, and the candidate ids found by a spatial index
+        # (if any), which are checked instead
         self.distance_filter = distance_filter
+        self.max_range_getter = max_range_getter
+        self.distance = distance
         self.extra_filter_getter = extra_filter_getter or self._common_filters
 
+    async def get_ids_updated_since(self, updated_since: datetime) -> Sequence[Id]:
+        """
+        Returns the ids of the records updated after `updated_since`, e.g. to check them
+        along with the candidates of a spatial index that might be missing them.
+        """
+        query = select(self._get_column("id")).where(self._get_column("updated_at") > updated_since)
+        result = await self.db.exec(query)
+        return result.all()
+
     async def get_nearby(
         self,
         latitude: float,
         longitude: float,
         *args: P.args,
+        cursor: DistanceCursor | None = None,
+        candidate_ids: Collection[Id] | None = None,
         skip: int = 0,
         limit: int | None = None,
         **kwargs: Any
-    ) -> Sequence[T]:
+    ) -> Sequence[tuple[T, float]]:
+        """
+        Returns the nearby records with their distance in km, closest first (and by id when
+        at the same distance).
+        If `cursor` is given, only the records after that distance and id are returned, so
+        that the next page doesn't go through the previous ones like `skip` does.
+        If `candidate_ids` is given, only those records are checked.
+        """
+        if candidate_ids is not None and not candidate_ids:
+            return []
+        distance = self.distance(latitude, longitude, await has_address_locations(self.db))
+        id_column = self._get_column("id")
         query = (
-            select(self.cls)
-            .where(self.__filters(latitude, longitude, *args, **kwargs))
+            select(self.cls, distance.label("distance_km"))
+            .where(await self.__filters(latitude, longitude, candidate_ids, *args, **kwargs))
+            .order_by(distance, id_column)
             .offset(skip)
             .limit(limit)
         )
+        if cursor is not None:
+            query = query.where(tuple_(distance, id_column) > cursor)
         result = await self.db.exec(query)
         return result.all()
 
+    async def get_nearby_page(
+        self,
+        latitude: float,
+        longitude: float,
+        *args: P.args,
+        cursor: DistanceCursor | None = None,
+        candidate_ids: Collection[Id] | None = None,
+        skip: int = 0,
+        limit: int | None = None,
+        count: CountMode = CountMode.EXACT,
+        **kwargs: Any
+    ) -> tuple[Sequence[tuple[T, float]], int | None]:
+        """
+        Same as `get_nearby`, but also returns the amount of nearby records (including the
+        ones before the cursor) as `count` says. The exact amount is counted by the same
+        query, while the capped one is counted apart, since counting it with the page would
+        go through every nearby record.
+        """
+        if candidate_ids is not None and not candidate_ids:
+            return [], None if count == CountMode.NONE else 0
+        if count == CountMode.EXACT:
+            return await self.__get_nearby_counted_page(
+                latitude,
+                longitude,
+                *args,
+                cursor=cursor,
+                candidate_ids=candidate_ids,
+                skip=skip,
+                limit=limit,
+                **kwargs,
+            )
+
+        records = await self.get_nearby(
+            latitude,
+            longitude,
+            *args,
+            cursor=cursor,
+            candidate_ids=candidate_ids,
+            skip=skip,
+            limit=limit,
+            **kwargs,
+        )
+        if count == CountMode.NONE:
+            return records, None
+        if skip == 0 and cursor is None and (limit is None or len(records) < limit):
+            # The first page already has every nearby record
+            return records, len(records)
+        total = await self.count_nearby(
+            latitude, longitude, *args, candidate_ids=candidate_ids, capped=True, **kwargs
+        )
+        return records, total
+
     async def count_nearby(
-        self, latitude: float, longitude: float, *args: P.args, **kwargs: Any
+        self,
+        latitude: float,
+        longitude: float,
+        *args: P.args,
+        candidate_ids: Collection[Id] | None = None,
+        capped: bool = False,
+        **kwargs: Any
     ) -> int:
-        query = (
-            select(func.count())  # pylint: disable=not-callable
-            .select_from(self.cls)
-            .filter(self.__filters(latitude, longitude, *args, **kwargs))
-        )
+        """
+        Returns the amount of nearby records, or up to `CAPPED_COUNT` + 1 of them if `capped`
+        """
+        if candidate_ids is not None and not candidate_ids:
+            return 0
+        cond = await self.__filters(latitude, longitude, candidate_ids, *args, **kwargs)
+        if capped:
+            query = self._capped_count(select(literal(1)).select_from(self.cls).filter(cond))
+        else:
+            total = func.count()  # pylint: disable=not-callable
+            query = select(total).select_from(self.cls).filter(cond)
         result = await self.db.exec(query)
         return result.one()
 
-    def __filters(
-        self, latitude: float, longitude: float, *args: P.args, **kwargs: Any
+    async def __get_nearby_counted_page(
+        self,
+        latitude: float,
+        longitude: float,
+        *args: P.args,
+        cursor: DistanceCursor | None,
+        candidate_ids: Collection[Id] | None,
+        skip: int,
+        limit: int | None,
+        **kwargs: Any
+    ) -> tuple[Sequence[tuple[T, float]], int]:
+        distance = self.distance(latitude, longitude, await has_address_locations(self.db))
+        # The records are counted before the cursor filters them
+        nearby = (
+            select(self.cls, distance.label("distance_km"), self._total())
+            .where(await self.__filters(latitude, longitude, candidate_ids, *args, **kwargs))
+            .subquery()
+        )
+        record = aliased(self.cls, nearby)
+        query = (
+            select(record, nearby.c.distance_km, nearby.c.total)
+            .order_by(nearby.c.distance_km, nearby.c.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        if cursor is not None:
+            query = query.where(tuple_(nearby.c.distance_km, nearby.c.id) > cursor)
+        rows, total = await self._get_page(
+            query,
+            skip > 0 or cursor is not None,
+            lambda: self.count_nearby(
+                latitude, longitude, *args, candidate_ids=candidate_ids, **kwargs
+            ),
+        )
+        return [(r, distance_km) for r, distance_km, _ in rows], total
+
+    async def __filters(
+        self,
+        latitude: float,
+        longitude: float,
+        candidate_ids: Collection[Id] | None,
+        *args: P.args,
+        **kwargs: Any
     ) -> ColumnExpressionArgument[bool]:
-        cond: ColumnExpressionArgument[bool] = self.distance_filter(latitude, longitude)
+        # The largest range is only needed to narrow down the records without candidates
+        max_range = await self.max_range_getter() if candidate_ids is None else 0
+        geography = await has_address_locations(self.db)
+        cond: ColumnExpressionArgument[bool] = self.distance_filter(
+            latitude, longitude, max_range, geography, candidate_ids
+        )
         if self.extra_filter_getter:
             cond = and_(cond, self.extra_filter_getter(*args, **kwargs))
         return cond
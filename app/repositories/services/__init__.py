@@ -1,4 +1,5 @@
 from .services import ServicesRepository
 from .appointments import AppointmentsRepository
+from .slot_occupancy import SlotOccupancyRepository
 
-__all__ = ["ServicesRepository", "AppointmentsRepository"]
+__all__ = ["ServicesRepository", "AppointmentsRepository", "SlotOccupancyRepository"]
@@ -2,14 +2,21 @@ from typing import Sequence, Any
 from datetime import datetime
 
 from fastapi import Depends
-from sqlmodel import and_, select
+from sqlmodel import and_, func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy import desc
+from sqlalchemy import ColumnElement, ColumnExpressionArgument, desc, literal, literal_column
+from sqlalchemy.dialects.postgresql import TSRANGE
 
 from app.models.services import Appointment
-from app.models.util import Id
+from app.models.util import CountMode, Id, KeysetCursor, SortOrder, TZDateTime
 from app.db import get_db
-from ..base_repository import BaseRepository
+from ..base_repository import BaseRepository, Page
+from ..util import expired_payments_select
+
+# tsrange(start, "end") generated column, only created on PostgreSQL (it isn't mapped in the
+# model, since SQLite doesn't support range types). The columns are naive UTC timestamps,
+# so the range is a tsrange and not a tstzrange
+APPOINTMENT_PERIOD = literal_column("appointments.period", TSRANGE)
 
 
 class AppointmentsRepository(BaseRepository[Appointment, tuple[Id | str, Id | str]]):
@@ -33,9 +40,48 @@ class AppointmentsRepository(BaseRepository[Appointment, tuple[Id | str, Id | st
         range will also be returned.
         `range_start` and `range_end` must be timezone-aware datetimes.
         """
+        query = (
+            select(Appointment)
+            .where(self.__range_filter(range_start, range_end, return_partial, **filters))
+            .offset(skip)
+            .limit(limit)
+            .order_by(desc(Appointment.start))  # type: ignore
+        )
+        result = await self.db.exec(query)
+        return result.all()
+
+    async def get_page_by_range(
+        self,
+        range_start: datetime | None,
+        range_end: datetime | None,
+        return_partial: bool = False,
+        limit: int | None = None,
+        skip: int = 0,
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+        **filters: Any
+    ) -> Page[Appointment]:
+        """
+        Same as `get_all_by_range`, but returns a page of the appointments in the range with
+        their amount counted as `count` says, which starts after `cursor` if it's given (see
+        `_get_keyset_page`).
+        """
+        where = self.__range_filter(range_start, range_end, return_partial, **filters)
+        sort = [self._get_column("start").expression, *self._primary_key()], SortOrder.DESCENDING
+        return await self._get_keyset_page(where, sort, skip, limit, cursor, count)
+
+    def __range_filter(
+        self,
+        range_start: datetime | None,
+        range_end: datetime | None,
+        return_partial: bool,
+        **filters: Any
+    ) -> ColumnExpressionArgument[bool] | bool:
         # TZDateTime handles converting the aware datetimes to UTC
-        query = select(Appointment)
         where = self._common_filters(**filters)
+        if (range_start or range_end) and self.db.get_bind().dialect.name == "postgresql":
+            return and_(self.__period_filter(range_start, range_end, return_partial), where)
         if range_start:
             if return_partial:
                 where = and_(Appointment.end > range_start, where)
@@ -46,11 +92,27 @@ class AppointmentsRepository(BaseRepository[Appointment, tuple[Id | str, Id | st
                 where = and_(Appointment.start < range_end, where)
             else:
                 where = and_(Appointment.end <= range_end, where)
-        query = (
-            query.where(where)
-            .offset(skip)
-            .limit(limit)
-            .order_by(desc(Appointment.start))  # type: ignore
+        return where
+
+    def __period_filter(
+        self, range_start: datetime | None, range_end: datetime | None, return_partial: bool
+    ) -> ColumnElement[bool]:
+        """
+        Same filter as the `start`/`end` comparisons of `get_all_by_range`, on the `period`
+        column, so that the GiST index on (service_id, period) is used. A missing end of the
+        range is an unbounded range bound.
+        """
+        query_range = func.tsrange(
+            literal(range_start, TZDateTime), literal(range_end, TZDateTime), "[)", type_=TSRANGE
         )
-        result = await self.db.exec(query)
+        if return_partial:
+            return APPOINTMENT_PERIOD.overlaps(query_range)
+        return APPOINTMENT_PERIOD.contained_by(query_range)
+
+    async def get_expired(self, created_before: datetime, limit: int) -> Sequence[Appointment]:
+        """
+        Returns up to `limit` appointments whose payment was created before `created_before`
+        and never started, oldest first. See `expired_payments_select`.
+        """
+        result = await self.db.exec(expired_payments_select(Appointment, created_before, limit))
         return result.all()
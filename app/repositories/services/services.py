@@ -1,13 +1,52 @@
+from typing import Any, Sequence
+
 from fastapi import Depends
+from sqlalchemy import ColumnExpressionArgument
+from sqlmodel import and_, col, func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.models.addresses import Address
 from app.models.services import Service
 from app.models.util import Id
 from app.db import get_db
-from app.repositories.util import service_distance_filter
+from app.repositories.util import service_distance, service_distance_filter
 from ..nearby_repository import NearbyRepository
 
 
 class ServicesRepository(NearbyRepository[Service, Id | str, []]):
     def __init__(self, session: AsyncSession = Depends(get_db)) -> None:
-        super().__init__(Service, session, service_distance_filter)
+        super().__init__(
+            Service,
+            session,
+            service_distance_filter,
+            self.__get_max_range,
+            service_distance,
+            self.__get_extra_filters,
+        )
+
+    async def get_locations(self) -> Sequence[tuple[Id, float, float, float]]:
+        """
+        Returns the id, address coordinates and customer range of every service
+        """
+        query = select(
+            col(Service.id), Address.latitude, Address.longitude, Service.customer_range_km
+        )
+        result = await self.db.exec(query.join(Service.address))  # type: ignore
+        return result.all()
+
+    async def __get_max_range(self) -> float:
+        # The customer range isn't bounded. The distance check compares squares, so the sign of
+        # the range is ignored there too
+        result = await self.db.exec(
+            select(func.min(Service.customer_range_km), func.max(Service.customer_range_km))
+        )
+        min_range, max_range = result.one()
+        return max(abs(min_range or 0), abs(max_range or 0))
+
+    def __get_extra_filters(
+        self, has_appointment_slots: bool = False, **filters: Any
+    ) -> ColumnExpressionArgument[bool] | bool:
+        conditions = self._common_filters(**filters)
+        if has_appointment_slots:
+            conditions = and_(conditions, Service.appointment_slots.any())  # type: ignore
+        return conditions
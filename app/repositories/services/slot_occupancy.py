@@ -0,0 +1,97 @@
+from typing import Iterable, Sequence, Any
+from datetime import datetime
+
+from fastapi import Depends
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import and_, col, delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.services import SlotOccupancy
+from app.models.util import Id
+from app.db import get_db
+from ..base_repository import BaseRepository
+
+
+class SlotOccupancyRepository(BaseRepository[SlotOccupancy, tuple[Id | str, datetime]]):
+    def __init__(self, session: AsyncSession = Depends(get_db)) -> None:
+        super().__init__(SlotOccupancy, session)
+
+    async def get_all_by_range(
+        self, range_start: datetime, range_end: datetime, **filters: Any
+    ) -> Sequence[SlotOccupancy]:
+        """
+        Return the occupancy of all the slots that overlap with the given range,
+        sorted by slot start.
+        `range_start` and `range_end` must be timezone-aware datetimes.
+        """
+        query = (
+            select(SlotOccupancy)
+            .where(
+                SlotOccupancy.slot_end > range_start,
+                SlotOccupancy.slot_start < range_end,
+                self._common_filters(**filters),
+            )
+            .order_by(col(SlotOccupancy.slot_start))
+        )
+        result = await self.db.exec(query)
+        return result.all()
+
+    async def try_increment(
+        self, service_id: Id, slot_start: datetime, slot_end: datetime, max_amount: int
+    ) -> bool:
+        """
+        Atomically adds one appointment to the occupancy of the given slot, unless it
+        already has `max_amount` appointments. Returns whether the appointment was added.
+
+        The check and the increment happen in a single conditional upsert on the slot's row,
+        so concurrent bookings for the same slot are serialized by the row lock (until the
+        transaction ends) while bookings for other slots don't block each other.
+        """
+        insert = self.__dialect_insert()
+        query = (
+            insert.values(service_id=service_id, slot_start=slot_start, slot_end=slot_end, amount=1)
+            .on_conflict_do_update(
+                index_elements=["service_id", "slot_start"],
+                set_={"amount": col(SlotOccupancy.amount) + 1},
+                where=col(SlotOccupancy.amount) < max_amount,
+            )
+            .returning(col(SlotOccupancy.amount))
+        )
+        result = await self.db.exec(query)  # type: ignore[call-overload]
+        return result.first() is not None
+
+    async def decrement_overlapping(self, service_id: Id, start: datetime, end: datetime) -> None:
+        """
+        Removes one appointment taking place from `start` to `end` from the occupancy
+        of every slot it overlaps with.
+        """
+        query = (
+            update(SlotOccupancy)
+            .where(
+                and_(
+                    col(SlotOccupancy.service_id) == service_id,
+                    col(SlotOccupancy.slot_start) < end,
+                    col(SlotOccupancy.slot_end) > start,
+                    col(SlotOccupancy.amount) > 0,
+                )
+            )
+            .values(amount=col(SlotOccupancy.amount) - 1)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.exec(query)  # type: ignore[call-overload]
+        await self.db.flush()
+
+    async def replace(self, service_id: Id, occupancies: Iterable[SlotOccupancy]) -> None:
+        """
+        Replaces the whole occupancy of the given service.
+        """
+        query = delete(SlotOccupancy).where(col(SlotOccupancy.service_id) == service_id)
+        await self.db.exec(query)  # type: ignore[call-overload]
+        self.db.add_all(occupancies)
+        await self.db.flush()
+
+    def __dialect_insert(self) -> postgresql.Insert | sqlite.Insert:
+        # Upserts are not part of the SQL standard
+        if self.db.get_bind().dialect.name == "sqlite":
+            return sqlite.insert(SlotOccupancy)
+        return postgresql.insert(SlotOccupancy)
@@ -1,26 +1,68 @@
-from typing import Any
+from typing import Any, Mapping
 
 from fastapi import Depends
-from sqlalchemy import ColumnExpressionArgument
-from sqlmodel import and_
+from sqlalchemy import ColumnExpressionArgument, case, update
+from sqlmodel import and_, col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.models.stores import Category, Product, ProductCategories
+from app.models.stores import Category, Product, categories_mask
 from app.models.util import Id
 from app.db import get_db
 from ..nearby_repository import NearbyRepository
-from ..util import product_distance_filter
+from ..util import max_delivery_range, product_distance, product_distance_filter
 
 
 class ProductsRepository(
     NearbyRepository[Product, tuple[Id | str, Id | str], [list[Category] | None]]
 ):
     def __init__(self, session: AsyncSession = Depends(get_db)):
-        super().__init__(Product, session, product_distance_filter, self.__get_extra_filters)
+        super().__init__(
+            Product,
+            session,
+            product_distance_filter,
+            max_delivery_range,
+            product_distance,
+            self.__get_extra_filters,
+        )
 
     async def get_by_name(self, store_id: Id | str, name: str) -> Product | None:
-        products = await self.get_all(store_id=store_id, name=name)
-        return products[0] if len(products) > 0 else None
+        """
+        Returns the product of the store with exactly that name (unlike the `name` filter,
+        which searches it)
+        """
+        query = select(Product).where(col(Product.store_id) == store_id, col(Product.name) == name)
+        result = await self.db.exec(query)
+        return result.first()
+
+    async def update(
+        self, record_id: tuple[Id | str, Id | str], new_data: dict[str, Any]
+    ) -> Product:
+        # The categories aren't loaded with the product, but replacing them needs the
+        # current ones to delete them
+        existing = await self.get_by_id(record_id)
+        if existing is not None and "_categories" in new_data:
+            await self.db.refresh(existing, ["_categories"])
+        return await super().update(record_id, new_data)
+
+    async def restore_stock(self, quantities: Mapping[Id, int]) -> None:
+        """
+        Adds the given quantities to the available stock of each product (by id) in a single
+        statement. Products without stock control (`available` is NULL) are left unchanged.
+        Quantities can be negative to take stock back, which never goes below zero.
+        """
+        if not quantities:
+            return
+        available = col(Product.available) + case(quantities, value=col(Product.id))
+        query = (
+            update(Product)
+            .where(
+                col(Product.id).in_(quantities.keys()),
+                col(Product.available).is_not(None),
+            )
+            .values(available=case((available < 0, 0), else_=available))
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.exec(query)  # type: ignore[call-overload]
 
     def __get_extra_filters(
         self, categories: list[Category] | None, **filters: Any
@@ -28,9 +70,6 @@ class ProductsRepository(
         conditions = self._common_filters(**filters)
         if categories:
             conditions = and_(
-                conditions,
-                Product._categories.any(  # type: ignore
-                    ProductCategories.category.in_(categories)  # type: ignore
-                ),
+                conditions, col(Product.category_mask).op("&")(categories_mask(categories)) != 0
             )
         return conditions
@@ -1,4 +1,7 @@
 # pylint: disable=duplicate-code
+from datetime import datetime
+from typing import Sequence
+
 from fastapi import Depends
 from sqlmodel.ext.asyncio.session import AsyncSession
 
@@ -6,8 +9,17 @@ from app.models.stores import Purchase
 from app.models.util import Id
 from app.db import get_db
 from ..base_repository import BaseRepository
+from ..util import expired_payments_select
 
 
 class PurchasesRepository(BaseRepository[Purchase, tuple[Id | str, Id | str]]):
     def __init__(self, session: AsyncSession = Depends(get_db)):
         super().__init__(Purchase, session)
+
+    async def get_expired(self, created_before: datetime, limit: int) -> Sequence[Purchase]:
+        """
+        Returns up to `limit` purchases whose payment was created before `created_before`
+        and never started, oldest first. See `expired_payments_select`.
+        """
+        result = await self.db.exec(expired_payments_select(Purchase, created_before, limit))
+        return result.all()
@@ -1,17 +1,32 @@
+from typing import Sequence
+
 from fastapi import Depends
+from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.models.addresses import Address
 from app.models.stores import Store
 from app.models.util import Id
 from app.db import get_db
 from ..nearby_repository import NearbyRepository
-from ..util import store_distance_filter
+from ..util import max_delivery_range, store_distance, store_distance_filter
 
 
 class StoresRepository(NearbyRepository[Store, Id | str, []]):
     def __init__(self, session: AsyncSession = Depends(get_db)) -> None:
-        super().__init__(Store, session, store_distance_filter)
+        super().__init__(Store, session, store_distance_filter, max_delivery_range, store_distance)
 
     async def get_by_name(self, name: str) -> Store | None:
-        stores = await self.get_all(name=name)
-        return stores[0] if len(stores) > 0 else None
+        """
+        Returns the store with exactly that name (unlike the `name` filter, which searches it)
+        """
+        result = await self.db.exec(select(Store).where(col(Store.name) == name))
+        return result.first()
+
+    async def get_locations(self) -> Sequence[tuple[Id, float, float, float]]:
+        """
+        Returns the id, address coordinates and delivery range of every store
+        """
+        query = select(col(Store.id), Address.latitude, Address.longitude, Store.delivery_range_km)
+        result = await self.db.exec(query.join(Store.address))  # type: ignore
+        return result.all()
@@ -1,39 +1,438 @@
-from typing import Any, Type
-from math import radians, cos
+from datetime import datetime
+from typing import Any, Collection, Type, TypeVar
+from math import asin, cos, degrees, radians, sin
 
-from sqlmodel import func
-from sqlalchemy import Exists, Function
+from sqlmodel import and_, col, func, or_, select
+from sqlmodel.sql.expression import SelectOfScalar
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import (
+    ColumnClause,
+    ColumnElement,
+    Exists,
+    Function,
+    Float,
+    ScalarSelect,
+    case,
+    column,
+    literal_column,
+    table,
+)
+from sqlalchemy.orm import InstrumentedAttribute
 
-from app.models.util import Coordinates
+from app.models.constants.stores import MAX_DELIVERY_RANGE
+from app.models.geohash import GEOHASH_PRECISION, covering_cells, prefix_upper_bound
+from app.models.payments import PaymentStatus
+from app.models.util import Coordinates, Id
 
-from ..models.stores import Store, Product
-from ..models.services import Service
-from ..models.addresses import Address
+from ..models.stores import Store, Product, Purchase
+from ..models.services import Service, Appointment
+from ..models.addresses import Address, ServiceAddressLink, StoreAddressLink
 
+Payable = TypeVar("Payable", Appointment, Purchase)
 
-def distance_filter(
+
+# geography(Point) generated column, only created on PostgreSQL when PostGIS is available (it
+# isn't mapped in the model, since SQLite doesn't support it)
+ADDRESS_LOCATION: ColumnClause[Any] = literal_column("addresses.location")
+WGS84_SRID = 4326
+
+
+def bounding_box(lat: float, long: float, distance_km: float) -> tuple[float, float, float, float]:
+    """
+    Returns the (min_lat, max_lat, min_long, max_long) box that contains every point whose
+    distance to (lat, long) is at most `distance_km`, as computed by `distance_to_addresses`
+    """
+    angle = distance_km / Coordinates.EARTH_RADIUS_KM
+    delta_lat = degrees(angle)
+    if abs(lat) + delta_lat >= 90:
+        # The range contains a pole, so every longitude
+        return lat - delta_lat, lat + delta_lat, long - 180, long + 180
+    # The points at that distance with the largest longitude difference
+    delta_long = degrees(asin(sin(angle) / cos(radians(lat))))
+    return lat - delta_lat, lat + delta_lat, long - delta_long, long + delta_long
+
+
+def nearby_addresses_filter(lat: float, long: float, distance_km: float) -> ColumnElement[bool]:
+    """
+    Holds for every address whose distance to (lat, long) is less than `distance_km` (and
+    some others around them). Unlike the distance, it can use the geohash index of the
+    addresses: they are looked up in the geohash cells that cover the bounding box, and then
+    filtered by the box itself.
+    """
+    min_lat, max_lat, min_long, max_long = bounding_box(lat, long, distance_km)
+    cond = and_(
+        col(Address.latitude).between(min_lat, max_lat),
+        col(Address.longitude).between(min_long, max_long),
+    )
+
+    cells = covering_cells(min_lat, max_lat, min_long, max_long)
+    if cells is None:
+        return cond
+    if all(len(cell) == GEOHASH_PRECISION for cell in cells):
+        return and_(col(Address.geohash).in_(cells), cond)
+    # Bigger cells contain every geohash that starts with theirs
+    in_cells = []
+    for cell in cells:
+        upper_bound = prefix_upper_bound(cell)
+        in_cell = col(Address.geohash) >= cell
+        if upper_bound is not None:
+            in_cell = and_(in_cell, col(Address.geohash) < upper_bound)
+        in_cells.append(in_cell)
+    return and_(or_(*in_cells), cond)  # pylint: disable=no-value-for-parameter
+
+
+def geography_point(lat: float, long: float) -> Function[Any]:
+    return func.geography(func.ST_SetSRID(func.ST_MakePoint(long, lat), WGS84_SRID))
+
+
+def geography_within(point: Function[Any], km: float | Function[Any]) -> Function[bool]:
+    """
+    Holds for the address locations at most `km` away from `point`. It is computed on the
+    sphere instead of the spheroid (use_spheroid=false), so that it matches `distance_to_addresses`.
+    """
+    return func.ST_DWithin(ADDRESS_LOCATION, point, km * 1000, False)
+
+
+def geography_distance(point: Function[Any]) -> ColumnElement[Any]:
+    """
+    Distance in km from `point` to the address locations, on the sphere as well
+    """
+    return func.ST_Distance(ADDRESS_LOCATION, point, False) / 1000
+
+
+def distance_to_addresses(lat: float, long: float) -> ColumnElement[float]:
+    """
+    Distance in km from (lat, long) to the addresses, computed in the same way as
+    `great_circle_distance`
+    """
+    address_lat = func.radians(Address.latitude)
+    half_delta_lat = (address_lat - radians(lat)) / 2
+    half_delta_long = func.radians(Address.longitude - long) / 2
+    h = func.pow(func.sin(half_delta_lat), 2) + cos(radians(lat)) * func.cos(
+        address_lat
+    ) * func.pow(func.sin(half_delta_long), 2)
+    # Rounding errors might make it slightly bigger than 1 for antipodal points
+    return 2 * Coordinates.EARTH_RADIUS_KM * func.asin(func.sqrt(case((h > 1, 1.0), else_=h)))
+
+
+def exact_distance_filter(
     model: Type[Store] | Type[Service], lat: float, long: float, less_than: float | Function[Any]
 ) -> Exists:
+    return model.address.has(distance_to_addresses(lat, long) <= less_than)  # type: ignore
+
+
+def geography_distance_filter(
+    model: Type[Store] | Type[Service],
+    link_column: InstrumentedAttribute[Id],
+    lat: float,
+    long: float,
+    less_than: float | Function[Any],
+    max_less_than: float,
+    candidate_ids: Collection[Id] | None = None,
+) -> ColumnElement[bool]:
+    """
+    Same as `distance_filter` but using the geodesic distance to the address locations
+    (only available on PostgreSQL with PostGIS). The addresses are first narrowed down to the
+    ones near enough for the largest possible range through the GiST index.
+    """
+    point = geography_point(lat, long)
+    link = link_column.class_
+    candidates: Collection[Id] | SelectOfScalar[Id]
+    if candidate_ids is None:
+        candidates = (
+            select(link_column)
+            .join(Address, col(Address.id) == link.address_id)
+            .where(geography_within(point, max_less_than))
+        )
+    else:
+        candidates = candidate_ids
+    within_range = geography_within(point, less_than)
+    return and_(col(model.id).in_(candidates), model.address.has(within_range))  # type: ignore
+
+
+def distance_filter(
+    model: Type[Store] | Type[Service],
+    link_column: InstrumentedAttribute[Id],
+    lat: float,
+    long: float,
+    less_than: float | Function[Any],
+    max_less_than: float,
+    geography: bool = False,
+    candidate_ids: Collection[Id] | None = None,
+) -> ColumnElement[bool]:
+    """
+    Same as `exact_distance_filter`, but the addresses are first narrowed down to the ones
+    near enough for the largest possible range (`max_less_than`) through the index, so that
+    the exact distance is only computed for those.
+    If `geography` is set, the address locations are used instead (see
+    `geography_distance_filter`).
+    If `candidate_ids` is given, the records are narrowed down to those ids instead (see
+    `SpatialIndex`).
+    """
+    if geography:
+        return geography_distance_filter(
+            model, link_column, lat, long, less_than, max_less_than, candidate_ids
+        )
+
+    exact = exact_distance_filter(model, lat, long, less_than)
+    if candidate_ids is not None:
+        return and_(col(model.id).in_(candidate_ids), exact)
+
+    link = link_column.class_
+    candidates = (
+        select(link_column)
+        .join(Address, col(Address.id) == link.address_id)
+        .where(nearby_addresses_filter(lat, long, max_less_than))
+    )
+    return and_(col(model.id).in_(candidates), exact)
+
+
+def in_range_ids(
+    model: Type[Store] | Type[Service],
+    link_column: InstrumentedAttribute[Id],
+    lat: float,
+    long: float,
+    less_than: float | Function[Any],
+    max_less_than: float,
+    geography: bool = False,
+    candidate_ids: Collection[Id] | None = None,
+) -> SelectOfScalar[Id]:
+    """
+    Selects the ids of the records that `distance_filter` holds for, joining them with their
+    addresses, so that other tables can be filtered by them without checking the address of
+    every record with a correlated subquery.
+    """
+    link = link_column.class_
+    query = (
+        select(link_column)
+        .join(Address, col(Address.id) == link.address_id)
+        .join(model, col(model.id) == link_column)
+    )
+    within_range: ColumnElement[bool]
+    nearby: ColumnElement[bool]
+    if geography:
+        point = geography_point(lat, long)
+        within_range = geography_within(point, less_than)
+        nearby = geography_within(point, max_less_than)
+    else:
+        within_range = distance_to_addresses(lat, long) <= less_than
+        nearby = nearby_addresses_filter(lat, long, max_less_than)
+    if candidate_ids is not None:
+        nearby = col(link_column).in_(candidate_ids)
+    return query.where(nearby, within_range)
+
+
+def store_distance_filter(
+    lat: float,
+    long: float,
+    max_range: float = MAX_DELIVERY_RANGE,
+    geography: bool = False,
+    candidate_ids: Collection[Id] | None = None,
+) -> ColumnElement[bool]:
+    return distance_filter(
+        Store,
+        StoreAddressLink.store_id,  # type: ignore
+        lat,
+        long,
+        Store.delivery_range_km,
+        max_range,
+        geography,
+        candidate_ids,
+    )
+
+
+def product_distance_filter(
+    lat: float,
+    long: float,
+    max_range: float = MAX_DELIVERY_RANGE,
+    geography: bool = False,
+    candidate_ids: Collection[Id] | None = None,
+) -> ColumnElement[bool]:
     """
-    Based on https://stackoverflow.com/a/5207131
-    Should be decently accurate for small distances (a few km)
+    The candidates are the ids of the stores. The stores in range are selected once, and the
+    products are filtered by their store id, which leads their primary key.
     """
+    store_ids = in_range_ids(
+        Store,
+        StoreAddressLink.store_id,  # type: ignore
+        lat,
+        long,
+        Store.delivery_range_km,
+        max_range,
+        geography,
+        candidate_ids,
+    )
+    return col(Product.store_id).in_(store_ids)
 
-    km_per_deg_long = Coordinates.KM_PER_DEG_LAT * cos(radians(lat))
-    return model.address.has(  # type: ignore
-        func.pow(Coordinates.KM_PER_DEG_LAT * (Address.latitude - lat), 2)
-        + func.pow(km_per_deg_long * (Address.longitude - long), 2)
-        < func.pow(less_than, 2)
+
+def service_distance_filter(
+    lat: float,
+    long: float,
+    max_range: float,
+    geography: bool = False,
+    candidate_ids: Collection[Id] | None = None,
+) -> ColumnElement[bool]:
+    return distance_filter(
+        Service,
+        ServiceAddressLink.service_id,  # type: ignore
+        lat,
+        long,
+        Service.customer_range_km,
+        max_range,
+        geography,
+        candidate_ids,
     )
 
 
-def store_distance_filter(lat: float, long: float) -> Exists:
-    return distance_filter(Store, lat, long, Store.delivery_range_km)
+def address_distance(
+    link_column: InstrumentedAttribute[Id],
+    owner_id: InstrumentedAttribute[Id],
+    lat: float,
+    long: float,
+    geography: bool = False,
+) -> ScalarSelect[float]:
+    """
+    Distance in km from (lat, long) to the address linked to `owner_id`, computed in the same
+    way as the distance filters (the geodesic distance to the address location if `geography`
+    is set)
+    """
+    link = link_column.class_
+    if geography:
+        distance = geography_distance(geography_point(lat, long))
+    else:
+        distance = distance_to_addresses(lat, long)
+    return (
+        select(distance)
+        .select_from(link)
+        .join(Address, col(Address.id) == link.address_id)
+        .where(link_column == owner_id)
+        .scalar_subquery()
+    )
 
 
-def product_distance_filter(lat: float, long: float) -> Exists:
-    return Product.store.has(store_distance_filter(lat, long))  # type: ignore
+def store_distance(lat: float, long: float, geography: bool = False) -> ScalarSelect[float]:
+    return address_distance(
+        StoreAddressLink.store_id,  # type: ignore
+        Store.id,  # type: ignore
+        lat,
+        long,
+        geography,
+    )
 
 
-def service_distance_filter(lat: float, long: float) -> Exists:
-    return distance_filter(Service, lat, long, Service.customer_range_km)
+def product_distance(lat: float, long: float, geography: bool = False) -> ScalarSelect[float]:
+    return address_distance(
+        StoreAddressLink.store_id,  # type: ignore
+        Product.store_id,  # type: ignore
+        lat,
+        long,
+        geography,
+    )
+
+
+def service_distance(lat: float, long: float, geography: bool = False) -> ScalarSelect[float]:
+    return address_distance(
+        ServiceAddressLink.service_id,  # type: ignore
+        Service.id,  # type: ignore
+        lat,
+        long,
+        geography,
+    )
+
+
+async def max_delivery_range() -> float:
+    return MAX_DELIVERY_RANGE
+
+
+# Whether the addresses have a location, by database URL
+_address_locations: dict[str, bool] = {}
+# Whether pg_trgm is installed, by database URL
+_trigram_search: dict[str, bool] = {}
+
+
+async def has_address_locations(session: AsyncSession) -> bool:
+    """
+    Returns whether the addresses have a location column (created on PostgreSQL when PostGIS
+    is available), which is only checked once per database.
+    """
+    columns = table(
+        "columns", column("table_name"), column("column_name"), schema="information_schema"
+    )
+    query = (
+        select(func.count())  # pylint: disable=not-callable
+        .select_from(columns)
+        .where(columns.c.table_name == "addresses", columns.c.column_name == "location")
+    )
+    return await _check_postgresql_once(session, _address_locations, query)
+
+
+async def has_trigram_search(session: AsyncSession) -> bool:
+    """
+    Returns whether names can be ranked by trigram similarity (on PostgreSQL when pg_trgm is
+    installed, which also indexes the names), which is only checked once per database.
+    """
+    extensions = table("pg_extension", column("extname"), schema="pg_catalog")
+    query = (
+        select(func.count())  # pylint: disable=not-callable
+        .select_from(extensions)
+        .where(extensions.c.extname == "pg_trgm")
+    )
+    return await _check_postgresql_once(session, _trigram_search, query)
+
+
+async def _check_postgresql_once(
+    session: AsyncSession, checked: dict[str, bool], query: SelectOfScalar[int]
+) -> bool:
+    """
+    Returns whether the count of `query` is positive, cached in `checked` by database URL.
+    Always false on other databases than PostgreSQL.
+    """
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+
+    url = bind.engine.url.render_as_string()
+    if url not in checked:
+        result = await session.exec(query)
+        checked[url] = result.one() > 0
+    return checked[url]
+
+
+def text_relevance(
+    text_column: InstrumentedAttribute[str], search: str, trigram: bool = False
+) -> ColumnElement[Any]:
+    """
+    Ascending sort key that puts first the values that best match a `search` (which matches
+    any value that contains it, see `BaseRepository._common_filters`): by trigram distance
+    (1 - similarity) if `trigram` is set, or else the exact matches (ignoring case) and then
+    the ones that start with it.
+    """
+    if trigram:
+        return col(text_column).op("<->", return_type=Float)(search)
+    return case(
+        (func.lower(text_column) == search.lower(), 0),
+        (col(text_column).ilike(f"{search}%"), 1),
+        else_=2,
+    )
+
+
+def expired_payments_select(
+    model: Type[Payable], created_before: datetime, limit: int
+) -> SelectOfScalar[Payable]:
+    """
+    Selects up to `limit` records whose payment was created before `created_before` and never
+    started, oldest first.
+    On PostgreSQL the selected rows are locked until the end of the transaction, and rows
+    locked by other transactions are skipped, so concurrent sweepers never expire the same
+    records twice.
+    """
+    return (
+        select(model)
+        .where(
+            model.payment_status == PaymentStatus.CREATED,
+            col(model.created_at) < created_before,
+        )
+        .order_by(col(model.created_at))
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
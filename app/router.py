@@ -16,6 +16,11 @@ from .routes.stores import router as stores_router
 from .routes.services import router as services_router
 from .routes.payments import router as payments_router
 from .db import get_db
+from .services.services.availability_cache import (
+    AvailabilityCache,
+    CacheMetrics,
+    get_availability_cache,
+)
 
 api_router = APIRouter(
     responses={
@@ -41,6 +46,14 @@ async def healthcheck(db: AsyncSession = Depends(get_db)) -> HealthCheck:
         return HealthCheck(message=f"Database connection error: {e}")
 
 
+@api_router.get("/health/availability-cache", tags=["Healthcheck"])
+async def availability_cache_metrics(
+    cache: AvailabilityCache = Depends(get_availability_cache),
+) -> CacheMetrics:
+    # The metrics are counted by each replica
+    return cache.metrics
+
+
 @auth_router.get("/fee", tags=["Fee"])
 async def get_fee() -> Decimal:
     return settings.FEE_PERCENTAGE
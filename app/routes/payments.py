@@ -5,6 +5,7 @@ from app.models.payments import PaymentUpdate
 from app.models.util import Id
 from app.services.stores import PurchasesService
 from app.services.services import AppointmentsService
+from .responses.appointments import INVALID_APPOINTMENT_ERROR
 from .responses.auth import UNAUTHORIZED
 from .util import get_exception_docs
 
@@ -33,6 +34,7 @@ async def update_purchase_status(
 @router.patch(
     "/services/{service_id}/appointments/{appointment_id}",
     status_code=status.HTTP_202_ACCEPTED,
+    responses=get_exception_docs(INVALID_APPOINTMENT_ERROR),
 )
 async def update_appointment_status(
     update: PaymentUpdate,
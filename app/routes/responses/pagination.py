@@ -0,0 +1,9 @@
+from fastapi import status, HTTPException
+
+from app.exceptions.repository import InvalidCursor
+
+
+INVALID_CURSOR_ERROR = (
+    InvalidCursor,
+    HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid pagination cursor"),
+)
@@ -1,12 +1,22 @@
 from datetime import datetime
+from typing import Annotated
 
-from fastapi import APIRouter, status, Depends, Query
-from pydantic import AwareDatetime
+from fastapi import APIRouter, status, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from pydantic import AwareDatetime, BeforeValidator
 
 from app.auth import get_caller_id, get_caller_token
-from app.models.services import AppointmentRead, AppointmentCreate, AvailableAppointmentsForSlots
+from app.models.services import (
+    AppointmentRead,
+    AppointmentCreate,
+    AvailableAppointment,
+    AvailableAppointmentsForSlots,
+    AvailableAppointmentsCount,
+    AvailabilitySummary,
+    ServiceAvailableAppointments,
+)
 from app.models.services.services import ServiceCategory
-from app.models.util import Id
+from app.models.util import CountMode, Id, KeysetCursor
 from app.routes.responses.auth import FORBIDDEN
 from app.serializers.services import AppointmentList
 from app.services.services import AppointmentsService
@@ -20,13 +30,17 @@ from ..responses.payments import (
     CANT_BUY_FROM_OWN_BUSINESS,
     OUTSIDE_BUSINESS_RANGE,
 )
-from ..util import get_exception_docs
+from ..responses.pagination import INVALID_CURSOR_ERROR
+from ..util import encode_cursor, get_cursor, get_exception_docs, list_amount, process_list
+
+MAX_SERVICES_PER_AVAILABILITY_BATCH = 50
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
 
 router = APIRouter(prefix="", tags=["Service appointments"])
 
 
-@router.get("/services/me/appointments")
+@router.get("/services/me/appointments", responses=get_exception_docs(INVALID_CURSOR_ERROR))
 async def get_my_services_appointments(
     user_id: Id = Depends(get_caller_id),
     after: AwareDatetime | None = Query(None),
@@ -34,13 +48,17 @@ async def get_my_services_appointments(
     include_partial: bool = Query(True),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     appointments_service: AppointmentsService = Depends(),
 ) -> AppointmentList:
-    appointments, count = await appointments_service.get_services_appointments_by_owner(
-        user_id, limit, offset, after, before, include_partial
+    page = await appointments_service.get_services_appointments_by_owner(
+        user_id, limit, offset, after, before, include_partial, cursor=cursor, count=count
     )
     return AppointmentList(
-        appointments=await appointments_service.get_appointments_read(*appointments), amount=count
+        appointments=await appointments_service.get_appointments_read(*page.records),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
     )
 
 
@@ -69,29 +87,49 @@ async def create_appointment(
     return (await appointments_service.get_appointments_read(appointment))[0]
 
 
-@router.get("/services/appointments/me")
+@router.get("/services/appointments/me", responses=get_exception_docs(INVALID_CURSOR_ERROR))
 async def get_my_appointments(
     after: AwareDatetime | None = Query(None),
     before: AwareDatetime | None = Query(None),
     include_partial: bool = Query(True),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     animal_id: Id | None = Query(None),
     service_category: ServiceCategory | None = Query(None),
     user_id: Id = Depends(get_caller_id),
     appointments_service: AppointmentsService = Depends(),
 ) -> AppointmentList:
     q = {"animal_id": animal_id, "service.category": service_category}
-    appointments, count = await appointments_service.get_user_appointments(
-        user_id, limit, offset, after, before, include_partial, **q
+    page = await appointments_service.get_user_appointments(
+        user_id, limit, offset, after, before, include_partial, cursor=cursor, count=count, **q
     )
     return AppointmentList(
-        appointments=await appointments_service.get_appointments_read(*appointments), amount=count
+        appointments=await appointments_service.get_appointments_read(*page.records),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
+    )
+
+
+@router.get("/services/appointments/available")
+async def get_services_available_appointments(
+    service_ids: Annotated[list[Id], BeforeValidator(process_list)] = Query(
+        ..., min_length=1, max_length=MAX_SERVICES_PER_AVAILABILITY_BATCH
+    ),
+    after: datetime | None = Query(None),
+    before: datetime | None = Query(None),
+    include_partial: bool = Query(True),
+    appointments_service: AppointmentsService = Depends(),
+) -> list[ServiceAvailableAppointments]:
+    return await appointments_service.get_services_available_appointments(
+        service_ids, after=after, before=before, include_partial=include_partial
     )
 
 
 @router.get(
-    "/services/{service_id}/appointments", responses=get_exception_docs(SERVICE_NOT_FOUND_ERROR)
+    "/services/{service_id}/appointments",
+    responses=get_exception_docs(SERVICE_NOT_FOUND_ERROR, INVALID_CURSOR_ERROR),
 )
 async def get_service_appointments(
     service_id: Id,
@@ -100,33 +138,75 @@ async def get_service_appointments(
     include_partial: bool = Query(True),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     user_id: Id = Depends(get_caller_id),
     appointments_service: AppointmentsService = Depends(),
 ) -> AppointmentList:
-    appointments, count = await appointments_service.get_service_appointments(
-        service_id, user_id, limit, offset, after, before, include_partial
+    page = await appointments_service.get_service_appointments(
+        service_id,
+        user_id,
+        limit,
+        offset,
+        after,
+        before,
+        include_partial,
+        cursor=cursor,
+        count=count,
     )
     return AppointmentList(
-        appointments=await appointments_service.get_appointments_read(*appointments), amount=count
+        appointments=await appointments_service.get_appointments_read(*page.records),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
     )
 
 
 @router.get(
     "/services/{service_id}/appointments/available",
-    responses=get_exception_docs(SERVICE_NOT_FOUND_ERROR),
+    response_model=list[AvailableAppointmentsForSlots] | list[AvailableAppointmentsCount],
+    responses={
+        status.HTTP_200_OK: {"content": {NDJSON_MEDIA_TYPE: {}}},
+        **get_exception_docs(SERVICE_NOT_FOUND_ERROR),
+    },
 )
 async def get_available_appointments(
     service_id: Id,
     after: datetime | None = Query(None),
     before: datetime | None = Query(None),
     include_partial: bool = Query(True),
+    summary: AvailabilitySummary | None = Query(None),
+    accept: str | None = Header(None),
     appointments_service: AppointmentsService = Depends(),
-) -> list[AvailableAppointmentsForSlots]:
+) -> list[AvailableAppointmentsForSlots] | list[AvailableAppointmentsCount] | StreamingResponse:
+    if summary is not None:
+        return await appointments_service.get_available_appointments_summary(
+            service_id, summary, after=after, before=before, include_partial=include_partial
+        )
+    if accept is not None and NDJSON_MEDIA_TYPE in accept:
+        available = await appointments_service.stream_available_appointments(
+            service_id, after=after, before=before, include_partial=include_partial
+        )
+        return StreamingResponse(
+            (chunk.model_dump_json() + "\n" for chunk in available),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
     return await appointments_service.get_available_appointments(
         service_id, after=after, before=before, include_partial=include_partial
     )
 
 
+@router.get(
+    "/services/{service_id}/appointments/next-available",
+    responses=get_exception_docs(SERVICE_NOT_FOUND_ERROR),
+)
+async def get_next_available_appointment(
+    service_id: Id,
+    after: datetime | None = Query(None),
+    appointments_service: AppointmentsService = Depends(),
+) -> AvailableAppointment | None:
+    return await appointments_service.get_next_available_appointment(service_id, after=after)
+
+
 @router.get(
     "/services/{service_id}/appointments/{appointment_id}",
     responses=get_exception_docs(FORBIDDEN, APPOINTMENT_NOT_FOUND_ERROR),
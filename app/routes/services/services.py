@@ -1,20 +1,54 @@
+from asyncio import gather
+from datetime import datetime
+from typing import Sequence
+
 from fastapi import APIRouter, Depends, Query
 from fastapi import status as http_status
 
-from app.models.services import ServicePublic, ServiceCreate, ServiceRead, ServiceCategory
-from app.models.util import Id
+from app.models.services import (
+    Service,
+    ServicePublic,
+    ServiceCreate,
+    ServiceRead,
+    ServiceCategory,
+)
+from app.models.util import CountMode, DistanceCursor, Id, KeysetCursor
 from app.serializers.services import ServiceList
-from app.services.services import ServicesService
+from app.services.services import AppointmentsService, ServicesService
 from app.auth import get_caller_id, get_caller_token
 from ..responses.addresses import NON_EXISTENT_ADDRESS_ERROR, ADDRESS_NOT_FOUND_ERROR
 from ..responses.services import SERVICE_NOT_FOUND_ERROR
 from ..responses.auth import FORBIDDEN
-from ..util import get_exception_docs
+from ..responses.pagination import INVALID_CURSOR_ERROR
+from ..util import (
+    encode_cursor,
+    get_cursor,
+    get_distance_cursor,
+    get_exception_docs,
+    list_amount,
+    next_distance_cursor,
+    set_distances,
+)
 
 
 router = APIRouter(prefix="/services", tags=["Services"])
 
 
+async def get_services_read_with_next_available(
+    services: Sequence[Service],
+    services_service: ServicesService,
+    appointments_service: AppointmentsService,
+) -> list[ServiceRead]:
+    services_read, next_available = await gather(
+        services_service.get_services_read(*services),
+        appointments_service.get_services_next_available_appointment(services),
+    )
+    for service_read in services_read:
+        available = next_available[service_read.id]
+        service_read.next_available = available.start if available else None
+    return list(services_read)
+
+
 @router.post(
     "",
     response_model=ServiceRead,
@@ -29,7 +63,7 @@ async def create_service(
     return await services_service.create_service(data, owner_id)
 
 
-@router.get("")
+@router.get("", responses=get_exception_docs(INVALID_CURSOR_ERROR))
 async def get_services(
     owner_id: Id | None = None,
     name: str | None = Query(None),
@@ -37,7 +71,10 @@ async def get_services(
     is_home_service: bool | None = Query(None),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     services_service: ServicesService = Depends(ServicesService),
+    appointments_service: AppointmentsService = Depends(AppointmentsService),
 ) -> ServiceList:
     query = {
         "name": name,
@@ -45,20 +82,27 @@ async def get_services(
         "category": category,
         "is_home_service": is_home_service,
     }
-    services = await services_service.get_services(limit, offset, **query)
-    services_amount = await services_service.count_services(**query)
+    page = await services_service.get_services_page(
+        limit, offset, cursor=cursor, count=count, **query
+    )
     return ServiceList(
-        services=await services_service.get_services_read(*services), amount=services_amount
+        services=await get_services_read_with_next_available(
+            page.records, services_service, appointments_service
+        ),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
     )
 
 
-@router.get("/me")
+@router.get("/me", responses=get_exception_docs(INVALID_CURSOR_ERROR))
 async def get_my_services(
     name: str | None = Query(None),
     category: ServiceCategory | None = Query(None),
     is_home_service: bool | None = Query(None),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     services_service: ServicesService = Depends(ServicesService),
     owner_id: Id = Depends(get_caller_id),
 ) -> ServiceList:
@@ -68,24 +112,32 @@ async def get_my_services(
         "category": category,
         "is_home_service": is_home_service,
     }
-    services = await services_service.get_services(limit, offset, **query)
-    services_amount = await services_service.count_services(**query)
+    page = await services_service.get_services_page(
+        limit, offset, cursor=cursor, count=count, **query
+    )
     return ServiceList(
-        services=await services_service.get_services_read(*services), amount=services_amount
+        services=await services_service.get_services_read(*page.records),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
     )
 
 
-@router.get("/nearby", responses=get_exception_docs(ADDRESS_NOT_FOUND_ERROR))
-async def get_nearby_services(
+@router.get("/nearby", responses=get_exception_docs(ADDRESS_NOT_FOUND_ERROR, INVALID_CURSOR_ERROR))
+async def get_nearby_services(  # pylint: disable=too-many-locals
     user_address_id: Id,
     name: str | None = Query(None),
     owner_id: Id | None = Query(None),
     category: ServiceCategory | None = Query(None),
     is_home_service: bool | None = Query(None),
+    available_after: datetime | None = Query(None),
+    available_before: datetime | None = Query(None),
     user_token: str = Depends(get_caller_token),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    count: CountMode = Query(CountMode.EXACT),
+    cursor: DistanceCursor | None = Depends(get_distance_cursor),
     services_service: ServicesService = Depends(ServicesService),
+    appointments_service: AppointmentsService = Depends(AppointmentsService),
     user_id: Id = Depends(get_caller_id),
 ) -> ServiceList:
     services, services_amount = await services_service.get_nearby_services(
@@ -94,13 +146,24 @@ async def get_nearby_services(
         offset,
         user_id,
         user_address_id,
+        cursor=cursor,
+        count=count,
         name=name,
         category=category,
         is_home_service=is_home_service,
         owner_id=owner_id,
+        available_after=available_after,
+        available_before=available_before,
     )
     return ServiceList(
-        services=await services_service.get_services_read(*services), amount=services_amount
+        services=set_distances(
+            await get_services_read_with_next_available(
+                [service for service, _ in services], services_service, appointments_service
+            ),
+            services,
+        ),
+        **list_amount(services_amount, count),
+        next_cursor=next_distance_cursor(services, limit),
     )
 
 
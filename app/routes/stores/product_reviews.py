@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, Query, status
 from app.auth import get_caller_id
 from app.models.stores import ProductReviewRead
 from app.models.reviews import ReviewCreate
-from app.models.util import Id, SortOrder
+from app.models.util import Id, KeysetCursor, SortOrder
 from app.routes.responses.reviews import (
     REVIEW_NOT_FOUND_ERROR,
     REVIEW_REQUIREMENTS_NOT_MET_ERROR,
@@ -12,7 +12,8 @@ from app.routes.responses.reviews import (
 from app.serializers.reviews import ReviewList
 from app.services.reviews import ReviewSortBy
 from app.services.stores import ProductReviewsService
-from ..util import get_exception_docs
+from ..responses.pagination import INVALID_CURSOR_ERROR
+from ..util import get_cursor, get_exception_docs, review_list
 
 router = APIRouter(
     prefix="/stores/{store_id}/products/{product_id}/reviews", tags=["Product reviews"]
@@ -34,7 +35,7 @@ async def create_product_review(
     return await reviews_service.create_review(review, store_id, product_id, caller_id)
 
 
-@router.get("")
+@router.get("", responses=get_exception_docs(INVALID_CURSOR_ERROR))
 async def get_product_reviews(
     store_id: Id,
     product_id: Id,
@@ -42,15 +43,16 @@ async def get_product_reviews(
     sort_order: SortOrder = Query(SortOrder.DESCENDING),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
     reviews_service: ProductReviewsService = Depends(),
 ) -> ReviewList[ProductReviewRead]:
-    reviews = await reviews_service.get_reviews(
-        limit, offset, sort_by, sort_order, store_id=store_id, product_id=product_id
+    page = await reviews_service.get_reviews(
+        limit, offset, sort_by, sort_order, cursor=cursor, store_id=store_id, product_id=product_id
     )
     count, average = await reviews_service.count_and_average_reviews(
         store_id=store_id, product_id=product_id
     )
-    return ReviewList(reviews=reviews, amount=count, average_rating=average)
+    return review_list(page.records, page.next_cursor, count, average)
 
 
 @router.get("/me", responses=get_exception_docs(REVIEW_NOT_FOUND_ERROR))
@@ -1,4 +1,4 @@
-from typing import Annotated, Sequence
+from typing import Annotated, Any, Sequence
 
 from fastapi import APIRouter, Depends, Query
 from fastapi import status as http_status
@@ -8,12 +8,20 @@ from app.auth import get_caller_id, get_caller_token
 from app.serializers.stores import ProductsList
 from app.services.stores import ProductsService
 from app.models.stores import Category, Product, ProductCreate, ProductRead
-from app.models.util import Id
+from app.models.util import CountMode, DistanceCursor, Id
 from ..responses.addresses import ADDRESS_NOT_FOUND_ERROR
 from ..responses.stores import STORE_NOT_FOUND_ERROR
 from ..responses.products import PRODUCT_EXISTS_ERROR, PRODUCT_NOT_FOUND_ERROR
 from ..responses.auth import FORBIDDEN
-from ..util import get_exception_docs, process_list
+from ..responses.pagination import INVALID_CURSOR_ERROR
+from ..util import (
+    get_distance_cursor,
+    get_exception_docs,
+    list_amount,
+    next_distance_cursor,
+    process_list,
+    set_distances,
+)
 
 router = APIRouter(tags=["Products"], prefix="/stores")
 
@@ -33,7 +41,10 @@ async def create_product(
     return await products_service.create_product(store_id, data, user_id)
 
 
-@router.get("/nearby/products", responses=get_exception_docs(ADDRESS_NOT_FOUND_ERROR))
+@router.get(
+    "/nearby/products",
+    responses=get_exception_docs(ADDRESS_NOT_FOUND_ERROR, INVALID_CURSOR_ERROR),
+)
 async def get_nearby_products(
     user_address_id: Id,
     user_token: str = Depends(get_caller_token),
@@ -41,14 +52,21 @@ async def get_nearby_products(
     categories: Annotated[list[Category], BeforeValidator(process_list)] = Query([]),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    count: CountMode = Query(CountMode.EXACT),
+    cursor: DistanceCursor | None = Depends(get_distance_cursor),
     store_service: ProductsService = Depends(ProductsService),
     user_id: Id = Depends(get_caller_id),
 ) -> ProductsList:
+    query: dict[str, Any] = {"cursor": cursor, "count": count, "name": name}
     products, products_amount = await store_service.get_nearby_products(
-        user_token, limit, offset, user_id, user_address_id, categories, name=name
+        user_token, limit, offset, user_id, user_address_id, categories, **query
     )
     return ProductsList(
-        products=await store_service.get_products_read(*products), amount=products_amount
+        products=set_distances(
+            await store_service.get_products_read(*(product for product, _ in products)), products
+        ),
+        **list_amount(products_amount, count),
+        next_cursor=next_distance_cursor(products, limit),
     )
 
 
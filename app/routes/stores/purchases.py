@@ -3,8 +3,8 @@ from pydantic import PositiveInt
 
 from app.auth import get_caller_id, get_caller_token
 from app.models.stores import Purchase, PurchaseRead
-from app.models.util import Id
-from app.routes.util import get_exception_docs
+from app.models.util import CountMode, Id, KeysetCursor
+from app.routes.util import encode_cursor, get_cursor, get_exception_docs, list_amount
 from app.serializers.stores import PurchaseList
 from app.services.stores import PurchasesService
 from ..responses.stores import STORE_NOT_FOUND_ERROR
@@ -16,6 +16,7 @@ from ..responses.payments import (
     OUTSIDE_BUSINESS_RANGE,
 )
 from ..responses.auth import FORBIDDEN
+from ..responses.pagination import INVALID_CURSOR_ERROR
 
 router = APIRouter(prefix="", tags=["Purchases"])
 
@@ -48,30 +49,45 @@ async def create_store_purchase(
     return (await purchases_service.get_purchases_read(purchase))[0]
 
 
-@router.get("/stores/purchases/me")
+@router.get("/stores/purchases/me", responses=get_exception_docs(INVALID_CURSOR_ERROR))
 async def get_my_purchases(
     user_id: Id = Depends(get_caller_id),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     purchases_service: PurchasesService = Depends(),
 ) -> PurchaseList:
-    purchases, count = await purchases_service.get_user_purchases(user_id, limit, offset)
+    page = await purchases_service.get_user_purchases(
+        user_id, limit, offset, cursor=cursor, count=count
+    )
     return PurchaseList(
-        purchases=await purchases_service.get_purchases_read(*purchases), amount=count
+        purchases=await purchases_service.get_purchases_read(*page.records),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
     )
 
 
-@router.get("/stores/{store_id}/purchases", responses=get_exception_docs(FORBIDDEN))
+@router.get(
+    "/stores/{store_id}/purchases",
+    responses=get_exception_docs(FORBIDDEN, INVALID_CURSOR_ERROR),
+)
 async def get_store_purchases(
     store_id: Id,
     user_id: Id = Depends(get_caller_id),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     purchases_service: PurchasesService = Depends(),
 ) -> PurchaseList:
-    purchases, count = await purchases_service.get_store_purchases(store_id, user_id, limit, offset)
+    page = await purchases_service.get_store_purchases(
+        store_id, user_id, limit, offset, cursor=cursor, count=count
+    )
     return PurchaseList(
-        purchases=await purchases_service.get_purchases_read(*purchases), amount=count
+        purchases=await purchases_service.get_purchases_read(*page.records),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
     )
 
 
@@ -1,15 +1,26 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends, Query
 from fastapi import status as http_status
 
 from app.models.stores import StoreCreate, StoreRead
-from app.models.util import Id
+from app.models.util import CountMode, DistanceCursor, Id, KeysetCursor
 from app.serializers.stores import StoreList
 from app.services.stores import StoresService
 from app.auth import get_caller_id, get_caller_token
 from ..responses.addresses import NON_EXISTENT_ADDRESS_ERROR, ADDRESS_NOT_FOUND_ERROR
 from ..responses.stores import STORE_NOT_FOUND_ERROR
 from ..responses.auth import FORBIDDEN
-from ..util import get_exception_docs
+from ..responses.pagination import INVALID_CURSOR_ERROR
+from ..util import (
+    encode_cursor,
+    get_cursor,
+    get_distance_cursor,
+    get_exception_docs,
+    list_amount,
+    next_distance_cursor,
+    set_distances,
+)
 
 
 router = APIRouter(prefix="/stores", tags=["Stores"])
@@ -30,35 +41,45 @@ async def create_store(
     return (await store_service.get_stores_read(store))[0]
 
 
-@router.get("")
+@router.get("", responses=get_exception_docs(INVALID_CURSOR_ERROR))
 async def get_stores(
     owner_id: Id | None = None,
     name: str | None = Query(None),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     store_service: StoresService = Depends(StoresService),
 ) -> StoreList:
     query = {"name": name, "owner_id": owner_id}
-    stores = await store_service.get_stores(limit, offset, **query)
-    stores_amount = await store_service.count_stores(**query)
-    return StoreList(stores=await store_service.get_stores_read(*stores), amount=stores_amount)
+    page = await store_service.get_stores_page(limit, offset, cursor=cursor, count=count, **query)
+    return StoreList(
+        stores=await store_service.get_stores_read(*page.records),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
+    )
 
 
-@router.get("/me")
+@router.get("/me", responses=get_exception_docs(INVALID_CURSOR_ERROR))
 async def get_my_stores(
     name: str | None = Query(None),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: KeysetCursor | None = Depends(get_cursor),
+    count: CountMode = Query(CountMode.EXACT),
     store_service: StoresService = Depends(StoresService),
     owner_id: Id = Depends(get_caller_id),
 ) -> StoreList:
     query = {"name": name, "owner_id": owner_id}
-    stores = await store_service.get_stores(limit, offset, **query)
-    stores_amount = await store_service.count_stores(**query)
-    return StoreList(stores=await store_service.get_stores_read(*stores), amount=stores_amount)
+    page = await store_service.get_stores_page(limit, offset, cursor=cursor, count=count, **query)
+    return StoreList(
+        stores=await store_service.get_stores_read(*page.records),
+        next_cursor=encode_cursor(page.next_cursor),
+        **list_amount(page.total, count),
+    )
 
 
-@router.get("/nearby", responses=get_exception_docs(ADDRESS_NOT_FOUND_ERROR))
+@router.get("/nearby", responses=get_exception_docs(ADDRESS_NOT_FOUND_ERROR, INVALID_CURSOR_ERROR))
 async def get_nearby_stores(
     user_address_id: Id,
     name: str | None = Query(None),
@@ -66,13 +87,22 @@ async def get_nearby_stores(
     user_token: str = Depends(get_caller_token),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    count: CountMode = Query(CountMode.EXACT),
+    cursor: DistanceCursor | None = Depends(get_distance_cursor),
     store_service: StoresService = Depends(StoresService),
     user_id: Id = Depends(get_caller_id),
 ) -> StoreList:
+    query: dict[str, Any] = {"name": name, "owner_id": owner_id}
     stores, stores_amount = await store_service.get_nearby_stores(
-        user_token, limit, offset, user_id, user_address_id, name=name, owner_id=owner_id
+        user_token, limit, offset, user_id, user_address_id, cursor=cursor, count=count, **query
+    )
+    return StoreList(
+        stores=set_distances(
+            await store_service.get_stores_read(*(store for store, _ in stores)), stores
+        ),
+        **list_amount(stores_amount, count),
+        next_cursor=next_distance_cursor(stores, limit),
     )
-    return StoreList(stores=await store_service.get_stores_read(*stores), amount=stores_amount)
 
 
 @router.get("/{store_id}", responses=get_exception_docs(STORE_NOT_FOUND_ERROR))
@@ -1,11 +1,24 @@
-from typing import Any, Type
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import binascii
+import json
+from typing import Any, Sequence, Type, TypeVar
+from uuid import UUID
 
-from fastapi import HTTPException, UploadFile
+from fastapi import HTTPException, Query, UploadFile
 import filetype  # type: ignore
 
+from app.models.reviews import ReviewRead
+from app.models.services import ServiceRead
+from app.models.stores import ProductRead, StoreRead
+from app.exceptions.repository import InvalidCursor
+from app.models.util import CAPPED_COUNT, CountMode, DistanceCursor, KeysetCursor, UUIDModel
+from app.serializers.reviews import ReviewList
 from .responses.image import INVALID_IMAGE_ERROR
 from ..validators.error_schema import ErrorSchema
 
+NearbyRead = TypeVar("NearbyRead", StoreRead, ProductRead, ServiceRead)
+Review = TypeVar("Review", bound=ReviewRead)
+
 
 def get_exception_docs(
     *exceptions: HTTPException | tuple[Type[Exception], HTTPException]
@@ -43,3 +56,99 @@ def process_list(data: list[Any] | str) -> list[Any]:
     Converts a string to a list of strings, or returns the list as is.
     """
     return data.split(",") if isinstance(data, str) else data
+
+
+def get_cursor(cursor: str | None = Query(None)) -> KeysetCursor | None:
+    """
+    Decodes the cursor of a page of a listing, and raises an exception if it's invalid. Its
+    values are checked against the sort keys of the listing by the repository.
+    """
+    if cursor is None:
+        return None
+    values = __decode_cursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor
+    return values
+
+
+def encode_cursor(values: KeysetCursor | None) -> str | None:
+    """
+    Encodes the cursor of the next page of a listing, or returns None if there is none.
+    """
+    if values is None:
+        return None
+    return __encode_cursor(values)
+
+
+def get_distance_cursor(cursor: str | None = Query(None)) -> DistanceCursor | None:
+    """
+    Decodes the cursor of a page of nearby records, and raises an exception if it's invalid.
+    """
+    if cursor is None:
+        return None
+    try:
+        distance, record_id = __decode_cursor(cursor)
+        return float(distance), UUID(record_id)
+    except (AttributeError, TypeError, ValueError) as e:
+        raise InvalidCursor from e
+
+
+def next_distance_cursor(records: Sequence[tuple[UUIDModel, float]], limit: int) -> str | None:
+    """
+    Returns the cursor of the page that follows a page of nearby records, or None if the page
+    isn't full (so there are no more records).
+    """
+    if len(records) < limit:
+        return None
+    record, distance = records[-1]
+    return __encode_cursor([distance, record.id])
+
+
+def __encode_cursor(values: Sequence[Any]) -> str:
+    # Datetimes, ids and decimals are sent as strings, and parsed back by their columns' types
+    return urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def __decode_cursor(cursor: str) -> Any:
+    try:
+        return json.loads(urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor from e
+
+
+def set_distances(
+    records_read: Sequence[NearbyRead], records: Sequence[tuple[Any, float]]
+) -> list[NearbyRead]:
+    """
+    Sets the distance of each nearby record to its readable version.
+    """
+    for record_read, (_, distance) in zip(records_read, records):
+        record_read.distance_km = distance
+    return list(records_read)
+
+
+def review_list(
+    reviews: Sequence[Review],
+    next_cursor: KeysetCursor | None,
+    amount: int,
+    average_rating: float | None,
+) -> ReviewList[Review]:
+    """
+    Returns a listing of a page of reviews, with the amount and average rating of all of them.
+    """
+    return ReviewList(
+        reviews=reviews,
+        amount=amount,
+        average_rating=average_rating,
+        next_cursor=encode_cursor(next_cursor),
+    )
+
+
+def list_amount(amount: int | None, count: CountMode) -> dict[str, Any]:
+    """
+    Returns the amount fields of a listing counted as `count` says, where a capped count over
+    `CAPPED_COUNT` is shown as "`CAPPED_COUNT`+".
+    """
+    if count == CountMode.CAPPED and amount is not None and amount > CAPPED_COUNT:
+        return {"amount": CAPPED_COUNT, "amount_capped": True}
+    return {"amount": amount}
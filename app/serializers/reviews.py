@@ -11,3 +11,5 @@ class ReviewList(BaseModel, Generic[R]):
     reviews: Sequence[R]
     amount: int
     average_rating: float | None
+    # Cursor of the next page, only set when there may be more results
+    next_cursor: str | None = None
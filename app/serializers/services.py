@@ -7,9 +7,19 @@ from app.models.services import ServiceRead, AppointmentRead
 
 class ServiceList(BaseModel):
     services: Sequence[ServiceRead]
-    amount: int
+    # Not set when the listing isn't counted, and at most `CAPPED_COUNT` when it's capped
+    amount: int | None
+    # Whether there are more records than `amount`, only set when the count is capped
+    amount_capped: bool = False
+    # Cursor of the next page, only set when there may be more results
+    next_cursor: str | None = None
 
 
 class AppointmentList(BaseModel):
     appointments: Sequence[AppointmentRead]
-    amount: int
+    # Not set when the listing isn't counted, and at most `CAPPED_COUNT` when it's capped
+    amount: int | None
+    # Whether there are more records than `amount`, only set when the count is capped
+    amount_capped: bool = False
+    # Cursor of the next page, only set when there may be more results
+    next_cursor: str | None = None
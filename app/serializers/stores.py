@@ -7,14 +7,29 @@ from app.models.stores import StoreRead, ProductRead, PurchaseRead
 
 class StoreList(BaseModel):
     stores: Sequence[StoreRead]
-    amount: int
+    # Not set when the listing isn't counted, and at most `CAPPED_COUNT` when it's capped
+    amount: int | None
+    # Whether there are more records than `amount`, only set when the count is capped
+    amount_capped: bool = False
+    # Cursor of the next page, only set when there may be more results
+    next_cursor: str | None = None
 
 
 class ProductsList(BaseModel):
     products: Sequence[ProductRead]
-    amount: int
+    # Not set when the listing isn't counted, and at most `CAPPED_COUNT` when it's capped
+    amount: int | None
+    # Whether there are more records than `amount`, only set when the count is capped
+    amount_capped: bool = False
+    # Cursor of the next page, only set when there may be more results
+    next_cursor: str | None = None
 
 
 class PurchaseList(BaseModel):
     purchases: Sequence[PurchaseRead]
-    amount: int
+    # Not set when the listing isn't counted, and at most `CAPPED_COUNT` when it's capped
+    amount: int | None
+    # Whether there are more records than `amount`, only set when the count is capped
+    amount_capped: bool = False
+    # Cursor of the next page, only set when there may be more results
+    next_cursor: str | None = None
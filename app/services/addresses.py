@@ -2,6 +2,7 @@ import httpx
 
 from app.config import settings
 from app.models.addresses import AddressCreate, Address
+from app.models.geohash import encode
 from app.models.util import Coordinates
 from app.exceptions.addresses import NonExistentAddress
 
@@ -40,4 +41,8 @@ class AddressesService:
     @staticmethod
     async def get_address(address: AddressCreate) -> Address:
         coords = await AddressesService.get_address_coordinates(address)
-        return Address(**address.model_dump(), **coords.model_dump())
+        return Address(
+            **address.model_dump(),
+            **coords.model_dump(),
+            geohash=encode(coords.latitude, coords.longitude),
+        )
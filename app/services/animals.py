@@ -9,10 +9,12 @@ from app.models.util import Id
 REQUEST_TIMEOUT = Timeout(5, read=45)
 
 
+def new_animals_client() -> AsyncClient:
+    return AsyncClient(base_url=settings.ANIMALS_SERVICE_URL, timeout=REQUEST_TIMEOUT)
+
+
 async def animals_client() -> AsyncGenerator[AsyncClient, None]:
-    async with AsyncClient(
-        base_url=settings.ANIMALS_SERVICE_URL, timeout=REQUEST_TIMEOUT
-    ) as client:
+    async with new_animals_client() as client:
         yield client
 
 
@@ -0,0 +1,192 @@
+from asyncio import CancelledError, create_task, sleep
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import logging
+from typing import AsyncIterator
+
+from httpx import AsyncClient
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.db import SessionLocal
+from app.repositories.services import (
+    AppointmentsRepository,
+    ServicesRepository,
+    SlotOccupancyRepository,
+)
+from app.repositories.stores import ProductsRepository, PurchasesRepository, StoresRepository
+from .animals import AnimalsService, new_animals_client
+from .files import FilesService
+from .payments import PaymentsService
+from .services import AppointmentsService, ServicesService
+from .services.availability_cache import get_availability_cache
+from .spatial_index import get_services_index, get_stores_index
+from .stores import ProductsService, PurchasesService, StoresService
+from .users import UsersService, new_users_client
+
+
+@dataclass
+class ExpiryClients:
+    """
+    Clients of other services and the storage used to notify expirations, shared by every
+    batch of the sweeper
+    """
+
+    users: AsyncClient
+    animals: AsyncClient
+    stores_images: FilesService
+    products_images: FilesService
+    services_images: FilesService
+
+    @classmethod
+    @asynccontextmanager
+    async def open(cls) -> AsyncIterator["ExpiryClients"]:
+        async with AsyncExitStack() as stack:
+            containers = [
+                await stack.enter_async_context(FilesService.new_container_client(name))
+                for name in (
+                    settings.STORES_IMAGES_CONTAINER,
+                    settings.PRODUCTS_IMAGES_CONTAINER,
+                    settings.SERVICES_IMAGES_CONTAINER,
+                )
+            ]
+            yield cls(
+                users=await stack.enter_async_context(new_users_client()),
+                animals=await stack.enter_async_context(new_animals_client()),
+                stores_images=FilesService(containers[0]),
+                products_images=FilesService(containers[1]),
+                services_images=FilesService(containers[2]),
+            )
+
+
+def build_expiry_services(
+    session: AsyncSession, clients: ExpiryClients
+) -> tuple[AppointmentsService, PurchasesService]:
+    """
+    Builds the services that expire appointments and purchases outside of a request, in the
+    same way as their dependencies are resolved for a request
+    """
+    users_service = UsersService(client=clients.users)
+    payments_service = PaymentsService(users_service=users_service)
+    appointments_repo = AppointmentsRepository(session)
+    occupancy_repo = SlotOccupancyRepository(session)
+    stores_service = StoresService(
+        stores_repo=StoresRepository(session),
+        files_service=clients.stores_images,
+        users_service=users_service,
+        spatial_index=get_stores_index(),
+    )
+    services_service = ServicesService(
+        services_repo=ServicesRepository(session),
+        files_service=clients.services_images,
+        users_service=users_service,
+        appointments_repo=appointments_repo,
+        occupancy_repo=occupancy_repo,
+        availability_cache=get_availability_cache(),
+        spatial_index=get_services_index(),
+    )
+    appointments_service = AppointmentsService(
+        appointments_repo=appointments_repo,
+        services_service=services_service,
+        users_service=users_service,
+        payments_service=payments_service,
+        animals_service=AnimalsService(client=clients.animals),
+        occupancy_repo=occupancy_repo,
+        availability_cache=get_availability_cache(),
+    )
+    purchases_service = PurchasesService(
+        stores_service=stores_service,
+        products_service=ProductsService(
+            products_repo=ProductsRepository(session),
+            stores_service=stores_service,
+            files_service=clients.products_images,
+            users_service=users_service,
+        ),
+        users_service=users_service,
+        payments_service=payments_service,
+        purchases_repo=PurchasesRepository(session),
+    )
+    return appointments_service, purchases_service
+
+
+class ExpirySweeper:
+    """
+    Expires the appointments and purchases whose payment was created more than `ttl` ago
+    and never started, so that they stop holding slots and stock.
+
+    Every batch is committed on its own, and the selected rows are locked skipping the ones
+    already locked, so more than one replica can sweep at the same time.
+    """
+
+    def __init__(
+        self, ttl: timedelta, batch_size: int, interval: float, clients: ExpiryClients
+    ) -> None:
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.interval = interval
+        self.clients = clients
+
+    async def expire_batch(self, created_before: datetime) -> tuple[int, int]:
+        """
+        Expires up to `batch_size` appointments and purchases created before `created_before`.
+        Returns the amount of expired appointments and purchases.
+        """
+        async with SessionLocal() as session:
+            appointments_service, purchases_service = build_expiry_services(session, self.clients)
+            appointments = await appointments_service.expire_appointments(
+                created_before, self.batch_size
+            )
+            purchases = await purchases_service.expire_purchases(created_before, self.batch_size)
+            await session.commit()
+            # Notify once the rows are unlocked, and only about expirations that were committed
+            await appointments_service.notify_expired_appointments(appointments)
+            await purchases_service.notify_expired_purchases(purchases)
+        return len(appointments), len(purchases)
+
+    async def sweep(self, now: datetime | None = None) -> tuple[int, int]:
+        """
+        Expires batches until every stale appointment and purchase is expired.
+        Returns the total amount of expired appointments and purchases.
+        """
+        created_before = (now or datetime.now(timezone.utc)) - self.ttl
+        total_appointments, total_purchases = 0, 0
+        while True:
+            appointments, purchases = await self.expire_batch(created_before)
+            total_appointments += appointments
+            total_purchases += purchases
+            if appointments < self.batch_size and purchases < self.batch_size:
+                return total_appointments, total_purchases
+
+    async def run(self) -> None:
+        while True:
+            try:
+                appointments, purchases = await self.sweep()
+                if appointments or purchases:
+                    logging.info(f"Expired {appointments} appointments and {purchases} purchases")
+            except Exception as e:
+                logging.error("Failed to expire unpaid appointments and purchases", exc_info=e)
+            await sleep(self.interval)
+
+
+@asynccontextmanager
+async def run_expiry_sweeper() -> AsyncIterator[None]:
+    if settings.EXPIRY_SWEEP_INTERVAL <= 0:
+        yield
+        return
+
+    async with ExpiryClients.open() as clients:
+        sweeper = ExpirySweeper(
+            timedelta(minutes=settings.PAYMENT_EXPIRATION_MINUTES),
+            settings.EXPIRY_SWEEP_BATCH_SIZE,
+            settings.EXPIRY_SWEEP_INTERVAL,
+            clients,
+        )
+        task = create_task(sweeper.run())
+        try:
+            yield
+        finally:
+            # Stop it before closing the clients it uses
+            task.cancel()
+            with suppress(CancelledError):
+                await task
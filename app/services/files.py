@@ -65,14 +65,18 @@ class FilesService:
             token = self.get_token()
         return f"{blob.url}?{token}"
 
+    @staticmethod
+    def new_container_client(container_name: str) -> ContainerClient:
+        return ContainerClient.from_connection_string(
+            settings.STORAGE_CONNECTION_STRING, container_name
+        )
+
     @staticmethod
     def generator(
         container_name: str,
     ) -> Callable[[], AsyncGenerator["FilesService", None]]:
         async def get_service() -> AsyncGenerator[FilesService, None]:
-            async with ContainerClient.from_connection_string(
-                settings.STORAGE_CONNECTION_STRING, container_name
-            ) as container:
+            async with FilesService.new_container_client(container_name) as container:
                 yield FilesService(container)
 
         return get_service
@@ -1,3 +1,4 @@
+from datetime import datetime, timedelta, timezone
 import logging
 
 from fastapi import Depends, status
@@ -36,6 +37,10 @@ class PaymentsService:
             # No update
             return False
 
+        if model.payment_status == PaymentStatus.EXPIRED and new_status == PaymentStatus.CANCELLED:
+            # Expired payments already released what they were holding
+            return False
+
         if model.payment_status in FORBIDDEN_STATUS_CHANGES:
             logging.warning(
                 f"Tried to update status of payment from '{model.payment_status}' to '{new_status}'"
@@ -46,6 +51,14 @@ class PaymentsService:
         model.payment_url = None
         return True
 
+    def expire_payment(self, model: PaymentStatusModel) -> None:
+        """
+        Marks a payment that never started as expired. Unlike a cancelled payment, it can still
+        be completed by a payment started right before its preference expired.
+        """
+        model.payment_status = PaymentStatus.EXPIRED
+        model.payment_url = None
+
     async def check_payment_conditions(
         self, s: Store | Service, user_id: Id, user_address_id: Id, token: str
     ) -> None:
@@ -65,7 +78,12 @@ class PaymentsService:
     ) -> str:
         """
         Creates a payment preference using the payment service and returns the preference URL.
+        The preference expires after `PAYMENT_EXPIRATION_MINUTES`, when the payment expires.
         """
+        data["preference_data"]["expires"] = True
+        data["preference_data"]["expiration_date_to"] = datetime.now(timezone.utc) + timedelta(
+            minutes=settings.PAYMENT_EXPIRATION_MINUTES
+        )
         async with AsyncClient(
             headers={"Authorization": f"Bearer {token}"}, timeout=REQUEST_TIMEOUT
         ) as client:
@@ -1,9 +1,10 @@
-from typing import Generic, Any, Literal, Sequence, Unpack
+from typing import Generic, Any, Literal, Unpack
 
 from app.exceptions.repository import RecordNotFound
 from app.exceptions.reviews import AlreadyReviewed, ReviewNotFound
 from app.models.reviews import ReviewCreate
-from app.models.util import SortOrder
+from app.models.util import CountMode, KeysetCursor, SortOrder
+from app.repositories.base_repository import Page
 from app.repositories.reviews import ReviewsRepository, R, PK
 
 ReviewSortBy = Literal["updated_at", "created_at", "rating"]
@@ -39,9 +40,17 @@ class ReviewsService(Generic[R, *PK]):
         skip: int,
         sort_by: ReviewSortBy | None = None,
         sort_order: SortOrder = SortOrder.DESCENDING,
+        *,
+        cursor: KeysetCursor | None = None,
         **filters: Any,
-    ) -> Sequence[R]:
-        return await self.repository.get_all(skip, limit, sort_by, sort_order, **filters)
+    ) -> Page[R]:
+        """
+        Returns a page of reviews, uncounted (see `count_and_average_reviews`). If `cursor` is
+        given, the reviews start after it.
+        """
+        return await self.repository.get_page(
+            skip, limit, sort_by, sort_order, cursor=cursor, count=CountMode.NONE, **filters
+        )
 
     async def count_and_average_reviews(self, **filters: Any) -> tuple[int, float | None]:
         return await self.repository.count_and_average_all(**filters)
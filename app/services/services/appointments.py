@@ -1,11 +1,11 @@
 from asyncio import gather
-from datetime import datetime, timedelta, time, date
-from typing import Any, Generator, Iterable, Sequence
+from datetime import datetime
+from functools import partial
+from typing import Any, Generator, Iterator, Mapping, Sequence
 from zoneinfo import ZoneInfo
 import logging
 
 from fastapi import Depends
-from intervaltree import IntervalTree  # type: ignore
 
 from app.config import settings
 from app.exceptions.appointments import AppointmentNotFound, InvalidAppointment
@@ -20,16 +20,30 @@ from app.models.services import (
     Service,
     AvailableAppointmentsForSlots,
     AvailableAppointmentsList,
+    AvailableAppointmentsCount,
+    AvailabilitySummary,
+    ServiceAvailableAppointments,
+    SlotOccupancy,
 )
-from app.models.services.appointment_slots import DayOfWeek
 from app.models.services.appointments import AppointmentRead
-from app.models.util import Id
+from app.models.util import CountMode, Id, KeysetCursor
 from app.models.payments import PaymentStatus, PaymentStatusUpdate
-from app.repositories.services import AppointmentsRepository
+from app.repositories.base_repository import Page
+from app.repositories.services import AppointmentsRepository, SlotOccupancyRepository
 from ..animals import AnimalsService
 from ..users import Notification, UsersService
 from ..payments import PaymentsService
 from .services import ServicesService
+from .availability_cache import AvailabilityCache, get_availability_cache
+from .availability import (
+    SECONDS_PER_DAY,
+    SECONDS_PER_HOUR,
+    available_slots,
+    from_wall_seconds,
+    get_availability_range,
+    occupancy_by_slot_start,
+    slot_templates,
+)
 
 
 class AppointmentsService:
@@ -40,12 +54,16 @@ class AppointmentsService:
         users_service: UsersService = Depends(),
         payments_service: PaymentsService = Depends(),
         animals_service: AnimalsService = Depends(),
+        occupancy_repo: SlotOccupancyRepository = Depends(),
+        availability_cache: AvailabilityCache = Depends(get_availability_cache),
     ):
         self.appointments_repo = appointments_repo
         self.services_service = services_service
         self.users_service = users_service
         self.payments_service = payments_service
         self.animals_service = animals_service
+        self.occupancy_repo = occupancy_repo
+        self.availability_cache = availability_cache
 
     async def create_appointment(
         self,
@@ -61,38 +79,55 @@ class AppointmentsService:
         start = service.to_tz(data.start)
         logging.debug(f"Creating appointment for service {service_id} at {start}")
 
-        available_appointments, _, _ = await gather(
-            self.get_available_appointments(service, after=start, now=now),
+        bookable_slot = self.__get_bookable_slot(service, start, now)
+        if bookable_slot is None:
+            logging.debug(f"No appointment of {service_id} starts at {start}")
+            raise InvalidAppointment
+        slots_config, end = bookable_slot
+
+        await gather(
             self.animals_service.validate_animal(customer_id, data.animal_id, token),
             self.payments_service.check_payment_conditions(
                 service, customer_id, user_address_id, token
             ),
         )
-
-        for slots_config, available_appointment in available_appointments.iterate_appointments():
-            if available_appointment.start == start:
-                break
-        else:
+        # Checked without locking first, to avoid waiting for the slot's lock when it is full
+        occupancy = await self.occupancy_repo.get_by_id((service.id, start))
+        if occupancy is not None and occupancy.amount >= slots_config.max_appointments_per_slot:
             logging.debug(f"No available appointment found for {service_id} at {start}")
             raise InvalidAppointment
 
         appointment = Appointment(
             start=start,
             animal_id=data.animal_id,
-            end=available_appointment.end,
+            end=end,
             payment_status=PaymentStatus.CREATED,
             service=service,
             customer_id=customer_id,
             customer_address_id=user_address_id,
             price=slots_config.appointment_price,
         )
-
         payment_data = await self.__build_order(service, appointment, slots_config)
+
+        # Reserve the place in the database, so that concurrent bookings can't overbook the
+        # slot. The slot's row stays locked until the request's transaction ends, so the
+        # payment preference is the only call to other services from here on. It has to be
+        # created after the reservation: if the slot is taken, no payable preference is left
+        # behind, and if creating it fails, the reservation is rolled back.
+        if not await self.occupancy_repo.try_increment(
+            service.id, start, end, slots_config.max_appointments_per_slot
+        ):
+            logging.debug(f"No available appointment found for {service_id} at {start}")
+            raise InvalidAppointment
         appointment.payment_url = await self.payments_service.create_preference(
             payment_data, service.owner_id, token
         )
-        await self.__send_appointment_notification(appointment)
-        return await self.appointments_repo.save(appointment)
+        self.__invalidate_after_commit(service.id)
+        appointment = await self.appointments_repo.save(appointment)
+        self.appointments_repo.after_commit(
+            partial(self.__send_appointment_notification, appointment)
+        )
+        return appointment
 
     async def get_available_appointments(
         self,
@@ -116,37 +151,218 @@ class AppointmentsService:
         range will also be returned. Defaults to `True`.
 
         `now` can be used to override the current time. Defaults to the current time.
+        Results are cached unless `now` is overridden, so they can be up to the cache's TTL
+        old (e.g. include appointments that already started), but they are invalidated as
+        soon as the availability of the service changes.
         """
+        cache_key = (after, before, include_partial)
+        use_cache = now is None
+        if use_cache:
+            service_id = service if isinstance(service, Id) else service.id
+            cached = await self.availability_cache.get(service_id, *cache_key)
+            if cached is not None:
+                return cached
+
         if isinstance(service, Id):
             service = await self.services_service.get_service_by_id(service)
-        slots_per_day: dict[int, list[AppointmentSlots]] = {}
-        for slot in service.appointment_slots:
-            slots_per_day.setdefault(slot.start_day.to_weekday(), []).append(slot)
 
-        now = service.to_tz(now) if now else datetime.now(ZoneInfo(service.timezone))
-        after = max(now, service.to_tz(after)) if after else now
-        max_start = self.__get_max_allowed_appointment_start(service, now)
-        before = min(max_start, service.to_tz(before)) if before else max_start
-
-        today = now.date()
-        appointments = await self.__get_open_appointments_in_range(service.id, after, before)
+        now, after, before = get_availability_range(service, after, before, now)
+        occupancy = await self.__get_slot_occupancy(service.id, after, before)
 
         logging.debug(
             f"Getting available appointments for {service.id=} from {after} to {before}. "
-            f"Found {len(appointments)} existing appointments in the range."
+            f"Found {len(occupancy)} occupied slots in the range."
+        )
+        available_appointments = self.__available_appointments(
+            service,
+            occupancy_by_slot_start(service, occupancy),
+            now,
+            after,
+            before,
+            include_partial,
+        )
+        if use_cache:
+            await self.availability_cache.set(service.id, *cache_key, available_appointments)
+        return available_appointments
+
+    async def stream_available_appointments(
+        self,
+        service: Id | Service,
+        *,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        include_partial: bool = True,
+        now: datetime | None = None,
+    ) -> Iterator[AvailableAppointmentsForSlots]:
+        """
+        Same as `get_available_appointments`, but the available appointments are lazily
+        computed one slots configuration at a time while the returned iterator is consumed,
+        instead of building the whole list in memory. Consecutive occurrences of the same
+        slots configuration are not merged, so they come as separate chunks.
+        """
+        if isinstance(service, Id):
+            service = await self.services_service.get_service_by_id(service)
+
+        now, after, before = get_availability_range(service, after, before, now)
+        occupancy = await self.__get_slot_occupancy(service.id, after, before)
+        return self.__iterate_available_appointments(
+            service,
+            occupancy_by_slot_start(service, occupancy),
+            now,
+            after,
+            before,
+            include_partial,
+            merge=False,
         )
 
-        appointments_tree = IntervalTree.from_tuples((a.start, a.end) for a in appointments)
-        available_appointments = AvailableAppointmentsList()
-        for d in range(0, service.appointment_days_in_advance + 1):
-            current_date = today + timedelta(days=d)
-            self.__merge_or_extend_available(
-                available_appointments,
-                self.__date_available_appointments(
-                    current_date, appointments_tree, slots_per_day, after, before, include_partial
+    async def get_available_appointments_summary(
+        self,
+        service: Id | Service,
+        summary: AvailabilitySummary,
+        *,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        include_partial: bool = True,
+        now: datetime | None = None,
+    ) -> list[AvailableAppointmentsCount]:
+        """
+        Gets the amount of available appointments for the given service per day or per hour
+        (in the service's timezone), sorted by start time. Periods without available
+        appointments are omitted.
+
+        The rest of the parameters behave as in `get_available_appointments`.
+        """
+        if isinstance(service, Id):
+            service = await self.services_service.get_service_by_id(service)
+
+        now, after, before = get_availability_range(service, after, before, now)
+        occupancy = await self.__get_slot_occupancy(service.id, after, before)
+
+        period_seconds = SECONDS_PER_DAY if summary == AvailabilitySummary.DAY else SECONDS_PER_HOUR
+        counts: dict[int, int] = {}
+        for _, starts, amounts in available_slots(
+            service,
+            occupancy_by_slot_start(service, occupancy),
+            now,
+            after,
+            before,
+            include_partial,
+        ):
+            for start, amount in zip(starts, amounts):
+                period = start - start % period_seconds
+                counts[period] = counts.get(period, 0) + amount
+
+        # Available appointments are generated in order, so are the periods
+        return [
+            AvailableAppointmentsCount(
+                start=from_wall_seconds(p, ZoneInfo(service.timezone)), amount=a
+            )
+            for p, a in counts.items()
+        ]
+
+    async def get_services_available_appointments(
+        self,
+        service_ids: Sequence[Id],
+        *,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        include_partial: bool = True,
+        now: datetime | None = None,
+    ) -> list[ServiceAvailableAppointments]:
+        """
+        Gets the available appointments for many services at once, with a single query for
+        the services and a single query for their existing appointments.
+        The result follows the order of `service_ids`. Ids of services that don't exist
+        are skipped.
+
+        The rest of the parameters behave as in `get_available_appointments`, and are applied
+        to each service in its own timezone.
+        """
+        services = await self.services_service.get_services(id=list(set(service_ids)))
+        if not services:
+            return []
+
+        ranges = {s.id: get_availability_range(s, after, before, now) for s in services}
+        occupancy = await self.__get_slot_occupancy(
+            [s.id for s in services],
+            min(after for _, after, _ in ranges.values()),
+            max(before for _, _, before in ranges.values()),
+        )
+        occupancy_per_service: dict[Id, list[SlotOccupancy]] = {}
+        for slot_occupancy in occupancy:
+            occupancy_per_service.setdefault(slot_occupancy.service_id, []).append(slot_occupancy)
+
+        logging.debug(
+            f"Getting available appointments for {len(services)} services. "
+            f"Found {len(occupancy)} occupied slots in their ranges."
+        )
+        services_by_id = {s.id: s for s in services}
+        return [
+            ServiceAvailableAppointments(
+                service_id=service_id,
+                available_appointments=self.__available_appointments(
+                    services_by_id[service_id],
+                    occupancy_by_slot_start(
+                        services_by_id[service_id], occupancy_per_service.get(service_id, [])
+                    ),
+                    *ranges[service_id],
+                    include_partial,
                 ),
             )
-        return available_appointments
+            for service_id in dict.fromkeys(service_ids)
+            if service_id in services_by_id
+        ]
+
+    async def get_next_available_appointment(
+        self,
+        service: Id | Service,
+        *,
+        after: datetime | None = None,
+        now: datetime | None = None,
+    ) -> AvailableAppointment | None:
+        """
+        Gets the first available appointment of the given service that takes place (totally or
+        partially) after `after`, or None if there is none before the maximum allowed
+        appointment start time.
+
+        The slots are only generated until the first available one is found.
+        The rest of the parameters behave as in `get_available_appointments`.
+        """
+        if isinstance(service, Id):
+            service = await self.services_service.get_service_by_id(service)
+
+        now, after, before = get_availability_range(service, after, None, now)
+        occupancy = await self.__get_slot_occupancy(service.id, after, before)
+        return self.__next_available_appointment(
+            service, occupancy_by_slot_start(service, occupancy), now, after, before
+        )
+
+    async def get_services_next_available_appointment(
+        self, services: Sequence[Service], *, now: datetime | None = None
+    ) -> dict[Id, AvailableAppointment | None]:
+        """
+        Gets the first available appointment of each of the given services, with a single
+        query for their occupied slots. See `get_next_available_appointment`.
+        """
+        if not services:
+            return {}
+
+        ranges = {s.id: get_availability_range(s, None, None, now) for s in services}
+        occupancy = await self.__get_slot_occupancy(
+            [s.id for s in services],
+            min(after for _, after, _ in ranges.values()),
+            max(before for _, _, before in ranges.values()),
+        )
+        occupancy_per_service: dict[Id, list[SlotOccupancy]] = {}
+        for slot_occupancy in occupancy:
+            occupancy_per_service.setdefault(slot_occupancy.service_id, []).append(slot_occupancy)
+
+        return {
+            s.id: self.__next_available_appointment(
+                s, occupancy_by_slot_start(s, occupancy_per_service.get(s.id, [])), *ranges[s.id]
+            )
+            for s in services
+        }
 
     async def update_appointment_status(
         self, service_id: Id, appointment_id: Id, new_status: PaymentStatusUpdate
@@ -155,12 +371,51 @@ class AppointmentsService:
         if appointment is None:
             raise AppointmentNotFound
 
+        previous_status = appointment.payment_status
         if not await self.payments_service.update_payment_status(appointment, new_status):
             return
 
+        if appointment.payment_status == PaymentStatus.CANCELLED:
+            await self.occupancy_repo.decrement_overlapping(
+                service_id, appointment.start, appointment.end
+            )
+            self.__invalidate_after_commit(service_id)
+        elif previous_status == PaymentStatus.EXPIRED:
+            # Paid after it expired: its place has to be booked again
+            await self.__rebook_expired(appointment)
         await self.appointments_repo.save(appointment)
         await self.__send_appointment_notification(appointment)
 
+    async def expire_appointments(
+        self, created_before: datetime, limit: int
+    ) -> Sequence[Appointment]:
+        """
+        Expires up to `limit` appointments whose payment was created before `created_before`
+        and never started, freeing their slots. Returns the expired appointments, which
+        should be notified with `notify_expired_appointments` once the expiry is committed.
+        """
+        appointments = await self.appointments_repo.get_expired(created_before, limit)
+        for appointment in appointments:
+            self.payments_service.expire_payment(appointment)
+            await self.occupancy_repo.decrement_overlapping(
+                appointment.service_id, appointment.start, appointment.end
+            )
+            await self.appointments_repo.save(appointment)
+        return appointments
+
+    async def notify_expired_appointments(self, appointments: Sequence[Appointment]) -> None:
+        """
+        Invalidates the availability of the services of the given expired appointments and
+        notifies their owners. Must be called once the expiry is committed.
+        """
+        for service_id in {a.service_id for a in appointments}:
+            await self.availability_cache.invalidate(service_id)
+        for appointment in appointments:
+            try:
+                await self.__send_appointment_notification(appointment)
+            except Exception as e:
+                logging.error(f"Failed to notify expired appointment {appointment.id}", exc_info=e)
+
     async def get_appointment(self, service_id: Id, appointment_id: Id, user_id: Id) -> Appointment:
         appointment = await self.appointments_repo.get_by_id((service_id, appointment_id))
         if appointment is None:
@@ -178,15 +433,23 @@ class AppointmentsService:
         after: datetime | None = None,
         before: datetime | None = None,
         include_partial: bool = True,
-    ) -> tuple[Sequence[Appointment], int]:
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+    ) -> Page[Appointment]:
         service = await self.services_service.get_service_by_id(service_id)
         if user_id != service.owner_id:
             raise Forbidden
-        appointments = await self.get_appointments(
-            limit, skip, after, before, include_partial, service_id=service_id
+        return await self.appointments_repo.get_page_by_range(
+            after,
+            before,
+            include_partial,
+            limit,
+            skip,
+            cursor=cursor,
+            count=count,
+            service_id=service_id,
         )
-        amount = await self.appointments_repo.count_all(service_id=service_id)
-        return appointments, amount
 
     async def get_services_appointments_by_owner(
         self,
@@ -196,14 +459,22 @@ class AppointmentsService:
         after: datetime | None = None,
         before: datetime | None = None,
         include_partial: bool = True,
-    ) -> tuple[Sequence[Appointment], int]:
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+    ) -> Page[Appointment]:
         services = await self.services_service.get_services(owner_id=user_id)
         service_ids = [s.id for s in services]
-        appointments = await self.get_appointments(
-            limit, skip, after, before, include_partial, service_id=service_ids
+        return await self.appointments_repo.get_page_by_range(
+            after,
+            before,
+            include_partial,
+            limit,
+            skip,
+            cursor=cursor,
+            count=count,
+            service_id=service_ids,
         )
-        amount = await self.appointments_repo.count_all(service_id=service_ids)
-        return appointments, amount
 
     async def get_user_appointments(
         self,
@@ -213,13 +484,22 @@ class AppointmentsService:
         after: datetime | None = None,
         before: datetime | None = None,
         include_partial: bool = True,
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
         **filters: Any,
-    ) -> tuple[Sequence[Appointment], int]:
-        appointments = await self.get_appointments(
-            limit, skip, after, before, include_partial, customer_id=user_id, **filters
+    ) -> Page[Appointment]:
+        return await self.appointments_repo.get_page_by_range(
+            after,
+            before,
+            include_partial,
+            limit,
+            skip,
+            cursor=cursor,
+            count=count,
+            customer_id=user_id,
+            **filters,
         )
-        amount = await self.appointments_repo.count_all(customer_id=user_id, **filters)
-        return appointments, amount
 
     async def get_appointments(
         self,
@@ -237,128 +517,140 @@ class AppointmentsService:
     async def get_appointments_read(self, *appointments: Appointment) -> list[AppointmentRead]:
         return await gather(*(self.__readable(a) for a in appointments))
 
-    def __merge_or_extend_available(
-        self,
-        available_appointments: AvailableAppointmentsList,
-        new_available_appointments: Iterable[AvailableAppointmentsForSlots],
-    ) -> None:
+    def __get_bookable_slot(
+        self, service: Service, start: datetime, now: datetime | None
+    ) -> tuple[AppointmentSlots, datetime] | None:
         """
-        Adds the new available appointments to the list of available appointments.
-        If two available appointments have the same slots configuration, the available
-        appointments for that slot are merged. This might happen when the only available
-        appointments are for the same slots configuration but in different weeks.
+        Returns the slots configuration and the end of the appointment that starts at `start`
+        (in the service's timezone) if it is one of the service's appointments and can still
+        be booked, or None otherwise. Its occupancy is not checked.
         """
-        last = available_appointments[-1] if available_appointments else None
-        for available in new_available_appointments:
-            if last and last.slots_configuration == available.slots_configuration:
-                last.available_appointments.extend(available.available_appointments)
-            else:
-                available_appointments.append(available)
-                last = available
+        slot = slot_templates.get(service).find(start)
+        if slot is None:
+            return None
+        slots_config, start, end = slot
+        now, _, max_start = get_availability_range(service, None, None, now)
+        if end <= now or start >= max_start:
+            return None
+        return slots_config, end
+
+    async def __rebook_expired(self, appointment: Appointment) -> None:
+        """
+        Takes back the place of an appointment paid after it expired, in the same way as a
+        new booking. If its slot no longer exists or is full, the payment is rejected.
+        """
+        service = appointment.service
+        slot = slot_templates.get(service).find(service.to_tz(appointment.start))
+        if slot is None or not await self.occupancy_repo.try_increment(
+            service.id, slot[1], slot[2], slot[0].max_appointments_per_slot
+        ):
+            logging.warning(
+                f"Appointment {appointment.id} was paid after it expired, but its slot is no"
+                " longer available"
+            )
+            raise InvalidAppointment
+        self.__invalidate_after_commit(service.id)
 
-    def __date_available_appointments(
+    def __available_appointments(
         self,
-        start_date: date,
-        tree: IntervalTree,
-        slots_per_day: dict[int, list[AppointmentSlots]],
+        service: Service,
+        occupancy: Mapping[int, int],
+        now: datetime,
         after: datetime,
         before: datetime,
         include_partial: bool,
-    ) -> Generator[AvailableAppointmentsForSlots, None, None]:
+    ) -> AvailableAppointmentsList:
         """
-        Returns the available appointments for each slots configuration in the given date.
-
-        `start_date` is the date in which the slots configuration of the returned available
-        appointments start.
-        `after` and `before` are used to filter the returned available appointments. Only
-        appointments that take place (totally or partially) in between `after` and `before` will be
-        returned.
-        `tree` contains the (start, end) intervals of the existing non-cancelled appointments
-        `slots_per_day` is a dictionary that maps the weekday to the appointment slots that start on
-        that day.
+        Computes the available appointments of the service in the range returned by
+        `get_availability_range`, given the occupancy of its slots in that range (as returned by
+        `occupancy_by_slot_start`).
         """
-        day_slots = slots_per_day.get(start_date.weekday(), ())
-
-        for slots in day_slots or ():
-            available_for_these_slots = list(
-                self.__date_slots_available_appointments(
-                    start_date, slots, tree, after, before, include_partial
-                )
+        return AvailableAppointmentsList(
+            self.__iterate_available_appointments(
+                service, occupancy, now, after, before, include_partial
             )
-            if available_for_these_slots:
-                yield AvailableAppointmentsForSlots(
-                    slots_configuration=slots,
-                    available_appointments=available_for_these_slots,
-                )
+        )
 
-    def __date_slots_available_appointments(
+    def __iterate_available_appointments(
         self,
-        start_date: date,
-        slots: AppointmentSlots,
-        tree: IntervalTree,
+        service: Service,
+        occupancy: Mapping[int, int],
+        now: datetime,
         after: datetime,
         before: datetime,
         include_partial: bool,
-    ) -> Generator[AvailableAppointment, None, None]:
-        """
-        Returns the available appointments for the given appointment slots and date,
-
-        `start_date` is the date in which the slots configuration of the returned available
-        appointments start.
-        `slots` is the appointment slots configuration for which the available appointments will be
-        returned, and must take place in the given date.
-        `after` and `before` are used to filter the returned available appointments. Only
-        appointments that take place (totally or partially) in between `after` and `before` will be
-        returned.
-        `tree` contains the (start, end) intervals of the existing non-cancelled appointments,
+        *,
+        merge: bool = True,
+    ) -> Generator[AvailableAppointmentsForSlots, None, None]:
         """
-        days_to_end = (slots.end_day.to_weekday() - start_date.weekday()) % len(DayOfWeek)
-        end_date = start_date + timedelta(days=days_to_end)
-        slots_end = datetime.combine(end_date, slots.end_time, tzinfo=after.tzinfo)
-        start = datetime.combine(start_date, slots.start_time, tzinfo=after.tzinfo)
-        end = start + slots.appointment_duration
-        while end <= slots_end:
-            if (include_partial and start >= before) or (not include_partial and end > before):
-                # Already out of the range
-                break
-            if (include_partial and end > after) or (not include_partial and start >= after):
-                # In the range
-                amount = slots.max_appointments_per_slot - len(tree.overlap(start, end))
-                if amount > 0:
-                    yield AvailableAppointment(start=start, end=end, amount=amount)
-            start = end
-            end += slots.appointment_duration
-
-    def __get_max_allowed_appointment_start(self, service: Service, now: datetime) -> datetime:
+        Same as `__available_appointments`, but the available appointments are yielded
+        one slots configuration at a time as they are computed.
+
+        If `merge` is set and consecutive occurrences of the same slots configuration have
+        available appointments (e.g. the only slots configuration in different weeks), they
+        are merged into a single chunk. Otherwise every occurrence is yielded as soon as it
+        is computed, which is what streaming needs (with a single slots configuration,
+        merging would hold the whole range back until the end).
         """
-        Return the maximum allowed appointment start time for the given service.
+        tz = ZoneInfo(service.timezone)
+        pending: AvailableAppointmentsForSlots | None = None
+        for slots, starts, amounts in available_slots(
+            service, occupancy, now, after, before, include_partial
+        ):
+            if not starts:
+                continue
+            # Only convert to datetimes and models what is actually returned
+            chunk = AvailableAppointmentsForSlots(
+                slots_configuration=slots,
+                available_appointments=[
+                    AvailableAppointment(
+                        start=from_wall_seconds(start, tz),
+                        end=from_wall_seconds(start, tz) + slots.appointment_duration,
+                        amount=amount,
+                    )
+                    for start, amount in zip(starts, amounts)
+                ],
+            )
+            if not merge:
+                yield chunk
+            elif pending and pending.slots_configuration == slots:
+                pending.available_appointments.extend(chunk.available_appointments)
+            else:
+                if pending:
+                    yield pending
+                pending = chunk
+        if pending:
+            yield pending
 
-        `now` is the current time in the service's timezone.
+    def __next_available_appointment(
+        self,
+        service: Service,
+        occupancy: Mapping[int, int],
+        now: datetime,
+        after: datetime,
+        before: datetime,
+    ) -> AvailableAppointment | None:
         """
-        today = now.date()
-        return datetime.combine(
-            today + timedelta(days=service.appointment_days_in_advance + 1),
-            time.min,
-            tzinfo=now.tzinfo,
-        )
+        Returns the first available appointment of the service in the range returned by
+        `get_availability_range`. Since `available_slots` is lazy, the following slots
+        configurations are never generated.
+        """
+        for slots, starts, amounts in available_slots(service, occupancy, now, after, before, True):
+            if starts:
+                start = from_wall_seconds(starts[0], ZoneInfo(service.timezone))
+                return AvailableAppointment(
+                    start=start, end=start + slots.appointment_duration, amount=amounts[0]
+                )
+        return None
 
-    async def __get_open_appointments_in_range(
-        self, service_id: Id, range_start: datetime, range_end: datetime
-    ) -> Sequence[Appointment]:
+    async def __get_slot_occupancy(
+        self, service_id: Id | list[Id], range_start: datetime, range_end: datetime
+    ) -> Sequence[SlotOccupancy]:
         """
-        Wrapper of AppointmentsRepository.get_all_by_range that returns only
-        non-cancelled appointments for the given service.
+        Returns the occupancy of the slots of the given service(s) that overlap with the range.
         """
-        return await self.appointments_repo.get_all_by_range(
-            range_start,
-            range_end,
-            return_partial=True,
-            service_id=service_id,
-            payment_status=[
-                PaymentStatus.CREATED,
-                PaymentStatus.IN_PROGRESS,
-                PaymentStatus.COMPLETED,
-            ],
+        return await self.occupancy_repo.get_all_by_range(
+            range_start, range_end, service_id=service_id
         )
 
     async def __build_order(
@@ -401,6 +693,10 @@ class AppointmentsService:
             service=service,
         )
 
+    def __invalidate_after_commit(self, service_id: Id) -> None:
+        # Invalidating before committing would let other requests cache the old availability
+        self.occupancy_repo.after_commit(partial(self.availability_cache.invalidate, service_id))
+
     async def __send_appointment_notification(self, appointment: Appointment) -> None:
         text = await self.__get_notification_text(appointment)
         if text is None:
@@ -438,4 +734,9 @@ class AppointmentsService:
                 f"[{appointment.service.name}] Se canceló un turno",
                 f"El pago por ${appointment.price} fue cancelado",
             )
+        if appointment.payment_status == PaymentStatus.EXPIRED:
+            return (
+                f"[{appointment.service.name}] Se venció un turno",
+                f"El pago por ${appointment.price} no se completó a tiempo",
+            )
         return None
@@ -0,0 +1,367 @@
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, time, tzinfo
+from typing import Any, Generator, Iterable, Mapping, Sequence
+from zoneinfo import ZoneInfo
+
+from app.models.services import AppointmentSlots, DayOfWeek, Service, SlotOccupancy
+from app.models.util import Id
+
+# Maximum amount of services whose compiled templates are kept in memory
+MAX_CACHED_TEMPLATES = 1024
+
+
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_HOUR = 60 * 60
+
+
+def time_since_midnight(t: time) -> timedelta:
+    return timedelta(hours=t.hour, minutes=t.minute, seconds=t.second, microseconds=t.microsecond)
+
+
+def wall_seconds(dt: datetime) -> int:
+    """
+    Returns the seconds since the epoch of the wall-clock time of `dt`, ignoring its
+    timezone. Timestamps in the same timezone compare and add like their wall-clock
+    seconds, as aware datetimes with the same tzinfo do.
+    """
+    return (dt.replace(tzinfo=None) - EPOCH) // ONE_SECOND
+
+
+def from_wall_seconds(seconds: int, tz: tzinfo) -> datetime:
+    """
+    Inverse of `wall_seconds`.
+    """
+    return (EPOCH + timedelta(seconds=seconds)).replace(tzinfo=tz)
+
+
+@dataclass(frozen=True)
+class CompiledSlots:
+    """
+    An appointment slots configuration with the (start, end) offsets of every
+    appointment that fits in it. Offsets are relative to 00:00 of the day the
+    configuration starts on and are sorted.
+    """
+
+    configuration: AppointmentSlots
+    offsets: tuple[tuple[timedelta, timedelta], ...]
+    # The same offsets as integer seconds, used by the availability engine:
+    # the i-th appointment starts at first_start_seconds + i * duration_seconds
+    first_start_seconds: int
+    duration_seconds: int
+
+    @classmethod
+    def compile(cls, slots: AppointmentSlots) -> "CompiledSlots":
+        days_to_end = (slots.end_day.to_weekday() - slots.start_day.to_weekday()) % len(DayOfWeek)
+        slots_end = timedelta(days=days_to_end) + time_since_midnight(slots.end_time)
+        start = time_since_midnight(slots.start_time)
+        end = start + slots.appointment_duration
+        offsets = []
+        while end <= slots_end:
+            offsets.append((start, end))
+            start = end
+            end += slots.appointment_duration
+        return cls(
+            configuration=slots,
+            offsets=tuple(offsets),
+            first_start_seconds=time_since_midnight(slots.start_time) // ONE_SECOND,
+            duration_seconds=slots.appointment_duration // ONE_SECOND,
+        )
+
+
+class WeeklySlotTemplate:
+    """
+    The appointment slots of a service compiled once for a whole week.
+
+    Getting the appointments of a given date only requires shifting the offsets of
+    the slots that start on that weekday to the date (in the service's timezone).
+    """
+
+    def __init__(self, appointment_slots: Iterable[AppointmentSlots]):
+        per_weekday: list[list[CompiledSlots]] = [[] for _ in DayOfWeek]
+        for slots in sorted(appointment_slots, key=lambda s: s.start_time):
+            per_weekday[slots.start_day.to_weekday()].append(CompiledSlots.compile(slots))
+        self.__per_weekday = tuple(tuple(compiled) for compiled in per_weekday)
+
+    def for_weekday(self, weekday: int) -> Sequence[CompiledSlots]:
+        """
+        Returns the compiled slots that start on the given weekday, sorted by start time.
+        """
+        return self.__per_weekday[weekday]
+
+    def find(self, start: datetime) -> tuple[AppointmentSlots, datetime, datetime] | None:
+        """
+        Returns the slots configuration and the (start, end) of the appointment that starts
+        exactly at `start` (in the service's timezone), or None if there is none.
+        """
+        # Slots configurations can start up to 6 days before the appointment
+        for days_before in range(len(DayOfWeek)):
+            start_date = start.date() - timedelta(days=days_before)
+            offset = start - datetime.combine(start_date, time.min, tzinfo=start.tzinfo)
+            per_weekday = self.__per_weekday[start_date.weekday()]
+            # Slots configurations don't overlap, so only the last one that starts before
+            # the appointment might contain it
+            i = bisect_right(per_weekday, offset, key=lambda c: c.offsets[0][0])
+            if i == 0:
+                continue
+            compiled = per_weekday[i - 1]
+            first_start = compiled.offsets[0][0]
+            duration = compiled.configuration.appointment_duration
+            n, misalignment = divmod(offset - first_start, duration)
+            if n < len(compiled.offsets) and not misalignment:
+                return compiled.configuration, start, start + duration
+        return None
+
+    def shift(
+        self, compiled: CompiledSlots, day_start: datetime
+    ) -> Iterable[tuple[datetime, datetime]]:
+        """
+        Returns the (start, end) timestamps of the appointments of the compiled slots
+        when they start on the day that begins at `day_start`.
+        """
+        return ((day_start + start, day_start + end) for start, end in compiled.offsets)
+
+
+class OccupancySweep:
+    """
+    Counts how many of the given intervals overlap with a sequence of query intervals
+    in a single linear pass.
+
+    Queries must be made in order: both the start and the end of each queried interval
+    must be greater than or equal to the ones of the previous query. This holds for the
+    appointments of a slots template, since they are sorted and never overlap.
+    """
+
+    def __init__(self, intervals: Iterable[tuple[datetime, datetime]]):
+        starts: list[datetime] = []
+        ends: list[datetime] = []
+        for start, end in intervals:
+            starts.append(start)
+            ends.append(end)
+        self.__starts = sorted(starts)
+        self.__ends = sorted(ends)
+        self.__started = 0  # amount of intervals that start before the last queried end
+        self.__ended = 0  # amount of intervals that end before the last queried start
+
+    def count(self, start: datetime, end: datetime) -> int:
+        """
+        Returns the amount of intervals that overlap with [start, end).
+        """
+        # An interval overlaps iff it starts before `end` and doesn't end before `start`.
+        # Every interval that ends before `start` also starts before `end`, so the
+        # overlapping ones are the difference between both counts.
+        while self.__started < len(self.__starts) and self.__starts[self.__started] < end:
+            self.__started += 1
+        while self.__ended < len(self.__ends) and self.__ends[self.__ended] <= start:
+            self.__ended += 1
+        return self.__started - self.__ended
+
+
+class SlotTemplateCache:
+    """
+    LRU cache of compiled weekly slot templates, keyed by the service id.
+    A cached template is only reused while the service's `updated_at` is unchanged.
+    """
+
+    def __init__(self, max_size: int = MAX_CACHED_TEMPLATES):
+        self.max_size = max_size
+        self.__templates: OrderedDict[Id, tuple[datetime, WeeklySlotTemplate]] = OrderedDict()
+
+    def get(self, service: Service) -> WeeklySlotTemplate:
+        cached = self.__templates.get(service.id)
+        if cached is not None and cached[0] == service.updated_at:
+            self.__templates.move_to_end(service.id)
+            return cached[1]
+
+        template = WeeklySlotTemplate(service.appointment_slots)
+        self.__templates[service.id] = (service.updated_at, template)
+        self.__templates.move_to_end(service.id)
+        while len(self.__templates) > self.max_size:
+            self.__templates.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        self.__templates.clear()
+
+
+slot_templates = SlotTemplateCache()
+
+
+def slots_layout(service: Service) -> tuple[str, frozenset[tuple[Any, ...]]]:
+    """
+    Returns what determines the timestamps of the appointment slots of a service.
+    The occupancy of the slots has to be rebuilt whenever it changes.
+    """
+    return service.timezone, frozenset(
+        (s.start_day, s.start_time, s.end_day, s.end_time, s.appointment_duration)
+        for s in service.appointment_slots
+    )
+
+
+def compute_slot_occupancy(
+    service: Service, appointments: Iterable[tuple[datetime, datetime]]
+) -> list[SlotOccupancy]:
+    """
+    Returns the occupancy of every slot of the service that overlaps with at least one
+    of the given (start, end) appointments.
+    """
+    appointments = list(appointments)
+    if not appointments:
+        return []
+
+    tz = ZoneInfo(service.timezone)
+    template = slot_templates.get(service)
+    sweep = OccupancySweep(appointments)
+    # Slots might start up to a week before the appointments that overlap with them
+    first_date = min(start for start, _ in appointments).astimezone(tz).date() - timedelta(
+        days=len(DayOfWeek)
+    )
+    last_date = max(end for _, end in appointments).astimezone(tz).date()
+
+    occupancy = []
+    for d in range((last_date - first_date).days + 1):
+        current_date = first_date + timedelta(days=d)
+        day_start = datetime.combine(current_date, time.min, tzinfo=tz)
+        for compiled in template.for_weekday(current_date.weekday()):
+            for start, end in template.shift(compiled, day_start):
+                amount = sweep.count(start, end)
+                if amount > 0:
+                    occupancy.append(
+                        SlotOccupancy(
+                            service_id=service.id, slot_start=start, slot_end=end, amount=amount
+                        )
+                    )
+    return occupancy
+
+
+def get_max_allowed_appointment_start(service: Service, now: datetime) -> datetime:
+    """
+    Return the maximum allowed appointment start time for the given service.
+
+    `now` is the current time in the service's timezone.
+    """
+    today = now.date()
+    return datetime.combine(
+        today + timedelta(days=service.appointment_days_in_advance + 1),
+        time.min,
+        tzinfo=now.tzinfo,
+    )
+
+
+def get_availability_range(
+    service: Service,
+    after: datetime | None,
+    before: datetime | None,
+    now: datetime | None,
+) -> tuple[datetime, datetime, datetime]:
+    """
+    Returns the current time and the range in which available appointments are searched
+    for the given service, all of them in the service's timezone.
+    """
+    now = service.to_tz(now) if now else datetime.now(ZoneInfo(service.timezone))
+    after = max(now, service.to_tz(after)) if after else now
+    max_start = get_max_allowed_appointment_start(service, now)
+    before = min(max_start, service.to_tz(before)) if before else max_start
+    return now, after, before
+
+
+def occupancy_by_slot_start(service: Service, occupancy: Iterable[SlotOccupancy]) -> dict[int, int]:
+    """
+    Returns the amount of appointments of each occupied slot, by the wall-clock seconds
+    of its start in the service's timezone.
+    """
+    tz = ZoneInfo(service.timezone)
+    return {wall_seconds(o.slot_start.astimezone(tz)): o.amount for o in occupancy}
+
+
+def available_slots(
+    service: Service,
+    occupancy: Mapping[int, int],
+    now: datetime,
+    after: datetime,
+    before: datetime,
+    include_partial: bool,
+) -> Generator[tuple[AppointmentSlots, "array[int]", "array[int]"], None, None]:
+    """
+    Yields each slots configuration that takes place in the range returned by
+    `get_availability_range`, in order, together with the starts and amounts of its
+    available appointments on that occurrence.
+
+    Timestamps are handled as the wall-clock seconds of the service's timezone
+    (see `wall_seconds`) and only converted to datetimes by the callers.
+    `occupancy` is the amount of non-cancelled appointments of each occupied slot,
+    by slot start (see `occupancy_by_slot_start`).
+    """
+    template = slot_templates.get(service)
+    today = now.date()
+    after_seconds, before_seconds = wall_seconds(after), wall_seconds(before)
+    day_start = wall_seconds(datetime.combine(today, time.min))
+    for d in range(0, service.appointment_days_in_advance + 1):
+        weekday = (today.weekday() + d) % len(DayOfWeek)
+        for compiled in template.for_weekday(weekday):
+            yield compiled.configuration, *date_slots_available_appointments(
+                day_start, compiled, occupancy, after_seconds, before_seconds, include_partial
+            )
+        day_start += SECONDS_PER_DAY
+
+
+def date_slots_available_appointments(
+    day_start: int,
+    compiled: CompiledSlots,
+    occupancy: Mapping[int, int],
+    after: int,
+    before: int,
+    include_partial: bool,
+) -> tuple["array[int]", "array[int]"]:
+    """
+    Returns the starts and amounts of the available appointments for the given
+    appointment slots in a given date.
+
+    `day_start` is 00:00 of the date in which the slots configuration starts.
+    `compiled` is the compiled appointment slots configuration.
+    `after` and `before` are used to filter the returned available appointments. Only
+    appointments that take place (totally or partially) in between `after` and `before` will be
+    returned.
+    `occupancy` is the amount of non-cancelled appointments of each occupied slot,
+    by slot start.
+    All of the timestamps are wall-clock seconds.
+    """
+    starts, amounts = array("q"), array("q")
+    max_amount = compiled.configuration.max_appointments_per_slot
+    duration = compiled.duration_seconds
+    start = day_start + compiled.first_start_seconds
+    for _ in range(len(compiled.offsets)):
+        end = start + duration
+        if (include_partial and start >= before) or (not include_partial and end > before):
+            # Already out of the range
+            break
+        if (include_partial and end > after) or (not include_partial and start >= after):
+            # In the range
+            amount = max_amount - occupancy.get(start, 0)
+            if amount > 0:
+                starts.append(start)
+                amounts.append(amount)
+        start = end
+    return starts, amounts
+
+
+def has_available_appointment(
+    service: Service,
+    occupancy: Mapping[int, int],
+    now: datetime,
+    after: datetime,
+    before: datetime,
+    include_partial: bool,
+) -> bool:
+    """
+    Returns whether the service has at least one available appointment in the range.
+    The slots are only generated until the first available one is found.
+    """
+    return any(
+        starts
+        for _, starts, _ in available_slots(service, occupancy, now, after, before, include_partial)
+    )
@@ -0,0 +1,223 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+import logging
+from time import monotonic
+from typing import Any, Callable
+
+from pydantic import BaseModel, TypeAdapter, computed_field
+
+from app.config import settings
+from app.models.services import AvailableAppointmentsForSlots, AvailableAppointmentsList
+from app.models.util import Id
+
+# Keys of the shared backend are prefixed with this, to avoid clashing with other keys
+SHARED_KEY_PREFIX = "services:availability:"
+
+_available_appointments = TypeAdapter(list[AvailableAppointmentsForSlots])
+
+
+class AvailabilityCacheBackend(ABC):
+    """
+    Storage of the cached available appointments. Entries are grouped by service, so that
+    all the entries of a service can be invalidated at once.
+    """
+
+    @abstractmethod
+    async def get(self, service_id: str, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, service_id: str, key: str, value: bytes) -> None: ...
+
+    @abstractmethod
+    async def invalidate(self, service_id: str) -> None: ...
+
+
+class MemoryCacheBackend(AvailabilityCacheBackend):
+    """
+    In-process LRU cache whose entries expire `ttl` seconds after being set.
+    It is only invalidated by the writes made by this process, so with more than one
+    replica other replicas might return stale entries until they expire.
+    """
+
+    def __init__(self, max_size: int, ttl: float, clock: Callable[[], float] = monotonic) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__clock = clock
+        # (service_id, key) -> (expiration, value)
+        self.__entries: OrderedDict[tuple[str, str], tuple[float, bytes]] = OrderedDict()
+        self.__keys_by_service: dict[str, set[str]] = {}
+
+    async def get(self, service_id: str, key: str) -> bytes | None:
+        entry = self.__entries.get((service_id, key))
+        if entry is None:
+            return None
+        if entry[0] <= self.__clock():
+            self.__remove(service_id, key)
+            return None
+        self.__entries.move_to_end((service_id, key))
+        return entry[1]
+
+    async def set(self, service_id: str, key: str, value: bytes) -> None:
+        self.__entries[(service_id, key)] = (self.__clock() + self.ttl, value)
+        self.__entries.move_to_end((service_id, key))
+        self.__keys_by_service.setdefault(service_id, set()).add(key)
+        while len(self.__entries) > self.max_size:
+            (evicted_service_id, evicted_key), _ = self.__entries.popitem(last=False)
+            self.__remove(evicted_service_id, evicted_key)
+
+    async def invalidate(self, service_id: str) -> None:
+        for key in self.__keys_by_service.pop(service_id, set()):
+            self.__entries.pop((service_id, key), None)
+
+    def __remove(self, service_id: str, key: str) -> None:
+        self.__entries.pop((service_id, key), None)
+        keys = self.__keys_by_service.get(service_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.__keys_by_service[service_id]
+
+
+class RedisCacheBackend(AvailabilityCacheBackend):
+    """
+    Cache shared by every replica, stored in Redis. The entries of each service are kept
+    in a single hash, which expires `ttl` seconds after its first entry is set and is
+    deleted when the service is invalidated.
+    """
+
+    def __init__(self, client: Any, ttl: int) -> None:
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, ttl: int) -> "RedisCacheBackend":
+        # Only required when the shared backend is configured
+        from redis.asyncio import Redis  # pylint: disable=import-outside-toplevel
+
+        return cls(Redis.from_url(url), ttl)
+
+    async def get(self, service_id: str, key: str) -> bytes | None:
+        value: bytes | None = await self.client.hget(SHARED_KEY_PREFIX + service_id, key)
+        return value
+
+    async def set(self, service_id: str, key: str, value: bytes) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(SHARED_KEY_PREFIX + service_id, key, value)
+            pipe.expire(SHARED_KEY_PREFIX + service_id, self.ttl, nx=True)
+            await pipe.execute()
+
+    async def invalidate(self, service_id: str) -> None:
+        await self.client.delete(SHARED_KEY_PREFIX + service_id)
+
+
+class CacheMetrics(BaseModel):
+    """
+    Counters of the lookups made to the cache by this process since it started.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    errors: int = 0
+
+    @computed_field  # type: ignore[misc]
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class AvailabilityCache:
+    """
+    Cache of the available appointments of a service, by the requested range.
+
+    Entries have to be invalidated whenever the availability of the service changes
+    (appointments are booked or cancelled, or the service is updated or deleted).
+    Failures of the backend are logged and treated as misses, the cache is never required
+    to answer a request.
+    """
+
+    def __init__(self, backend: AvailabilityCacheBackend | None) -> None:
+        self.backend = backend
+        self.metrics = CacheMetrics()
+
+    async def get(
+        self,
+        service_id: Id,
+        after: datetime | None,
+        before: datetime | None,
+        include_partial: bool,
+    ) -> AvailableAppointmentsList | None:
+        if self.backend is None:
+            return None
+        try:
+            value = await self.backend.get(
+                str(service_id), self.__key(after, before, include_partial)
+            )
+        except Exception as e:
+            self.metrics.errors += 1
+            logging.warning(f"Failed to read cached availability of {service_id}: {e}")
+            value = None
+
+        if value is None:
+            self.metrics.misses += 1
+            return None
+        self.metrics.hits += 1
+        return AvailableAppointmentsList(_available_appointments.validate_json(value))
+
+    async def set(
+        self,
+        service_id: Id,
+        after: datetime | None,
+        before: datetime | None,
+        include_partial: bool,
+        available_appointments: AvailableAppointmentsList,
+    ) -> None:
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(
+                str(service_id),
+                self.__key(after, before, include_partial),
+                _available_appointments.dump_json(available_appointments),
+            )
+        except Exception as e:
+            self.metrics.errors += 1
+            logging.warning(f"Failed to cache availability of {service_id}: {e}")
+
+    async def invalidate(self, service_id: Id) -> None:
+        if self.backend is None:
+            return
+        self.metrics.invalidations += 1
+        try:
+            await self.backend.invalidate(str(service_id))
+        except Exception as e:
+            self.metrics.errors += 1
+            logging.warning(f"Failed to invalidate cached availability of {service_id}: {e}")
+
+    def __key(self, after: datetime | None, before: datetime | None, include_partial: bool) -> str:
+        after_key = after.isoformat() if after else ""
+        before_key = before.isoformat() if before else ""
+        return f"{after_key}|{before_key}|{int(include_partial)}"
+
+
+def build_availability_cache() -> AvailabilityCache:
+    if settings.AVAILABILITY_CACHE_TTL <= 0:
+        return AvailabilityCache(None)
+    if settings.AVAILABILITY_CACHE_URL:
+        return AvailabilityCache(
+            RedisCacheBackend.from_url(
+                settings.AVAILABILITY_CACHE_URL, settings.AVAILABILITY_CACHE_TTL
+            )
+        )
+    return AvailabilityCache(
+        MemoryCacheBackend(settings.AVAILABILITY_CACHE_MAX_SIZE, settings.AVAILABILITY_CACHE_TTL)
+    )
+
+
+availability_cache = build_availability_cache()
+
+
+def get_availability_cache() -> AvailabilityCache:
+    return availability_cache
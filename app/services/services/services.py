@@ -1,4 +1,6 @@
 from asyncio import gather
+from datetime import datetime
+from functools import partial
 from typing import Sequence, Any, TypedDict
 
 from fastapi import Depends
@@ -11,13 +13,38 @@ from app.models.services import (
     Service,
     ServiceRead,
     AppointmentSlots,
+    SlotOccupancy,
+)
+from app.models.payments import OPEN_PAYMENT_STATUSES
+from app.models.util import (
+    CAPPED_COUNT,
+    Coordinates,
+    CountMode,
+    DistanceCursor,
+    File,
+    Id,
+    KeysetCursor,
+    now,
+)
+from app.repositories.base_repository import Page
+from app.repositories.services import (
+    AppointmentsRepository,
+    ServicesRepository,
+    SlotOccupancyRepository,
 )
-from app.models.util import File, Id
-from app.repositories.services import ServicesRepository
 from ..users import UsersService
 from ..addresses import AddressesService
 
 from ..files import FilesService, services_images_service
+from ..spatial_index import SpatialIndex, get_services_index
+from .availability import (
+    compute_slot_occupancy,
+    get_availability_range,
+    has_available_appointment,
+    occupancy_by_slot_start,
+    slots_layout,
+)
+from .availability_cache import AvailabilityCache, get_availability_cache
 
 
 class ServicesService:
@@ -26,10 +53,18 @@ class ServicesService:
         services_repo: ServicesRepository = Depends(ServicesRepository),
         files_service: FilesService = Depends(services_images_service),
         users_service: UsersService = Depends(UsersService),
+        appointments_repo: AppointmentsRepository = Depends(AppointmentsRepository),
+        occupancy_repo: SlotOccupancyRepository = Depends(SlotOccupancyRepository),
+        availability_cache: AvailabilityCache = Depends(get_availability_cache),
+        spatial_index: SpatialIndex = Depends(get_services_index),
     ):
         self.services_repo = services_repo
         self.files_service = files_service
         self.users_service = users_service
+        self.appointments_repo = appointments_repo
+        self.occupancy_repo = occupancy_repo
+        self.availability_cache = availability_cache
+        self.spatial_index = spatial_index
 
     async def create_service(self, data: ServiceCreate, owner_id: Id) -> Service:
         service = Service(
@@ -37,7 +72,9 @@ class ServicesService:
             owner_id=owner_id,
             **(await self.__get_nested_models_from_create(data)),
         )
-        return await self.services_repo.save(service)
+        service = await self.services_repo.save(service)
+        self.__index(service)
+        return service
 
     async def get_services(
         self, limit: int | None = None, skip: int = 0, **filters: Any
@@ -45,6 +82,21 @@ class ServicesService:
         services = await self.services_repo.get_all(skip=skip, limit=limit, **filters)
         return services
 
+    async def get_services_page(
+        self,
+        limit: int,
+        skip: int,
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+        **filters: Any,
+    ) -> Page[Service]:
+        """
+        Returns a page of services with their amount counted as `count` says. If `cursor` is
+        given, the services start after it.
+        """
+        return await self.services_repo.get_page(skip, limit, cursor=cursor, count=count, **filters)
+
     async def get_nearby_services(
         self,
         user_token: str,
@@ -52,23 +104,45 @@ class ServicesService:
         skip: int,
         user_id: Id,
         user_address_id: Id,
-        **filters: Any
-    ) -> tuple[Sequence[Service], int]:
+        *,
+        cursor: DistanceCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+        available_after: datetime | None = None,
+        available_before: datetime | None = None,
+        **filters: Any,
+    ) -> tuple[Sequence[tuple[Service, float]], int | None]:
         """
-        Returns a tuple of services and the total amount of services nearby
+        Returns a tuple of services with their distance in km, closest first, and the amount
+        of services nearby counted as `count` says. If `cursor` is given, the services start
+        after it.
+
+        If `available_after` or `available_before` are given, only services with at least
+        one available appointment that starts and ends in between them are returned.
+        They default to the current time and each service's maximum allowed appointment
+        start time, respectively.
         """
         c = await self.users_service.get_user_address_coordinates(
             user_id, user_address_id, user_token
         )
-        services = await self.services_repo.get_nearby(
-            c.latitude, c.longitude, skip=skip, limit=limit, **filters
+        filters["candidate_ids"] = await self.spatial_index.candidates_with_updates(
+            c.latitude, c.longitude, self.services_repo
         )
-        amount = await self.services_repo.count_nearby(c.latitude, c.longitude, **filters)
-        return services, amount
+        if available_after is None and available_before is None:
+            return await self.services_repo.get_nearby_page(
+                c.latitude,
+                c.longitude,
+                cursor=cursor,
+                skip=skip,
+                limit=limit,
+                count=count,
+                **filters,
+            )
 
-    async def count_services(self, **filters: Any) -> int:
-        services_count = await self.services_repo.count_all(**filters)
-        return services_count
+        # Availability depends on the slots templates, so it can't be filtered in the query.
+        # The nearby services are filtered here instead, and paginated afterwards
+        return await self.__get_nearby_available_page(
+            c, available_after, available_before, limit, skip, cursor, count, **filters
+        )
 
     async def get_service_by_id(self, service_id: Id | str) -> Service:
         service = await self.services_repo.get_by_id(service_id)
@@ -85,13 +159,22 @@ class ServicesService:
         if service.owner_id != user_id:
             raise Forbidden
 
-        return await self.services_repo.update(
+        layout = slots_layout(service)
+        service = await self.services_repo.update(
             service_id,
             {
                 **data.model_dump(exclude={"address", "appointment_slots"}),
                 **(await self.__get_nested_models_from_create(data)),
+                # Set explicitly since replacing only the slots doesn't update the services row,
+                # and compiled slot templates are invalidated by it
+                "updated_at": now(),
             },
         )
+        if slots_layout(service) != layout:
+            await self.__rebuild_slot_occupancy(service)
+        self.__invalidate_after_commit(service_id)
+        self.__index(service)
+        return service
 
     async def delete_service(self, service_id: Id, user_id: Id) -> None:
         service = await self.get_service_by_id(service_id)
@@ -103,6 +186,8 @@ class ServicesService:
         except FileNotFoundError:
             pass
         await self.services_repo.delete(service_id)
+        self.__invalidate_after_commit(service_id)
+        self.spatial_index.remove(service_id)
 
     async def create_service_image(self, service_id: Id, image: File, user_id: Id) -> str:
         service = await self.get_service_by_id(service_id)
@@ -125,6 +210,18 @@ class ServicesService:
 
         await self.files_service.delete_file(service_id)
 
+    def __invalidate_after_commit(self, service_id: Id) -> None:
+        # Invalidating before committing would let other requests cache the old availability
+        self.services_repo.after_commit(partial(self.availability_cache.invalidate, service_id))
+
+    def __index(self, service: Service) -> None:
+        self.spatial_index.set(
+            service.id,
+            service.address.latitude,
+            service.address.longitude,
+            service.customer_range_km,
+        )
+
     async def __readable(self, service: Service, token: str) -> ServiceRead:
         image = await self.files_service.get_file_url(service.id, token)
         return ServiceRead(
@@ -134,6 +231,132 @@ class ServicesService:
             image_url=image,
         )
 
+    async def __get_nearby_available_page(
+        self,
+        coordinates: Coordinates,
+        after: datetime | None,
+        before: datetime | None,
+        limit: int,
+        skip: int,
+        cursor: DistanceCursor | None,
+        count: CountMode,
+        **filters: Any,
+    ) -> tuple[Sequence[tuple[Service, float]], int | None]:
+        """
+        Same as `get_nearby_services` when filtering by availability. Unless the amount has
+        to be counted exactly, only as many nearby services as needed are checked.
+        """
+        end = skip + limit
+        if count == CountMode.EXACT:
+            # Counting the available services requires checking every nearby one
+            available = await self.__get_nearby_available(coordinates, after, before, **filters)
+            services = available
+            if cursor is not None:
+                services = [(s, d) for s, d in available if (d, s.id) > cursor]
+            return services[skip:end], len(available)
+
+        if count == CountMode.CAPPED and cursor is None:
+            # The services checked for the page are counted too
+            services = await self.__get_nearby_available(
+                coordinates, after, before, limit=max(end, CAPPED_COUNT + 1), **filters
+            )
+            return services[skip:end], len(services)
+
+        services = await self.__get_nearby_available(
+            coordinates, after, before, cursor=cursor, limit=end, **filters
+        )
+        if count == CountMode.NONE:
+            return services[skip:end], None
+        # The amount includes the services before the cursor
+        counted = await self.__get_nearby_available(
+            coordinates, after, before, limit=CAPPED_COUNT + 1, **filters
+        )
+        return services[skip:end], len(counted)
+
+    async def __get_nearby_available(
+        self,
+        coordinates: Coordinates,
+        after: datetime | None,
+        before: datetime | None,
+        *,
+        cursor: DistanceCursor | None = None,
+        limit: int | None = None,
+        **filters: Any,
+    ) -> list[tuple[Service, float]]:
+        """
+        Returns the nearby services available in between `after` and `before` (see
+        `__filter_available`) with their distance in km, closest first, starting after
+        `cursor` if given.
+        If `limit` is given, the nearby services are checked in batches of that size until
+        `limit` available ones are found, and at most `limit` are returned.
+        """
+        available: list[tuple[Service, float]] = []
+        while True:
+            nearby = await self.services_repo.get_nearby(
+                coordinates.latitude,
+                coordinates.longitude,
+                cursor=cursor,
+                limit=limit,
+                has_appointment_slots=True,
+                **filters,
+            )
+            distances = {service.id: distance for service, distance in nearby}
+            services = await self.__filter_available([s for s, _ in nearby], after, before)
+            available.extend((service, distances[service.id]) for service in services)
+            if limit is None:
+                return available
+            if len(available) >= limit or len(nearby) < limit:
+                return available[:limit]
+            last, distance = nearby[-1]
+            cursor = (distance, last.id)
+
+    async def __filter_available(
+        self, services: Sequence[Service], after: datetime | None, before: datetime | None
+    ) -> list[Service]:
+        """
+        Returns the services with at least one available appointment that starts and ends in
+        between `after` and `before`, with a single query for the occupancy of their slots.
+        """
+        if not services:
+            return []
+
+        ranges = {s.id: get_availability_range(s, after, before, None) for s in services}
+        occupancy = await self.occupancy_repo.get_all_by_range(
+            min(after for _, after, _ in ranges.values()),
+            max(before for _, _, before in ranges.values()),
+            service_id=[s.id for s in services],
+        )
+        occupancy_per_service: dict[Id, list[SlotOccupancy]] = {}
+        for slot_occupancy in occupancy:
+            occupancy_per_service.setdefault(slot_occupancy.service_id, []).append(slot_occupancy)
+
+        return [
+            s
+            for s in services
+            if has_available_appointment(
+                s,
+                occupancy_by_slot_start(s, occupancy_per_service.get(s.id, [])),
+                *ranges[s.id],
+                include_partial=False,
+            )
+        ]
+
+    async def __rebuild_slot_occupancy(self, service: Service) -> None:
+        """
+        Recomputes the occupancy of the new slots of the service from its upcoming
+        non-cancelled appointments, which might not match the new slots.
+        """
+        appointments = await self.appointments_repo.get_all_by_range(
+            now(),
+            None,
+            return_partial=True,
+            service_id=service.id,
+            payment_status=OPEN_PAYMENT_STATUSES,
+        )
+        await self.occupancy_repo.replace(
+            service.id, compute_slot_occupancy(service, ((a.start, a.end) for a in appointments))
+        )
+
     async def __get_nested_models_from_create(
         self, service_create: ServiceCreate
     ) -> "ServiceNestedModels":
@@ -0,0 +1,185 @@
+from asyncio import create_task, sleep
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from itertools import chain
+import logging
+from math import floor
+from typing import Any, AsyncIterator, Iterable
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models.util import Id, great_circle_distance, now
+from app.repositories.nearby_repository import NearbyRepository
+from app.repositories.services import ServicesRepository
+from app.repositories.stores import StoresRepository
+from app.repositories.util import bounding_box
+
+# Side of the cells of the grid, in degrees (about 11km of latitude)
+CELL_SIZE_DEG = 0.1
+# The candidates are checked against a slightly bigger range, so that rounding differences
+# with the distance computed by the database don't leave out records on the edge of their range
+RANGE_TOLERANCE = 1.001
+# Records updated this long before an index is loaded are still looked up as possibly missing
+# from it, since the transactions that wrote them might not have been committed yet
+UPDATES_MARGIN = timedelta(minutes=1)
+# Above this many candidates, the ids would make the query bigger than the geo filter saves
+MAX_CANDIDATES = 1000
+
+
+class SpatialIndex:
+    """
+    In-process grid of the locations of businesses (stores or services) and their range, to
+    find the ones whose range reaches a point without going to the database.
+
+    Until it's loaded it doesn't return candidates, and it's only updated by the writes made
+    by this process, so it has to be reloaded to pick up the writes of other replicas.
+    In the meantime, the records updated after `updated_since` have to be checked along with
+    the candidates. The candidates are still checked by the database, so records deleted
+    elsewhere are never returned.
+    """
+
+    def __init__(self, cell_size: float = CELL_SIZE_DEG) -> None:
+        self.cell_size = cell_size
+        self.loaded = False
+        # Records updated after this might be missing from the index, None if none can be
+        self.updated_since: datetime | None = None
+        # id -> (latitude, longitude, range in km)
+        self.__entries: dict[Id, tuple[float, float, float]] = {}
+        self.__cells: dict[tuple[int, int], set[Id]] = {}
+        # Only decreases when reloaded, which just makes lookups check more cells
+        self.__max_range = 0.0
+
+    def load(
+        self,
+        entries: Iterable[tuple[Id, float, float, float]],
+        updated_since: datetime | None = None,
+    ) -> None:
+        self.__entries, self.__cells, self.__max_range = {}, {}, 0.0
+        for record_id, latitude, longitude, range_km in entries:
+            self.__add(record_id, latitude, longitude, range_km)
+        self.loaded = True
+        self.updated_since = updated_since
+
+    def set(self, record_id: Id, latitude: float, longitude: float, range_km: float) -> None:
+        if not self.loaded:
+            return
+        self.remove(record_id)
+        self.__add(record_id, latitude, longitude, range_km)
+
+    def remove(self, record_id: Id) -> None:
+        entry = self.__entries.pop(record_id, None)
+        if entry is None:
+            return
+        cell = self.__cell(entry[0], entry[1])
+        self.__cells[cell].discard(record_id)
+        if not self.__cells[cell]:
+            del self.__cells[cell]
+
+    def candidates(self, latitude: float, longitude: float) -> list[Id] | None:
+        """
+        Returns the ids of the records whose range reaches (latitude, longitude), or None if
+        the index isn't loaded.
+        """
+        if not self.loaded:
+            return None
+
+        candidates = []
+        for record_id in self.__ids_around(latitude, longitude):
+            lat, long, range_km = self.__entries[record_id]
+            distance = great_circle_distance(latitude, longitude, lat, long)
+            if distance <= range_km * RANGE_TOLERANCE:
+                candidates.append(record_id)
+        return candidates
+
+    async def candidates_with_updates(
+        self, latitude: float, longitude: float, repository: NearbyRepository[Any, Any, Any]
+    ) -> list[Id] | None:
+        """
+        Same as `candidates`, but also returns the ids of the records updated after
+        `updated_since` (written by other replicas, or not committed yet when the index was
+        loaded), looked up with `repository`. Returns None if there are more than
+        `MAX_CANDIDATES`, so that the records are found with the geo filter alone.
+        """
+        candidates = self.candidates(latitude, longitude)
+        if candidates is None or len(candidates) > MAX_CANDIDATES:
+            return None
+        if self.updated_since is not None:
+            candidates += await repository.get_ids_updated_since(self.updated_since)
+        return candidates if len(candidates) <= MAX_CANDIDATES else None
+
+    def __ids_around(self, latitude: float, longitude: float) -> Iterable[Id]:
+        """
+        Returns the ids in the cells of the bounding box of the largest range around
+        (latitude, longitude), or all of them if there are less cells with records.
+        """
+        min_lat, max_lat, min_long, max_long = bounding_box(
+            latitude, longitude, self.__max_range * RANGE_TOLERANCE
+        )
+        rows = range(self.__index(min_lat), self.__index(max_lat) + 1)
+        columns = range(self.__index(min_long), self.__index(max_long) + 1)
+        if len(rows) * len(columns) >= len(self.__cells):
+            return self.__entries.keys()
+        return chain.from_iterable(self.__cells.get((r, c), ()) for r in rows for c in columns)
+
+    def __add(self, record_id: Id, latitude: float, longitude: float, range_km: float) -> None:
+        # The sign of the range is ignored, as in the database
+        range_km = abs(range_km)
+        self.__entries[record_id] = (latitude, longitude, range_km)
+        self.__cells.setdefault(self.__cell(latitude, longitude), set()).add(record_id)
+        self.__max_range = max(self.__max_range, range_km)
+
+    def __cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return self.__index(latitude), self.__index(longitude)
+
+    def __index(self, degrees: float) -> int:
+        return floor(degrees / self.cell_size)
+
+
+stores_index = SpatialIndex()
+services_index = SpatialIndex()
+
+
+def get_stores_index() -> SpatialIndex:
+    return stores_index
+
+
+def get_services_index() -> SpatialIndex:
+    return services_index
+
+
+async def load_spatial_indexes() -> None:
+    updated_since = now() - UPDATES_MARGIN
+    async with SessionLocal() as session:
+        stores_index.load(await StoresRepository(session).get_locations(), updated_since)
+        services_index.load(await ServicesRepository(session).get_locations(), updated_since)
+
+
+async def refresh_spatial_indexes(interval: float) -> None:
+    while True:
+        await sleep(interval)
+        try:
+            await load_spatial_indexes()
+        except Exception as e:
+            logging.error("Failed to reload the spatial indexes", exc_info=e)
+
+
+@asynccontextmanager
+async def run_spatial_indexes() -> AsyncIterator[None]:
+    if not settings.SPATIAL_INDEX_ENABLED:
+        yield
+        return
+
+    try:
+        await load_spatial_indexes()
+    except Exception as e:
+        # Nearby lookups go to the database until it's reloaded
+        logging.error("Failed to load the spatial indexes", exc_info=e)
+    if settings.SPATIAL_INDEX_REFRESH_INTERVAL <= 0:
+        yield
+        return
+
+    task = create_task(refresh_spatial_indexes(settings.SPATIAL_INDEX_REFRESH_INTERVAL))
+    try:
+        yield
+    finally:
+        task.cancel()
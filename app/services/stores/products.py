@@ -1,13 +1,21 @@
 # pylint: disable=W0212 # access protected member
 import logging
-from typing import Any, Sequence
+from typing import Any, Mapping, Sequence
 from asyncio import gather
 
 from fastapi import Depends
 from app.exceptions.users import Forbidden
 
-from app.models.util import File, Id
-from app.models.stores import Category, ProductCategories, ProductCreate, Product, ProductRead
+from app.models.util import CountMode, DistanceCursor, File, Id
+from app.models.stores import (
+    Category,
+    ProductCategories,
+    ProductCreate,
+    Product,
+    ProductRead,
+    categories_mask,
+    mask_categories,
+)
 from app.repositories.stores import ProductsRepository
 from app.exceptions.repository import RecordNotFound
 from app.exceptions.products import ProductAlreadyExists, ProductNotFound, ProductOutOfStock
@@ -37,7 +45,11 @@ class ProductsService:
             raise ProductAlreadyExists
 
         logging.info(f"Creating product {data.name} in store {store_id} with data {data}")
-        product = Product(store_id=store_id, **data.model_dump())
+        product = Product(
+            store_id=store_id,
+            **data.model_dump(),
+            category_mask=categories_mask(data.categories),
+        )
         # map data.categories to ProductCategories model
         product._categories = [ProductCategories(category=category) for category in data.categories]
         return await self.products_repo.save(product)
@@ -59,7 +71,9 @@ class ProductsService:
         try:
             categories = [ProductCategories(category=category) for category in data.categories]
             return await self.products_repo.update(
-                (store_id, product_id), data.model_dump() | {"_categories": categories}
+                (store_id, product_id),
+                data.model_dump()
+                | {"_categories": categories, "category_mask": categories_mask(data.categories)},
             )
         except RecordNotFound as e:
             raise ProductNotFound from e
@@ -88,21 +102,30 @@ class ProductsService:
         user_id: Id,
         user_address_id: Id,
         categories: list[Category] | None = None,
+        *,
+        cursor: DistanceCursor | None = None,
+        count: CountMode = CountMode.EXACT,
         **filters: Any,
-    ) -> tuple[Sequence[Product], int]:
+    ) -> tuple[Sequence[tuple[Product, float]], int | None]:
         """
-        Returns a tuple of products and the total amount of products nearby
+        Returns a tuple of products with the distance in km to their store, closest first,
+        and the amount of products nearby counted as `count` says. If `cursor` is given, the
+        products start after it.
         """
         c = await self.users_service.get_user_address_coordinates(
             user_id, user_address_id, user_token
         )
-        products = await self.products_repo.get_nearby(
-            c.latitude, c.longitude, categories, skip=offset, limit=limit, **filters
-        )
-        amount = await self.products_repo.count_nearby(
-            c.latitude, c.longitude, categories, **filters
+        return await self.products_repo.get_nearby_page(
+            c.latitude,
+            c.longitude,
+            categories,
+            cursor=cursor,
+            candidate_ids=await self.stores_service.get_nearby_candidates(c),
+            skip=offset,
+            limit=limit,
+            count=count,
+            **filters,
         )
-        return products, amount
 
     async def get_products_read(self, *products: Product) -> Sequence[ProductRead]:
         token = self.files_service.get_token()
@@ -147,11 +170,18 @@ class ProductsService:
         product.available += amount
         await self.products_repo.save(product)
 
+    async def restore_stock(self, quantities: Mapping[Id, int]) -> None:
+        """
+        Adds the given quantities back to the stock of each product, by product id.
+        Negative quantities take stock back without leaving it below zero.
+        """
+        await self.products_repo.restore_stock(quantities)
+
     async def __readable(self, product: Product, token: str) -> ProductRead:
         image = await self.files_service.get_file_url(
             self.__get_image_id(product.store_id, product.id), token
         )
-        categories = [category.category for category in product._categories]
+        categories = mask_categories(product.category_mask)
         return ProductRead(**product.model_dump(), image_url=image, categories=categories)
 
     def __get_image_id(self, store_id: Id, product_id: Id) -> str:
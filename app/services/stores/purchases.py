@@ -1,3 +1,4 @@
+from datetime import datetime
 from decimal import Decimal
 import logging
 from typing import Any, Sequence
@@ -20,7 +21,8 @@ from app.models.stores import (
     PurchaseItemRead,
 )
 from app.models.payments import PaymentStatus, PaymentStatusUpdate
-from app.models.util import Id
+from app.models.util import CountMode, Id, KeysetCursor
+from app.repositories.base_repository import Page
 from app.repositories.stores import PurchasesRepository
 from app.config import settings
 from ..users import Notification, UsersService
@@ -59,21 +61,35 @@ class PurchasesService:
         return await gather(*(self.__readable(p) for p in purchases))
 
     async def get_store_purchases(
-        self, store_id: Id, user_id: Id, limit: int, skip: int
-    ) -> tuple[Sequence[Purchase], int]:
+        self,
+        store_id: Id,
+        user_id: Id,
+        limit: int,
+        skip: int,
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+    ) -> Page[Purchase]:
         store = await self.stores_service.get_store_by_id(store_id)
         if user_id != store.owner_id:
             raise Forbidden
-        purchases = await self.get_purchases(limit, skip, store_id=store_id)
-        amount = await self.purchases_repo.count_all(store_id=store_id)
-        return purchases, amount
+        return await self.purchases_repo.get_page(
+            skip, limit, cursor=cursor, count=count, store_id=store_id
+        )
 
     async def get_user_purchases(
-        self, user_id: Id, limit: int | None, skip: int, **filters: Any
-    ) -> tuple[Sequence[Purchase], int]:
-        purchases = await self.get_purchases(limit, skip, buyer_id=user_id, **filters)
-        amount = await self.purchases_repo.count_all(buyer_id=user_id, **filters)
-        return purchases, amount
+        self,
+        user_id: Id,
+        limit: int | None,
+        skip: int,
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+        **filters: Any,
+    ) -> Page[Purchase]:
+        return await self.purchases_repo.get_page(
+            skip, limit, cursor=cursor, count=count, buyer_id=user_id, **filters
+        )
 
     async def get_purchases(
         self, limit: int | None = None, skip: int = 0, **filters: Any
@@ -128,6 +144,7 @@ class PurchasesService:
         if purchase is None:
             raise PurchaseNotFound
 
+        previous_status = purchase.payment_status
         if not await self.payments_service.update_payment_status(purchase, new_status):
             return
 
@@ -135,11 +152,39 @@ class PurchasesService:
             # Restore stock
             for item in purchase.items:
                 await self.products_service.update_stock(item.product, item.quantity)
+        elif previous_status == PaymentStatus.EXPIRED:
+            # Paid after it expired: take back as much of its stock as is left
+            await self.products_service.restore_stock(
+                {item.product_id: -item.quantity for item in purchase.items}
+            )
 
         await self.purchases_repo.save(purchase)
         await self.__send_order_notification(purchase)
         await self.__send_event_message(purchase)
 
+    async def expire_purchases(self, created_before: datetime, limit: int) -> Sequence[Purchase]:
+        """
+        Expires up to `limit` purchases whose payment was created before `created_before` and
+        never started, restoring their products' stock. Returns the expired purchases, which
+        should be notified with `notify_expired_purchases` once the expiry is committed.
+        """
+        purchases = await self.purchases_repo.get_expired(created_before, limit)
+        quantities: dict[Id, int] = {}
+        for purchase in purchases:
+            self.payments_service.expire_payment(purchase)
+            for item in purchase.items:
+                quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+            await self.purchases_repo.save(purchase)
+        await self.products_service.restore_stock(quantities)
+        return purchases
+
+    async def notify_expired_purchases(self, purchases: Sequence[Purchase]) -> None:
+        for purchase in purchases:
+            try:
+                await self.__send_order_notification(purchase)
+            except Exception as e:
+                logging.error(f"Failed to notify expired purchase {purchase.id}", exc_info=e)
+
     async def __send_order_notification(self, purchase: Purchase) -> None:
         text = await self.__get_notification_text(purchase)
         if text is None:
@@ -178,6 +223,12 @@ class PurchasesService:
                 f"[{purchase.store.name}] Se canceló una compra",
                 f"El pago por ${total_cost} fue cancelado. Se restauró el stock de tus productos.",
             )
+        if purchase.payment_status == PaymentStatus.EXPIRED:
+            return (
+                f"[{purchase.store.name}] Se venció una compra",
+                f"El pago por ${total_cost} no se completó a tiempo. "
+                "Se restauró el stock de tus productos.",
+            )
         return None
 
     async def __send_event_message(self, purchase: Purchase) -> None:
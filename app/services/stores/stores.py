@@ -6,11 +6,13 @@ from fastapi import Depends
 from app.exceptions.stores import StoreAlreadyExists, StoreNotFound
 from app.exceptions.users import Forbidden
 from app.models.stores import StoreCreate, Store, StoreRead
-from app.models.util import File, Id
+from app.models.util import Coordinates, CountMode, DistanceCursor, File, Id, KeysetCursor, now
+from app.repositories.base_repository import Page
 from app.repositories.stores import StoresRepository
 from ..users import UsersService
 from ..addresses import AddressesService
 from ..files import FilesService, stores_images_service
+from ..spatial_index import SpatialIndex, get_stores_index
 
 
 class StoresService:
@@ -19,10 +21,12 @@ class StoresService:
         stores_repo: StoresRepository = Depends(StoresRepository),
         files_service: FilesService = Depends(stores_images_service),
         users_service: UsersService = Depends(UsersService),
+        spatial_index: SpatialIndex = Depends(get_stores_index),
     ):
         self.stores_repo = stores_repo
         self.files_service = files_service
         self.users_service = users_service
+        self.spatial_index = spatial_index
 
     async def create_store(self, data: StoreCreate, owner_id: Id) -> Store:
         store = await self.stores_repo.get_by_name(data.name)
@@ -30,11 +34,24 @@ class StoresService:
             raise StoreAlreadyExists
         address = await AddressesService.get_address(data.address)
         store = Store(**data.model_dump(exclude={"address"}), owner_id=owner_id, address=address)
-        return await self.stores_repo.save(store)
+        store = await self.stores_repo.save(store)
+        self.__index(store)
+        return store
 
-    async def get_stores(self, limit: int, skip: int, **filters: Any) -> Sequence[Store]:
-        stores = await self.stores_repo.get_all(skip=skip, limit=limit, **filters)
-        return stores
+    async def get_stores_page(
+        self,
+        limit: int,
+        skip: int,
+        *,
+        cursor: KeysetCursor | None = None,
+        count: CountMode = CountMode.EXACT,
+        **filters: Any
+    ) -> Page[Store]:
+        """
+        Returns a page of stores with their amount counted as `count` says. If `cursor` is
+        given, the stores start after it.
+        """
+        return await self.stores_repo.get_page(skip, limit, cursor=cursor, count=count, **filters)
 
     async def get_nearby_stores(
         self,
@@ -43,23 +60,38 @@ class StoresService:
         skip: int,
         user_id: Id,
         user_address_id: Id,
+        *,
+        cursor: DistanceCursor | None = None,
+        count: CountMode = CountMode.EXACT,
         **filters: Any
-    ) -> tuple[Sequence[Store], int]:
+    ) -> tuple[Sequence[tuple[Store, float]], int | None]:
         """
-        Returns a tuple of stores and the total amount of stores nearby
+        Returns a tuple of stores with their distance in km, closest first, and the amount
+        of stores nearby counted as `count` says. If `cursor` is given, the stores start
+        after it.
         """
         c = await self.users_service.get_user_address_coordinates(
             user_id, user_address_id, user_token
         )
-        stores = await self.stores_repo.get_nearby(
-            c.latitude, c.longitude, skip=skip, limit=limit, **filters
+        return await self.stores_repo.get_nearby_page(
+            c.latitude,
+            c.longitude,
+            cursor=cursor,
+            candidate_ids=await self.get_nearby_candidates(c),
+            skip=skip,
+            limit=limit,
+            count=count,
+            **filters,
         )
-        amount = await self.stores_repo.count_nearby(c.latitude, c.longitude, **filters)
-        return stores, amount
 
-    async def count_stores(self, **filters: Any) -> int:
-        stores_count = await self.stores_repo.count_all(**filters)
-        return stores_count
+    async def get_nearby_candidates(self, coordinates: Coordinates) -> list[Id] | None:
+        """
+        Returns the ids of the stores whose delivery range might reach the given coordinates,
+        or None if they can't be narrowed down. See `SpatialIndex`.
+        """
+        return await self.spatial_index.candidates_with_updates(
+            coordinates.latitude, coordinates.longitude, self.stores_repo
+        )
 
     async def get_store_by_id(self, store_id: Id | str) -> Store:
         store = await self.stores_repo.get_by_id(store_id)
@@ -77,7 +109,14 @@ class StoresService:
             raise Forbidden
 
         address = await AddressesService.get_address(data.address)
-        return await self.stores_repo.update(store_id, {**data.model_dump(), "address": address})
+        store = await self.stores_repo.update(
+            store_id,
+            # Set explicitly since replacing only the address doesn't update the stores row,
+            # and the spatial indexes of other replicas find moved stores by it
+            {**data.model_dump(), "address": address, "updated_at": now()},
+        )
+        self.__index(store)
+        return store
 
     async def delete_store(self, store_id: Id, user_id: Id) -> None:
         store = await self.get_store_by_id(store_id)
@@ -95,6 +134,7 @@ class StoresService:
         except FileNotFoundError:
             pass
         await self.stores_repo.delete(store_id)
+        self.spatial_index.remove(store_id)
 
     async def create_store_image(self, store_id: Id, image: File, user_id: Id) -> str:
         store = await self.get_store_by_id(store_id)
@@ -120,3 +160,8 @@ class StoresService:
     async def __readable(self, store: Store, token: str) -> StoreRead:
         image = await self.files_service.get_file_url(store.id, token)
         return StoreRead(**store.model_dump(), address=store.address, image_url=image)
+
+    def __index(self, store: Store) -> None:
+        self.spatial_index.set(
+            store.id, store.address.latitude, store.address.longitude, store.delivery_range_km
+        )
@@ -13,8 +13,12 @@ from app.models.util import Id, Coordinates
 REQUEST_TIMEOUT = Timeout(5, read=45)
 
 
+def new_users_client() -> AsyncClient:
+    return AsyncClient(base_url=settings.USERS_SERVICE_URL, timeout=REQUEST_TIMEOUT)
+
+
 async def users_client() -> AsyncGenerator[AsyncClient, None]:
-    async with AsyncClient(base_url=settings.USERS_SERVICE_URL, timeout=REQUEST_TIMEOUT) as client:
+    async with new_users_client() as client:
         yield client
 
 
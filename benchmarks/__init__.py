@@ -0,0 +1,12 @@
+"""
+Benchmarks of the app's queries and algorithms, see README.md
+"""
+
+import os
+
+# Importing the app requires its settings, use the testing ones. Every benchmark imports
+# this package first, so they are set before any `app` import
+os.environ.setdefault("ENVIRONMENT", "TESTING")
+os.environ.setdefault("STORAGE_CONNECTION_STRING", "")
+for container in ("STORES", "PRODUCTS", "SERVICES"):
+    os.environ.setdefault(f"{container}_IMAGES_CONTAINER", container.lower())
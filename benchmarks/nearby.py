@@ -0,0 +1,66 @@
+"""
+Compares finding the nearby stores computing the distance to every address
+(`exact_distance_filter`) against narrowing them down to the geohash cells and bounding box
+of the largest delivery range first (`store_distance_filter`), on an SQLite database.
+
+Run with: python -m benchmarks.nearby
+"""
+
+from random import Random
+from timeit import repeat
+from typing import Any
+
+from sqlalchemy import create_engine
+from sqlmodel import Session, SQLModel
+
+from app.models.stores import Store
+from app.repositories.util import exact_distance_filter, store_distance_filter
+
+from .stores import CENTER, DistanceFilter, add_stores, count_in_range
+
+SPREAD_DEG = 2
+BATCH = 10_000
+REPEAT = 5
+
+
+def populate(session: Session, start: int, end: int, rand: Random) -> None:
+    for batch_start in range(start, end, BATCH):
+        add_stores(session, batch_start, min(batch_start + BATCH, end), SPREAD_DEG, rand)
+    session.commit()
+
+
+def count_nearby(session: Session, distance_filter: DistanceFilter) -> int:
+    return count_in_range(session, Store, distance_filter)
+
+
+def exact(lat: float, long: float) -> Any:
+    return exact_distance_filter(Store, lat, long, Store.delivery_range_km)
+
+
+def main() -> None:
+    rand = Random(0)
+    print(f"Stores spread over ±{SPREAD_DEG}° around {CENTER.latitude}, {CENTER.longitude}")
+    print(f"{'addresses':>10} | {'nearby':>6} | {'exact':>10} | {'prefilter':>10} | speedup")
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        amount = 0
+        for target in (10_000, 50_000, 100_000):
+            populate(session, amount, target, rand)
+            amount = target
+            nearby = count_nearby(session, exact)
+            assert nearby == count_nearby(session, store_distance_filter)
+            exact_time = min(repeat(lambda: count_nearby(session, exact), number=1, repeat=REPEAT))
+            prefilter_time = min(
+                repeat(
+                    lambda: count_nearby(session, store_distance_filter), number=1, repeat=REPEAT
+                )
+            )
+            print(
+                f"{amount:>10} | {nearby:>6} | {exact_time * 1000:>8.1f}ms |"
+                f" {prefilter_time * 1000:>8.1f}ms | {exact_time / prefilter_time:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
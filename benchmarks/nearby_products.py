@@ -0,0 +1,86 @@
+"""
+Compares finding the products of the stores in range of an address with a correlated
+subquery through the store and its address for every product (`nested_filter`) against
+selecting the ids of the stores in range once and filtering the products by them
+(`product_distance_filter`), on an SQLite database.
+
+Run with: python -m benchmarks.nearby_products
+"""
+
+from datetime import datetime, timezone
+from random import Random
+from timeit import repeat
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy import create_engine, insert
+from sqlmodel import Session, SQLModel
+
+from app.models.stores import Product
+from app.repositories.util import product_distance_filter, store_distance_filter
+
+from .stores import CENTER, DistanceFilter, add_stores, count_in_range
+
+SPREAD_DEG = 0.3
+STORES = 500
+PRODUCTS_PER_STORE = 200
+REPEAT = 5
+
+
+def populate(session: Session, rand: Random) -> None:
+    now = datetime.now(timezone.utc)
+    store_ids = add_stores(session, 0, STORES, SPREAD_DEG, rand)
+    products = [
+        {
+            "created_at": now,
+            "updated_at": now,
+            "id": uuid4(),
+            "store_id": store_id,
+            "name": f"Product {j}",
+            "price": 10,
+            "enabled": True,
+            "percent_off": 0,
+            "available": 1,
+        }
+        for store_id in store_ids
+        for j in range(PRODUCTS_PER_STORE)
+    ]
+    session.execute(insert(Product), products)
+    session.commit()
+
+
+def count_nearby(session: Session, distance_filter: DistanceFilter) -> int:
+    return count_in_range(session, Product, distance_filter)
+
+
+def nested_filter(lat: float, long: float) -> Any:
+    return Product.store.has(store_distance_filter(lat, long))  # type: ignore
+
+
+def main() -> None:
+    rand = Random(0)
+    print(
+        f"{STORES} stores with {PRODUCTS_PER_STORE} products each, spread over ±{SPREAD_DEG}°"
+        f" around {CENTER.latitude}, {CENTER.longitude}"
+    )
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        populate(session, rand)
+        nearby = count_nearby(session, nested_filter)
+        assert nearby == count_nearby(session, product_distance_filter)
+        nested_time = min(
+            repeat(lambda: count_nearby(session, nested_filter), number=1, repeat=REPEAT)
+        )
+        flat_time = min(
+            repeat(lambda: count_nearby(session, product_distance_filter), number=1, repeat=REPEAT)
+        )
+    print(f"{'nearby':>6} | {'nested':>10} | {'store ids':>10} | speedup")
+    print(
+        f"{nearby:>6} | {nested_time * 1000:>8.1f}ms | {flat_time * 1000:>8.1f}ms |"
+        f" {nested_time / flat_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares counting the booked appointments that overlap with each candidate slot
+using an IntervalTree (one overlap query per slot) against the OccupancySweep.
+
+Run with: python -m benchmarks.occupancy
+"""
+
+from datetime import datetime, timedelta, timezone
+from random import Random
+from timeit import repeat
+
+from intervaltree import IntervalTree  # type: ignore
+
+from app.services.services.availability import OccupancySweep
+
+DAYS = 60
+SLOT = timedelta(minutes=5)
+DAY_START = timedelta(hours=8)
+DAY_END = timedelta(hours=20)
+REPEAT = 5
+
+
+def get_slots(t0: datetime) -> list[tuple[datetime, datetime]]:
+    slots = []
+    for day in range(DAYS):
+        start = t0 + timedelta(days=day) + DAY_START
+        while start + SLOT <= t0 + timedelta(days=day) + DAY_END:
+            slots.append((start, start + SLOT))
+            start += SLOT
+    return slots
+
+
+def get_appointments(
+    slots: list[tuple[datetime, datetime]], amount: int, rand: Random
+) -> list[tuple[datetime, datetime]]:
+    return [rand.choice(slots) for _ in range(amount)]
+
+
+def with_tree(
+    slots: list[tuple[datetime, datetime]], appointments: list[tuple[datetime, datetime]]
+) -> list[int]:
+    # Each interval needs its own data, otherwise identical appointments are deduplicated
+    tree = IntervalTree.from_tuples((start, end, i) for i, (start, end) in enumerate(appointments))
+    return [len(tree.overlap(start, end)) for start, end in slots]
+
+
+def with_sweep(
+    slots: list[tuple[datetime, datetime]], appointments: list[tuple[datetime, datetime]]
+) -> list[int]:
+    sweep = OccupancySweep(appointments)
+    return [sweep.count(start, end) for start, end in slots]
+
+
+def main() -> None:
+    rand = Random(0)
+    slots = get_slots(datetime(2024, 1, 1, tzinfo=timezone.utc))
+    print(f"{len(slots)} slots ({DAYS} days of {SLOT} slots)")
+    print(f"{'appointments':>12} | {'IntervalTree':>12} | {'sweep':>10} | speedup")
+    for amount in (100, 1_000, 5_000, 20_000):
+        appointments = get_appointments(slots, amount, rand)
+        assert with_tree(slots, appointments) == with_sweep(slots, appointments)
+        # The appointments are bound as default arguments, not looked up when the lambdas run
+        tree = min(
+            repeat(
+                lambda a=appointments: with_tree(slots, a),  # type: ignore[misc]
+                number=1,
+                repeat=REPEAT,
+            )
+        )
+        sweep = min(
+            repeat(
+                lambda a=appointments: with_sweep(slots, a),  # type: ignore[misc]
+                number=1,
+                repeat=REPEAT,
+            )
+        )
+        print(
+            f"{amount:>12} | {tree * 1000:>10.1f}ms | {sweep * 1000:>8.1f}ms | {tree / sweep:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
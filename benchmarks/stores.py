@@ -0,0 +1,79 @@
+"""
+Random stores and the queries over them shared by the nearby benchmarks
+"""
+
+from datetime import datetime, timezone
+from random import Random
+from typing import Any, Callable
+from uuid import uuid4
+
+from sqlalchemy import ColumnElement, insert
+from sqlmodel import Session, SQLModel, func, select
+
+from app.models.addresses import Address, StoreAddressLink
+from app.models.geohash import encode
+from app.models.stores import Store
+from app.models.util import Coordinates, Id
+
+# Buenos Aires
+CENTER = Coordinates(latitude=-34.6, longitude=-58.4)
+
+DistanceFilter = Callable[[float, float], ColumnElement[bool] | Any]
+
+
+def address_row(i: int, latitude: float, longitude: float) -> dict[str, Any]:
+    return {
+        "id": uuid4(),
+        "street": "Street",
+        "street_number": str(i),
+        "city": "City",
+        "region": "Region",
+        "country_code": "AR",
+        "type": "storefront",
+        "latitude": latitude,
+        "longitude": longitude,
+        # Bulk inserts skip the ORM events that set it
+        "geohash": encode(latitude, longitude),
+    }
+
+
+def store_row(i: int, rand: Random) -> dict[str, Any]:
+    return {
+        "id": uuid4(),
+        "owner_id": uuid4(),
+        "name": f"Store {i}",
+        "delivery_range_km": rand.uniform(1, 20),
+        "shipping_cost": 0,
+    }
+
+
+def add_stores(session: Session, start: int, end: int, spread_deg: float, rand: Random) -> list[Id]:
+    """
+    Inserts the stores `start` to `end` (and their addresses) spread over ±`spread_deg`
+    around `CENTER`, without committing. Returns their ids.
+    """
+    now = datetime.now(timezone.utc)
+    timestamps = {"created_at": now, "updated_at": now}
+    addresses, stores = [], []
+    for i in range(start, end):
+        lat = CENTER.latitude + rand.uniform(-spread_deg, spread_deg)
+        long = CENTER.longitude + rand.uniform(-spread_deg, spread_deg)
+        addresses.append({**timestamps, **address_row(i, lat, long)})
+        stores.append({**timestamps, **store_row(i, rand)})
+    links = [
+        {"store_id": store["id"], "address_id": address["id"]}
+        for store, address in zip(stores, addresses)
+    ]
+    session.execute(insert(Address), addresses)
+    session.execute(insert(Store), stores)
+    session.execute(insert(StoreAddressLink), links)
+    return [store["id"] for store in stores]
+
+
+def count_in_range(session: Session, model: type[SQLModel], distance_filter: DistanceFilter) -> int:
+    query = (
+        select(func.count())  # pylint: disable=not-callable
+        .select_from(model)
+        .where(distance_filter(CENTER.latitude, CENTER.longitude))
+    )
+    return session.exec(query).one()
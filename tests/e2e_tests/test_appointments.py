@@ -1,3 +1,4 @@
+import json
 from typing import Any
 from uuid import UUID, uuid4
 from datetime import datetime, timedelta, time
@@ -112,6 +113,95 @@ class TestAppointmentsRoute(BaseAPITestCase):
             }
         ]
 
+    async def test_get_available_appointments_ndjson(self) -> None:
+        r_service = await self.client.post("/services", json=self.service_create_json_data)
+        assert r_service.status_code == 201
+        service = r_service.json()
+        r_json = await self.client.get(f"/services/{service['id']}/appointments/available")
+        assert r_json.status_code == 200
+
+        r = await self.client.get(
+            f"/services/{service['id']}/appointments/available",
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/x-ndjson"
+        chunks = [json.loads(line) for line in r.text.splitlines()]
+        # The stream doesn't merge consecutive occurrences of the same slots configuration
+        assert [a for c in chunks for a in c["available_appointments"]] == [
+            a for c in r_json.json() for a in c["available_appointments"]
+        ]
+
+    async def test_get_available_appointments_summary(self) -> None:
+        r_service = await self.client.post("/services", json=self.service_create_json_data)
+        assert r_service.status_code == 201
+        service = r_service.json()
+
+        r = await self.client.get(
+            f"/services/{service['id']}/appointments/available", params={"summary": "day"}
+        )
+
+        assert r.status_code == 200
+        assert [
+            {"start": datetime.fromisoformat(a["start"]), "amount": a["amount"]} for a in r.json()
+        ] == [
+            {"start": datetime.combine(self.appointment_date, time.min, self.tz), "amount": 24},
+        ]
+
+    async def test_get_services_available_appointments(self) -> None:
+        r_first = await self.client.post("/services", json=self.service_create_json_data)
+        assert r_first.status_code == 201
+        r_second = await self.client.post("/services", json=self.service_create_json_data)
+        assert r_second.status_code == 201
+        first, second = r_first.json(), r_second.json()
+
+        r = await self.client.get(
+            "/services/appointments/available",
+            params={"service_ids": [second["id"], str(uuid4()), first["id"]]},
+        )
+
+        assert r.status_code == 200
+        available = r.json()
+        assert [a["service_id"] for a in available] == [second["id"], first["id"]]
+        for service_available in available:
+            assert len(service_available["available_appointments"]) == 1
+            assert [
+                datetime.fromisoformat(a["start"])
+                for a in service_available["available_appointments"][0]["available_appointments"]
+            ] == [
+                datetime.combine(self.appointment_date, time(8, 0), self.tz),
+                datetime.combine(self.appointment_date, time(8, 30), self.tz),
+            ]
+
+    async def test_get_services_available_appointments_requires_ids(self) -> None:
+        r = await self.client.get("/services/appointments/available")
+        assert r.status_code == 400
+
+    async def test_get_next_available_appointment(self) -> None:
+        r_service = await self.client.post("/services", json=self.service_create_json_data)
+        assert r_service.status_code == 201
+        service = r_service.json()
+
+        r = await self.client.get(f"/services/{service['id']}/appointments/next-available")
+
+        assert r.status_code == 200
+        assert datetime.fromisoformat(r.json()["start"]) == datetime.combine(
+            self.appointment_date, time(8, 0), self.tz
+        )
+        assert r.json()["amount"] == 12
+
+    async def test_get_services_includes_next_available(self) -> None:
+        r_service = await self.client.post("/services", json=self.service_create_json_data)
+        assert r_service.status_code == 201
+
+        r = await self.client.get("/services")
+
+        assert r.status_code == 200
+        assert [datetime.fromisoformat(s["next_available"]) for s in r.json()["services"]] == [
+            datetime.combine(self.appointment_date, time(8, 0), self.tz)
+        ]
+
     async def test_get_appointment_service_not_exists(self) -> None:
         r = await self.client.get(f"/services/{uuid4()}/appointments/{uuid4()}")
         assert r.status_code == 404
@@ -129,7 +219,12 @@ class TestAppointmentsRoute(BaseAPITestCase):
         service_id = r_service.json()["id"]
         r = await self.client.get(f"/services/{service_id}/appointments")
         assert r.status_code == 200
-        assert r.json() == {"appointments": [], "amount": 0}
+        assert r.json() == {
+            "appointments": [],
+            "amount": 0,
+            "amount_capped": False,
+            "next_cursor": None,
+        }
 
     async def test_get_service_appointments_not_service_owner(self) -> None:
         r_service = await self.client.post("/services", json=self.service_create_json_data)
@@ -144,7 +239,12 @@ class TestAppointmentsRoute(BaseAPITestCase):
     async def test_get_my_appointments_empty(self) -> None:
         r = await self.client.get("/services/appointments/me")
         assert r.status_code == 200
-        assert r.json() == {"appointments": [], "amount": 0}
+        assert r.json() == {
+            "appointments": [],
+            "amount": 0,
+            "amount_capped": False,
+            "next_cursor": None,
+        }
 
     async def test_appointment_service_not_exists(self) -> None:
         r = await self.client.post(
@@ -450,6 +550,50 @@ class TestAppointmentsRoute(BaseAPITestCase):
         assert len(data["appointments"]) == 1
         assert data["appointments"][0]["id"] == appointment_id_2
 
+    async def test_cancelled_appointment_frees_its_slot(
+        self,
+        httpx_mock: HTTPXMock,
+        mock_get_user_coordinates: GetUserCoordinatesMock,
+        mock_animal_validation: None,
+    ) -> None:
+        r_service = await self.client.post("/services", json=self.service_create_json_data)
+        assert r_service.status_code == 201
+        service = r_service.json()
+
+        service_owner = await self.change_service_owner(service["id"])
+        url = URL(
+            settings.PAYMENTS_SERVICE_URL + "/payment",
+            params={
+                "user_to_be_payed_id": str(service_owner),
+            },
+        )
+        httpx_mock.add_response(url=url, json={"url": "http://payment.com"})
+        address_id = uuid4()
+        mock_get_user_coordinates(address_id)
+        r = await self.client.post(
+            f"/services/{service['id']}/appointments",
+            json=self.first_appointment,
+            params={"user_address_id": str(address_id)},
+        )
+        assert r.status_code == 201
+        p = r.json()
+
+        async def get_amounts() -> list[int]:
+            r_available = await self.client.get(f"/services/{service['id']}/appointments/available")
+            assert r_available.status_code == 200
+            return [a["amount"] for s in r_available.json() for a in s["available_appointments"]]
+
+        assert await get_amounts() == [11, 12]
+
+        r_patch = await self.client.patch(
+            f"/services/{service['id']}/appointments/{p['id']}",
+            headers={"api-key": settings.PAYMENTS_API_KEY},
+            json={"status": PaymentStatus.CANCELLED},
+        )
+        assert r_patch.status_code == 202
+
+        assert await get_amounts() == [12, 12]
+
     async def test_cant_update_appointment_without_api_key(
         self,
         httpx_mock: HTTPXMock,
@@ -5,3 +5,14 @@ class TestHealth(BaseAPITestCase):
     async def test_get_server_health(self) -> None:
         response = await self.client.get("/health")
         assert response.status_code == 200
+
+    async def test_get_availability_cache_metrics(self) -> None:
+        response = await self.client.get("/health/availability-cache")
+        assert response.status_code == 200
+        assert response.json().keys() == {
+            "hits",
+            "misses",
+            "invalidations",
+            "errors",
+            "hit_ratio",
+        }
@@ -4,7 +4,7 @@ from uuid import uuid4
 from sqlmodel import select
 
 from app.models.addresses import Address
-from app.models.stores import Store, Product
+from app.models.stores import Category, Store, Product, categories_mask, mask_categories
 from app.models.util import Coordinates
 from tests.factories.store_factories import StoreCreateFactory
 from tests.factories.product_factories import ProductCreateFactory
@@ -37,7 +37,12 @@ class TestStoresProductsRoute(BaseAPITestCase):
         response_text.pop("id")
         response_text.pop("image_url")
         response_text.pop("reviews_average_rating")
-        assert product._categories is not None
+        assert response_text.pop("distance_km") is None
+        await self.db.refresh(product, ["_categories"])
+        categories = self.product_create_json_data["categories"]
+        assert {c.category for c in product._categories} == set(categories)
+        assert set(mask_categories(product.category_mask)) == set(categories)
+        assert set(response_text["categories"]) == set(categories)
         assert len(response_text.items()) == len(self.product_create_json_data.items())
 
     async def test_create_product_with_required_fields(self) -> None:
@@ -111,12 +116,14 @@ class TestStoresProductsRoute(BaseAPITestCase):
         response_text_1.pop("id")
         response_text_1.pop("image_url")
         response_text_1.pop("reviews_average_rating")
+        assert response_text_1.pop("distance_km") is None
         assert len(response_text_1.items()) == len(self.product_create_json_data.items())
         assert product_2 is not None
         assert response_text_2.pop("store_id") == store_id
         response_text_2.pop("id")
         response_text_2.pop("image_url")
         response_text_2.pop("reviews_average_rating")
+        assert response_text_2.pop("distance_km") is None
         assert len(response_text_2.items()) == len(product_create_json_data_2.items())
 
     async def test_create_and_get(self) -> None:
@@ -136,6 +143,7 @@ class TestStoresProductsRoute(BaseAPITestCase):
         response_text.pop("id")
         response_text.pop("image_url")
         response_text.pop("reviews_average_rating")
+        assert response_text.pop("distance_km") is None
         assert len(response_text.items()) == len(self.product_create_json_data.items())
 
     async def test_create_and_modify_product(self) -> None:
@@ -160,6 +168,30 @@ class TestStoresProductsRoute(BaseAPITestCase):
         response_text_2: dict[str, Any] = r_product_2.json()
         assert response_text_2 == response_text
 
+    async def test_modify_product_categories(self) -> None:
+        r_store = await self.client.post("/stores", json=self.store_create_json_data)
+        assert r_store.status_code == 201
+        store_id = r_store.json()["id"]
+        self.product_create_json_data["categories"] = ["alimentos", "juguetes"]
+
+        r_product = await self.client.post(
+            f"/stores/{store_id}/products", json=self.product_create_json_data
+        )
+        assert r_product.status_code == 201
+        product_id = r_product.json()["id"]
+        r_product_2 = await self.client.put(
+            f"/stores/{store_id}/products/{product_id}",
+            json=self.product_create_json_data | {"categories": ["juguetes", "camas"]},
+        )
+        assert r_product_2.status_code == 200
+
+        r_product_3 = await self.client.get(f"/stores/{store_id}/products/{product_id}")
+        assert r_product_3.json()["categories"] == ["juguetes", "camas"]
+        product = await self.db.get(Product, (store_id, product_id))
+        assert product is not None
+        await self.db.refresh(product, ["_categories"])
+        assert {c.category for c in product._categories} == {"juguetes", "camas"}
+
     async def test_create_delete_get_product_returns_404(self) -> None:
         r_store = await self.client.post("/stores", json=self.store_create_json_data)
         assert r_store.status_code == 201
@@ -306,3 +338,47 @@ class TestStoresProductsRoute(BaseAPITestCase):
         assert response.status_code == 200
         products = response.json()["products"]
         assert {s["name"] for s in products} == {product_3.name}
+
+    async def test_get_nearby_products_categories_filter(
+        self, mock_get_user_coordinates: GetUserCoordinatesMock
+    ) -> None:
+        store_base = self.store_create_json_data
+        store_base.pop("delivery_range_km")
+        store_base["owner_id"] = self.user_id
+        addr_base: Any = store_base.pop("address")
+
+        product_base = self.product_create_json_data
+        product_base.pop("name")
+        product_base.pop("categories")
+
+        def create_product(name: str, *categories: Category) -> Product:
+            return Product(**product_base, name=name, category_mask=categories_mask(categories))
+
+        food = create_product("Comida", Category.ALIMENTOS)
+        toy = create_product("Juguete", Category.JUGUETES, Category.ACCESORIOS)
+        bed = create_product("Cama", Category.CAMAS)
+        address = Address(**addr_base, latitude=-34.60381182712754, longitude=-58.38586757264521)
+        store_base["name"] = "Tienda 1"
+        self.db.add(
+            Store(**store_base, address=address, delivery_range_km=1, products=[food, toy, bed])
+        )
+        await self.db.flush()
+
+        address_id = uuid4()
+        mock_get_user_coordinates(
+            address_id,
+            # obelisco
+            return_value=Coordinates(latitude=-34.60360640938748, longitude=-58.38153821730145),
+        )
+
+        response = await self.client.get(
+            "/stores/nearby/products",
+            params={"user_address_id": str(address_id), "categories": ["alimentos", "accesorios"]},
+        )
+        assert response.status_code == 200
+        products = response.json()["products"]
+        assert {p["name"] for p in products} == {food.name, toy.name}
+        assert {p["name"]: p["categories"] for p in products}[toy.name] == [
+            "juguetes",
+            "accesorios",
+        ]
@@ -54,7 +54,12 @@ class TestPurchasesRoute(BaseAPITestCase):
         store_id = r_store.json()["id"]
         r = await self.client.get(f"/stores/{store_id}/purchases")
         assert r.status_code == 200
-        assert r.json() == {"purchases": [], "amount": 0}
+        assert r.json() == {
+            "purchases": [],
+            "amount": 0,
+            "amount_capped": False,
+            "next_cursor": None,
+        }
 
     async def test_get_store_purchases_not_store_owner(self) -> None:
         r_store = await self.client.post("/stores", json=self.store_create_json_data)
@@ -69,7 +74,12 @@ class TestPurchasesRoute(BaseAPITestCase):
     async def test_get_my_purchases_empty(self) -> None:
         r = await self.client.get("/stores/purchases/me")
         assert r.status_code == 200
-        assert r.json() == {"purchases": [], "amount": 0}
+        assert r.json() == {
+            "purchases": [],
+            "amount": 0,
+            "amount_capped": False,
+            "next_cursor": None,
+        }
 
     async def test_purchase_store_not_exists(self) -> None:
         r = await self.client.post(
@@ -1,11 +1,14 @@
 import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 from typing import Any
+from zoneinfo import ZoneInfo
 import pytest
 from uuid import uuid4
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.addresses import Address
-from app.models.services import Service
+from app.models.services import AppointmentSlots, DayOfWeek, Service
 from app.models.util import Coordinates
 from tests.tests_setup import BaseAPITestCase, GetUserCoordinatesMock
 from tests.factories.service_factories import ServiceCreateFactory
@@ -283,6 +286,62 @@ class TestServicesRoute(BaseAPITestCase):
         services = response.json()["services"]
         assert {s["name"] for s in services} == {service_3.name}
 
+    async def test_get_nearby_services_available_in_window(
+        self, mock_get_user_coordinates: GetUserCoordinatesMock
+    ) -> None:
+        service_base = {
+            k: v
+            for k, v in self.service_create.items()
+            if k not in ("name", "address", "appointment_slots", "appointment_days_in_advance")
+        }
+        addr_base = self.service_create["address"]
+        tz = ZoneInfo(self.service_create["timezone"])
+        tomorrow = datetime.now(tz).date() + timedelta(days=1)
+        weekday = DayOfWeek.from_weekday(tomorrow.weekday())
+
+        def create_service(name: str, start: time, end: time) -> Service:
+            return Service(
+                **service_base,
+                name=name,
+                owner_id=self.user_id,
+                appointment_days_in_advance=2,
+                address=Address(
+                    **addr_base, latitude=-34.60381182712754, longitude=-58.38586757264521
+                ),
+                appointment_slots=[
+                    AppointmentSlots(
+                        start_day=weekday,
+                        start_time=start,
+                        end_day=weekday,
+                        end_time=end,
+                        appointment_duration=timedelta(minutes=30),
+                        appointment_price=Decimal(50),
+                    )
+                ],
+            )
+
+        self.db.add(create_service("Morning", time(8, 0), time(9, 0)))
+        self.db.add(create_service("Afternoon", time(14, 0), time(15, 0)))
+        await self.db.flush()
+
+        address_id = uuid4()
+        mock_get_user_coordinates(
+            address_id,
+            return_value=Coordinates(latitude=-34.60360640938748, longitude=-58.38153821730145),
+        )
+
+        response = await self.client.get(
+            "/services/nearby",
+            params={
+                "user_address_id": str(address_id),
+                "available_after": datetime.combine(tomorrow, time(8, 0), tz).isoformat(),
+                "available_before": datetime.combine(tomorrow, time(10, 0), tz).isoformat(),
+            },
+        )
+        assert response.status_code == 200
+        assert [s["name"] for s in response.json()["services"]] == ["Morning"]
+        assert response.json()["amount"] == 1
+
     async def test_get_nearby_services_owner_filter(
         self, mock_get_user_coordinates: GetUserCoordinatesMock
     ) -> None:
@@ -2,9 +2,11 @@ import json
 from typing import Any
 from uuid import uuid4
 
+import pytest
+
 from app.models.addresses import Address
 from app.models.stores import Store
-from app.models.util import Coordinates
+from app.models.util import CAPPED_COUNT, Coordinates
 from tests.tests_setup import BaseAPITestCase, GetUserCoordinatesMock
 from tests.fixtures.stores import valid_store, valid_store2, invalid_store
 
@@ -95,6 +97,56 @@ class TestStoresRoute(BaseAPITestCase):
         response_text = json.loads(response3.text)
         await _verify_paginated_response(self.db, response_text, 1, 2)
 
+    async def test_get_stores_count_modes(self) -> None:
+        store_base: dict[str, Any] = {"owner_id": uuid4(), "shipping_cost": 0, "description": ":D"}
+        addr_base: Any = valid_store["address"]
+        for i in range(CAPPED_COUNT + 2):
+            address = Address(**addr_base, latitude=0, longitude=0)
+            self.db.add(
+                Store(**store_base, address=address, name=f"Store {i}", delivery_range_km=1)
+            )
+        await self.db.flush()
+
+        exact = (await self.client.get("/stores", params={"count": "exact"})).json()
+        capped = (await self.client.get("/stores", params={"count": "capped"})).json()
+        not_counted = (await self.client.get("/stores", params={"count": "none"})).json()
+
+        assert (exact["amount"], exact["amount_capped"]) == (CAPPED_COUNT + 2, False)
+        assert (capped["amount"], capped["amount_capped"]) == (CAPPED_COUNT, True)
+        assert (not_counted["amount"], not_counted["amount_capped"]) == (None, False)
+        assert len(not_counted["stores"]) == 10
+
+    async def test_get_stores_with_cursor(self) -> None:
+        store_base: dict[str, Any] = {"owner_id": uuid4(), "shipping_cost": 0, "description": ":D"}
+        addr_base: Any = valid_store["address"]
+        names = ["Store", "Big Store", "Store 2", "Pet Store", "Store 3"]
+        for name in names:
+            address = Address(**addr_base, latitude=0, longitude=0)
+            self.db.add(Store(**store_base, address=address, name=name, delivery_range_km=1))
+        await self.db.flush()
+
+        params: dict[str, Any] = {"name": "store", "limit": 2}
+        pages = []
+        for _ in range(3):
+            response = await self.client.get("/stores", params=params)
+            assert response.status_code == 200
+            pages.append(response.json())
+            params["cursor"] = pages[-1]["next_cursor"]
+
+        listed = [s["name"] for page in pages for s in page["stores"]]
+        # The exact match first, then the ones that start with the search
+        assert listed[0] == "Store"
+        assert set(listed[1:3]) == {"Store 2", "Store 3"}
+        assert sorted(listed) == sorted(names)
+        assert [page["amount"] for page in pages] == [5, 5, 5]
+        assert pages[-1]["next_cursor"] is None
+
+    async def test_get_stores_invalid_cursor(self) -> None:
+        response = await self.client.get("/stores", params={"cursor": "invalid"})
+        assert response.status_code == 400
+        response = await self.client.get("/stores", params={"cursor": "WyJub3QgYW4gaWQiXQ=="})
+        assert response.status_code == 400
+
     async def test_get_store_by_id(self) -> None:
         response = await self.client.post("/stores", json=valid_store)
         assert response.status_code == 201
@@ -311,6 +363,58 @@ class TestStoresRoute(BaseAPITestCase):
         stores = response.json()["stores"]
         assert {s["owner_id"] for s in stores} == {str(owner_id1)}
 
+    async def test_get_nearby_stores_sorted_by_distance_with_cursor(
+        self, mock_get_user_coordinates: GetUserCoordinatesMock
+    ) -> None:
+        store_base: dict[str, Any] = {"owner_id": uuid4(), "shipping_cost": 0, "description": ":D"}
+        addr_base: Any = valid_store["address"]
+
+        # Tienda 1: a ~3.4km del obelisco, radio de 4km
+        address_1 = Address(**addr_base, latitude=-34.61434525255158, longitude=-58.4172589555573)
+        store_1 = Store(**store_base, address=address_1, name="Tienda 1", delivery_range_km=4)
+
+        # Tienda 2: a menos de 500m del obelisco, radio de 1km
+        address_2 = Address(**addr_base, latitude=-34.60381182712754, longitude=-58.38586757264521)
+        store_2 = Store(**store_base, address=address_2, name="Tienda 2", delivery_range_km=1)
+
+        self.db.add(store_1)
+        self.db.add(store_2)
+        await self.db.flush()
+
+        address_id = uuid4()
+        mock_get_user_coordinates(
+            address_id,
+            # obelisco
+            return_value=Coordinates(latitude=-34.60360640938748, longitude=-58.38153821730145),
+        )
+        params: dict[str, Any] = {"user_address_id": str(address_id), "limit": 1}
+
+        response = await self.client.get("/stores/nearby", params=params)
+        assert response.status_code == 200
+        first_page = response.json()
+        assert [s["name"] for s in first_page["stores"]] == [store_2.name]
+        assert first_page["stores"][0]["distance_km"] == pytest.approx(0.4, abs=0.1)
+        assert first_page["amount"] == 2
+
+        params["cursor"] = first_page["next_cursor"]
+        response = await self.client.get("/stores/nearby", params=params)
+        assert response.status_code == 200
+        second_page = response.json()
+        assert [s["name"] for s in second_page["stores"]] == [store_1.name]
+        assert second_page["stores"][0]["distance_km"] == pytest.approx(3.4, abs=0.1)
+
+        params["cursor"] = second_page["next_cursor"]
+        response = await self.client.get("/stores/nearby", params=params)
+        assert response.status_code == 200
+        assert response.json()["stores"] == []
+        assert response.json()["next_cursor"] is None
+
+    async def test_get_nearby_stores_invalid_cursor(self) -> None:
+        response = await self.client.get(
+            "/stores/nearby", params={"user_address_id": str(uuid4()), "cursor": "invalid"}
+        )
+        assert response.status_code == 400
+
 
 # Aux
 async def _verify_paginated_response(db, response_text, stores_in_page, amount):  # type: ignore
@@ -35,6 +35,10 @@ class ServiceCreateFactory(ModelFactory[ServiceCreate]):
                 )
         return slots
 
+    @classmethod
+    def customer_range_km(cls) -> float:
+        return cls.__random__.uniform(1, 20)
+
     @classmethod
     def address(cls) -> AddressCreate:
         return AddressCreateFactory.build(country_code="AR", type="other")
@@ -0,0 +1,70 @@
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+from types import ModuleType
+from uuid import uuid4
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Column, Float, MetaData, Table, Uuid, create_engine, insert, select, text
+
+from app.models.geohash import encode
+
+MIGRATION = Path(__file__).parents[3] / "alembic" / "versions" / "b5f0e3d8c461_.py"
+
+
+def load_migration() -> ModuleType:
+    spec = spec_from_file_location("addresses_geohash_migration", MIGRATION)
+    assert spec is not None and spec.loader is not None
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestAddressesGeohashMigration:
+    def setup_method(self) -> None:
+        self.engine = create_engine("sqlite://")
+        # The tables as they were before the migration
+        self.metadata = MetaData()
+        self.addresses = Table(
+            "addresses",
+            self.metadata,
+            Column("id", Uuid, primary_key=True),
+            Column("latitude", Float),
+            Column("longitude", Float),
+        )
+        Table(
+            "services",
+            self.metadata,
+            Column("id", Uuid, primary_key=True),
+            Column("customer_range_km", Float),
+        )
+        self.metadata.create_all(self.engine)
+
+    def test_upgrade_backfills_every_page_of_addresses(self) -> None:
+        # Given
+        coordinates = [(float(i), float(-i)) for i in range(5)]
+        with self.engine.begin() as connection:
+            connection.execute(
+                insert(self.addresses),
+                [
+                    {"id": uuid4(), "latitude": latitude, "longitude": longitude}
+                    for latitude, longitude in coordinates
+                ],
+            )
+        migration = load_migration()
+        setattr(migration, "BACKFILL_BATCH_SIZE", 2)
+
+        # When
+        with self.engine.begin() as connection:
+            with Operations.context(MigrationContext.configure(connection)):
+                migration.upgrade()
+
+        # Then
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(self.addresses.c.latitude, self.addresses.c.longitude, text("geohash"))
+            ).all()
+        assert sorted(rows) == sorted(
+            (latitude, longitude, encode(latitude, longitude))
+            for latitude, longitude in coordinates
+        )
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+from types import ModuleType
+from uuid import uuid4
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine
+from sqlmodel import Session, SQLModel, select
+
+from app.models.payments import PaymentStatus
+from app.models.services import Appointment, SlotOccupancy
+
+MIGRATION = Path(__file__).parents[3] / "alembic" / "versions" / "5b2e7c1d9a40_.py"
+
+
+def load_migration() -> ModuleType:
+    spec = spec_from_file_location("slot_occupancy_migration", MIGRATION)
+    assert spec is not None and spec.loader is not None
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestSlotOccupancyMigration:
+    def setup_method(self) -> None:
+        self.engine = create_engine("sqlite://")
+        # The slot_occupancy table is created by the migration
+        SQLModel.metadata.create_all(self.engine, tables=[Appointment.__table__])  # type: ignore
+        self.service_id = uuid4()
+        self.start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=1)
+
+    def appointment(
+        self, end: timedelta, status: PaymentStatus = PaymentStatus.COMPLETED
+    ) -> Appointment:
+        return Appointment(
+            service_id=self.service_id,
+            start=self.start,
+            end=self.start + end,
+            customer_id=uuid4(),
+            customer_address_id=uuid4(),
+            animal_id=uuid4(),
+            price=Decimal(10),
+            payment_status=status,
+        )
+
+    def test_upgrade_counts_appointments_with_the_same_start_once(self) -> None:
+        # Given
+        with Session(self.engine) as session:
+            session.add_all(
+                [
+                    self.appointment(timedelta(minutes=30)),
+                    self.appointment(timedelta(minutes=45)),
+                    self.appointment(timedelta(hours=1), PaymentStatus.CANCELLED),
+                ]
+            )
+            session.commit()
+
+        # When
+        with self.engine.begin() as connection:
+            with Operations.context(MigrationContext.configure(connection)):
+                load_migration().upgrade()
+
+        # Then
+        with Session(self.engine) as session:
+            occupancies = session.exec(select(SlotOccupancy)).all()
+        assert len(occupancies) == 1
+        assert occupancies[0].service_id == self.service_id
+        assert occupancies[0].slot_start == self.start
+        assert occupancies[0].slot_end == self.start + timedelta(minutes=45)
+        assert occupancies[0].amount == 2
@@ -0,0 +1,52 @@
+from random import Random
+
+from app.models.geohash import (
+    GEOHASH_PRECISION,
+    MAX_COVERING_CELLS,
+    cell_size,
+    covering_cells,
+    encode,
+    prefix_upper_bound,
+)
+
+
+class TestGeohash:
+    def test_encode(self) -> None:
+        assert encode(57.64911, 10.40744, precision=11) == "u4pruydqqvj"
+        assert encode(-34.6036844, -58.3815591) == "69y7pk"
+        assert encode(-34.6036844, -58.3815591, precision=3) == "69y"
+
+    def test_cell_size(self) -> None:
+        assert cell_size(1) == (45, 45)
+        assert cell_size(2) == (45 / 8, 45 / 4)
+
+    def test_covering_cells_contain_every_point_in_box(self) -> None:
+        # Given
+        rand = Random(0)
+        box = (-34.7, -34.5, -58.5, -58.3)
+
+        # When
+        cells = covering_cells(*box)
+
+        # Then
+        assert cells is not None
+        assert len(cells) <= MAX_COVERING_CELLS
+        for _ in range(1000):
+            point = encode(rand.uniform(box[0], box[1]), rand.uniform(box[2], box[3]))
+            assert any(point.startswith(cell) for cell in cells)
+
+    def test_covering_cells_of_small_box_use_full_precision(self) -> None:
+        # When
+        cells = covering_cells(-34.6, -34.6, -58.4, -58.4)
+
+        # Then
+        assert cells == [encode(-34.6, -58.4)]
+        assert len(cells[0]) == GEOHASH_PRECISION
+
+    def test_covering_cells_of_whole_world(self) -> None:
+        assert covering_cells(-90, 90, -180, 180) is None
+
+    def test_prefix_upper_bound(self) -> None:
+        assert prefix_upper_bound("69y") == "69z"
+        assert prefix_upper_bound("6ez") == "6f"
+        assert prefix_upper_bound("zz") is None
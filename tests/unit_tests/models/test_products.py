@@ -1,7 +1,7 @@
 from unittest import IsolatedAsyncioTestCase
 
 from pydantic import ValidationError
-from app.models.stores import Category, ProductCreate
+from app.models.stores import Category, ProductCreate, categories_mask, mask_categories
 from tests.factories.product_factories import ProductCreateFactory
 
 
@@ -55,3 +55,13 @@ class TestProductsModel(IsolatedAsyncioTestCase):
             ProductCreate(**product_create.__dict__)
         # Then
         assert "Cannot have more than" in str(context.exception)
+
+    async def test_categories_mask_round_trip(self) -> None:
+        # Given
+        categories = [Category.ALIMENTOS, Category.CAMAS, Category.PLATOS_Y_COMEDEROS]
+        # When
+        mask = categories_mask(categories)
+        # Then
+        assert mask == 0b1100000001
+        assert mask_categories(mask) == categories
+        assert mask_categories(0) == []
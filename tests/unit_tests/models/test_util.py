@@ -0,0 +1,30 @@
+import pytest
+from pydantic import ValidationError
+from pytest import approx
+
+from app.models.util import Coordinates
+from tests.factories.service_factories import ServiceCreateFactory
+
+
+class TestCoordinates:
+    buenos_aires = Coordinates(latitude=-34.6036844, longitude=-58.3815591)
+    montevideo = Coordinates(latitude=-34.9011127, longitude=-56.1645314)
+
+    def test_distance_to(self) -> None:
+        assert self.buenos_aires.distance_to(self.montevideo) == approx(205.6, abs=0.5)
+        assert self.montevideo.distance_to(self.buenos_aires) == approx(205.6, abs=0.5)
+        assert self.buenos_aires.distance_to(self.buenos_aires) == 0
+
+    def test_distance_to_antipode(self) -> None:
+        antipode = Coordinates(latitude=34.6036844, longitude=121.6184409)
+        assert self.buenos_aires.distance_to(antipode) == approx(
+            Coordinates.EARTH_RADIUS_KM * 3.14159265, rel=1e-6
+        )
+
+    def test_within(self) -> None:
+        assert self.buenos_aires.within(self.montevideo, 206)
+        assert not self.buenos_aires.within(self.montevideo, 205)
+
+    def test_customer_range_cant_be_negative(self) -> None:
+        with pytest.raises(ValidationError):
+            ServiceCreateFactory.build(customer_range_km=-1)
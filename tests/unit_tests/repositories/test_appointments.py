@@ -0,0 +1,101 @@
+# mypy: disable-error-code="method-assign"
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock
+from uuid import uuid4
+
+import pytest
+
+from sqlalchemy import Dialect
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.exceptions.repository import InvalidCursor
+from app.models.util import CountMode
+from app.repositories.services import AppointmentsRepository
+
+
+class TestAppointmentsRepository:
+    def setup_method(self) -> None:
+        self.async_session = AsyncMock()
+        self.async_session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=[])))
+        self.repository = AppointmentsRepository(self.async_session)
+        self.range_start = datetime(2024, 4, 1, 8, tzinfo=timezone.utc)
+        self.range_end = datetime(2024, 4, 2, 8, tzinfo=timezone.utc)
+
+    def set_dialect(self, name: str) -> None:
+        dialect = Mock()
+        dialect.name = name
+        self.async_session.get_bind = Mock(return_value=Mock(dialect=dialect))
+
+    def executed_sql(self, dialect: Dialect) -> str:
+        query = self.async_session.exec.call_args.args[0]
+        return str(query.compile(dialect=dialect))
+
+    async def test_get_all_by_range_uses_period_overlap_on_postgres(self) -> None:
+        # Given
+        self.set_dialect("postgresql")
+
+        # When
+        await self.repository.get_all_by_range(
+            self.range_start, self.range_end, return_partial=True
+        )
+
+        # Then
+        sql = self.executed_sql(postgresql.dialect())
+        assert "appointments.period && tsrange(" in sql
+        assert "appointments.start <" not in sql
+
+    async def test_get_all_by_range_uses_period_containment_on_postgres(self) -> None:
+        # Given
+        self.set_dialect("postgresql")
+
+        # When
+        await self.repository.get_all_by_range(self.range_start, None)
+
+        # Then
+        assert "appointments.period <@ tsrange(" in self.executed_sql(postgresql.dialect())
+
+    async def test_get_all_by_range_compares_start_and_end_on_sqlite(self) -> None:
+        # Given
+        self.set_dialect("sqlite")
+
+        # When
+        await self.repository.get_all_by_range(
+            self.range_start, self.range_end, return_partial=True
+        )
+
+        # Then
+        sql = self.executed_sql(sqlite.dialect())
+        assert "period" not in sql
+        assert 'appointments."end" >' in sql
+        assert "appointments.start <" in sql
+
+    async def test_get_page_by_range_with_cursor_continues_after_the_last_appointment(
+        self,
+    ) -> None:
+        # Given
+        self.set_dialect("sqlite")
+        cursor = [str(self.range_start), str(uuid4()), str(uuid4())]
+
+        # When
+        await self.repository.get_page_by_range(
+            None, None, limit=10, cursor=cursor, count=CountMode.NONE
+        )
+
+        # Then
+        sql = self.executed_sql(sqlite.dialect())
+        assert "(appointments.start, appointments.service_id, appointments.id) < (" in sql
+        assert "ORDER BY appointments.start DESC" in sql
+
+    async def test_get_page_by_range_with_invalid_cursor(self) -> None:
+        # When, Then
+        with pytest.raises(InvalidCursor):
+            await self.repository.get_page_by_range(
+                None, None, cursor=["not a date", str(uuid4()), str(uuid4())]
+            )
+
+    async def test_get_page_by_range_with_invalid_id_in_cursor(self) -> None:
+        # When, Then
+        with pytest.raises(InvalidCursor):
+            await self.repository.get_page_by_range(
+                None, None, cursor=[str(self.range_start), str(uuid4()), "not an id"]
+            )
@@ -136,3 +136,51 @@ class TestProductsRepository(BaseDbTestCase):
 
         # Then
         assert saved_record is None
+
+    async def test_restore_stock_should_add_quantities(self) -> None:
+        # Given
+        self.db.add(self.store)
+        self.product.available = 3
+        unlimited = Product(
+            id=uuid4(),
+            store_id=self.store.id,
+            **ProductCreateFactory.build(name="unlimited", available=None).model_dump(),
+        )
+        untouched = Product(
+            id=uuid4(),
+            store_id=self.store.id,
+            **ProductCreateFactory.build(name="untouched", available=1).model_dump(),
+        )
+        self.db.add_all([self.product, unlimited, untouched])
+        await self.db.flush()
+
+        # When
+        await self.product_repository.restore_stock({self.product.id: 2, unlimited.id: 5})
+
+        # Then
+        for product in (self.product, unlimited, untouched):
+            await self.db.refresh(product)
+        assert self.product.available == 5
+        assert unlimited.available is None
+        assert untouched.available == 1
+
+    async def test_restore_stock_negative_quantities_should_not_go_below_zero(self) -> None:
+        # Given
+        self.db.add(self.store)
+        self.product.available = 3
+        other = Product(
+            id=uuid4(),
+            store_id=self.store.id,
+            **ProductCreateFactory.build(name="other", available=1).model_dump(),
+        )
+        self.db.add_all([self.product, other])
+        await self.db.flush()
+
+        # When
+        await self.product_repository.restore_stock({self.product.id: -2, other.id: -4})
+
+        # Then
+        for product in (self.product, other):
+            await self.db.refresh(product)
+        assert self.product.available == 1
+        assert other.available == 0
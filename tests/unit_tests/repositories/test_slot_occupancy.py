@@ -0,0 +1,100 @@
+from asyncio import gather
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import engine
+from app.models.addresses import Address
+from app.models.services import Service, SlotOccupancy
+from app.models.util import Id
+from app.repositories.services import SlotOccupancyRepository
+from tests.factories.service_factories import ServiceCreateFactory
+from tests.tests_setup import BaseDbTestCase
+
+
+class TestSlotOccupancyRepository(BaseDbTestCase):
+    # No need to mock the db - it's an in-memory sqlite db
+
+    @pytest.fixture(autouse=True)
+    async def setup(self, setup_db: None) -> None:
+        services = [self.get_service() for _ in range(2)]
+        self.service_ids = [s.id for s in services]
+        self.db.add_all(services)
+        await self.db.commit()
+        self.slot_start = datetime(2024, 4, 1, 8, tzinfo=timezone.utc)
+        self.slot_end = self.slot_start + timedelta(minutes=30)
+        self.repository = SlotOccupancyRepository(self.db)
+
+    def get_service(self) -> Service:
+        service_create = ServiceCreateFactory.build()
+        return Service(
+            owner_id=uuid4(),
+            address=Address(latitude=0, longitude=0, **service_create.address.model_dump()),
+            **service_create.model_dump(exclude={"address", "appointment_slots"}),
+        )
+
+    async def book(self, service_id: Id, max_amount: int) -> bool:
+        # Each booking uses its own session, like concurrent requests do
+        async with AsyncSession(bind=engine) as session:
+            booked = await SlotOccupancyRepository(session).try_increment(
+                service_id, self.slot_start, self.slot_end, max_amount
+            )
+            await session.commit()
+            return booked
+
+    async def test_try_increment_creates_the_slot_row(self) -> None:
+        # When
+        booked = await self.repository.try_increment(
+            self.service_ids[0], self.slot_start, self.slot_end, 1
+        )
+
+        # Then
+        assert booked
+        occupancy = await self.repository.get_by_id((self.service_ids[0], self.slot_start))
+        assert occupancy is not None
+        assert occupancy.slot_end == self.slot_end
+        assert occupancy.amount == 1
+
+    async def test_try_increment_full_slot(self) -> None:
+        # Given
+        self.db.add(
+            SlotOccupancy(
+                service_id=self.service_ids[0],
+                slot_start=self.slot_start,
+                slot_end=self.slot_end,
+                amount=2,
+            )
+        )
+        await self.db.flush()
+
+        # When
+        booked = await self.repository.try_increment(
+            self.service_ids[0], self.slot_start, self.slot_end, 2
+        )
+
+        # Then
+        assert not booked
+
+    async def test_concurrent_bookings_dont_overbook(self) -> None:
+        # Given
+        max_amount = 12
+
+        # When
+        booked = await gather(
+            *(
+                self.book(service_id, max_amount)
+                for _ in range(50)
+                for service_id in self.service_ids
+            )
+        )
+
+        # Then
+        # Each service has its own counter
+        assert sum(booked) == max_amount * len(self.service_ids)
+        for service_id in self.service_ids:
+            occupancy = await self.repository.get_all_by_range(
+                self.slot_start, self.slot_end, service_id=service_id
+            )
+            assert [o.amount for o in occupancy] == [max_amount]
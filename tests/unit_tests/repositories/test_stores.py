@@ -1,12 +1,14 @@
 # mypy: disable-error-code="method-assign"
+from datetime import datetime, timezone
 from uuid import uuid4
 from unittest.mock import AsyncMock, Mock
 
-from sqlalchemy import ScalarResult
+from sqlalchemy import Dialect, ScalarResult, make_url
+from sqlalchemy.dialects import postgresql, sqlite
 
 from app.models.addresses import Address
 from app.models.stores import Store
-from app.repositories.stores import StoresRepository
+from app.repositories.stores import ProductsRepository, StoresRepository
 from tests.factories.store_factories import StoreCreateFactory
 
 
@@ -16,7 +18,7 @@ class TestStoresRepository:
         self.store = Store(
             owner_id=uuid4(),
             address=Address(latitude=0, longitude=0, **self.store_create.address.model_dump()),
-            **self.store_create.model_dump(exclude={"address"})
+            **self.store_create.model_dump(exclude={"address"}),
         )
         self.async_session = AsyncMock()
         self.stores_repository = StoresRepository(self.async_session)
@@ -25,7 +27,7 @@ class TestStoresRepository:
         # Given
         name = self.store_create.name
         result: ScalarResult[Store] = AsyncMock()
-        result.all = Mock(return_value=[self.store])
+        result.first = Mock(return_value=self.store)
         self.async_session.exec = AsyncMock(return_value=result)
 
         # When
@@ -33,12 +35,15 @@ class TestStoresRepository:
 
         # Then
         assert fetched_record == self.store
+        sql = self.executed_sql(sqlite.dialect())
+        assert "stores.name = " in sql
+        assert "LIKE" not in sql
 
     async def test_get_by_name_should_return_none_if_store_does_not_exist(self) -> None:
         # Given
         name = self.store_create.name
         result: ScalarResult[Store] = AsyncMock()
-        result.all = Mock(return_value=[])
+        result.first = Mock(return_value=None)
         self.async_session.exec = AsyncMock(return_value=result)
 
         # When
@@ -94,3 +99,123 @@ class TestStoresRepository:
 
         # Then
         assert count == 0
+
+    def set_dialect(self, name: str, url: str) -> None:
+        dialect = Mock()
+        dialect.name = name
+        self.async_session.get_bind = Mock(
+            return_value=Mock(dialect=dialect, engine=Mock(url=make_url(url)))
+        )
+
+    async def test_get_ids_updated_since(self) -> None:
+        # Given
+        store_id = uuid4()
+        self.async_session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=[store_id])))
+
+        # When
+        ids = await self.stores_repository.get_ids_updated_since(
+            datetime(2024, 5, 1, tzinfo=timezone.utc)
+        )
+
+        # Then
+        assert ids == [store_id]
+        sql = self.executed_sql(sqlite.dialect())
+        assert "SELECT stores.id" in sql
+        assert "WHERE stores.updated_at > " in sql
+
+    def executed_sql(self, dialect: Dialect) -> str:
+        query = self.async_session.exec.call_args.args[0]
+        return str(query.compile(dialect=dialect))
+
+    async def test_get_nearby_uses_locations_on_postgis(self) -> None:
+        # Given
+        self.set_dialect("postgresql", f"postgresql://localhost/{uuid4()}")
+        self.async_session.exec = AsyncMock(
+            side_effect=[Mock(one=Mock(return_value=1)), Mock(all=Mock(return_value=[]))]
+        )
+
+        # When
+        await self.stores_repository.get_nearby(-34.6, -58.4)
+
+        # Then
+        sql = self.executed_sql(postgresql.dialect())
+        assert "ST_DWithin(addresses.location" in sql
+        assert "ST_Distance(addresses.location" in sql
+        assert "pow(" not in sql
+
+    async def test_get_nearby_without_postgis_checks_locations_once(self) -> None:
+        # Given
+        self.set_dialect("postgresql", f"postgresql://localhost/{uuid4()}")
+        self.async_session.exec = AsyncMock(
+            side_effect=[
+                Mock(one=Mock(return_value=0)),
+                Mock(all=Mock(return_value=[])),
+                Mock(all=Mock(return_value=[])),
+            ]
+        )
+
+        # When
+        await self.stores_repository.get_nearby(-34.6, -58.4)
+        await self.stores_repository.get_nearby(-34.6, -58.4)
+
+        # Then
+        sql = self.executed_sql(postgresql.dialect())
+        assert "ST_DWithin" not in sql
+        assert "addresses.geohash >=" in sql
+        assert self.async_session.exec.call_count == 3
+
+    async def test_get_nearby_on_sqlite_does_not_check_locations(self) -> None:
+        # Given
+        self.set_dialect("sqlite", "sqlite://")
+        self.async_session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=[])))
+
+        # When
+        await self.stores_repository.get_nearby(-34.6, -58.4)
+
+        # Then
+        assert "ST_DWithin" not in self.executed_sql(sqlite.dialect())
+        self.async_session.exec.assert_called_once()
+
+    async def test_get_nearby_products_filters_by_the_stores_in_range(self) -> None:
+        # Given
+        self.set_dialect("sqlite", "sqlite://")
+        self.async_session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=[])))
+
+        # When
+        await ProductsRepository(self.async_session).get_nearby(-34.6, -58.4, None)
+
+        # Then
+        sql = self.executed_sql(sqlite.dialect())
+        start = sql.rindex("WHERE products.store_id IN")
+        where = sql[start:]
+        assert "EXISTS" not in where
+        assert "JOIN stores ON stores.id = store_address_link.store_id" in where
+
+    async def test_get_all_ranks_names_by_trigram_distance_with_pg_trgm(self) -> None:
+        # Given
+        self.set_dialect("postgresql", f"postgresql://localhost/{uuid4()}")
+        self.async_session.exec = AsyncMock(
+            side_effect=[Mock(one=Mock(return_value=1)), Mock(all=Mock(return_value=[]))]
+        )
+
+        # When
+        await self.stores_repository.get_all(name="pet")
+
+        # Then
+        sql = self.executed_sql(postgresql.dialect())
+        assert "stores.name ILIKE" in sql
+        assert "ORDER BY (stores.name <-> " in sql
+
+    async def test_get_all_ranks_names_by_exact_and_prefix_matches_on_sqlite(self) -> None:
+        # Given
+        self.set_dialect("sqlite", "sqlite://")
+        self.async_session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=[])))
+
+        # When
+        await self.stores_repository.get_all(name="pet")
+
+        # Then
+        sql = self.executed_sql(sqlite.dialect())
+        assert "<->" not in sql
+        assert "ORDER BY CASE WHEN (lower(stores.name) = " in sql
+        self.async_session.exec.assert_called_once()
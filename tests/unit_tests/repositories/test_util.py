@@ -0,0 +1,316 @@
+from uuid import uuid4
+
+import pytest
+from sqlmodel import select
+
+from app.exceptions.repository import InvalidCursor
+from app.models.addresses import Address
+from app.models.geohash import encode
+from app.models.stores import Store
+from app.models.util import CAPPED_COUNT, Coordinates, CountMode, SortOrder
+from app.repositories.stores import StoresRepository
+from app.repositories.util import store_distance_filter
+from app.services.spatial_index import SpatialIndex
+from tests.factories.store_factories import StoreCreateFactory
+from tests.tests_setup import BaseDbTestCase
+
+
+class TestDistanceFilter(BaseDbTestCase):
+    @pytest.fixture(autouse=True)
+    def setup(self, setup_db: None) -> None:
+        self.repository = StoresRepository(self.db)
+        self.center = Coordinates(latitude=-34.6, longitude=-58.4)
+
+    def get_store(self, name: str, north_km: float, east_km: float, range_km: float) -> Store:
+        store_create = StoreCreateFactory.build(name=name, delivery_range_km=range_km)
+        km_per_deg_long = self.center.KM_PER_DEG_LAT * 0.823  # cos(-34.6°)
+        return Store(
+            owner_id=uuid4(),
+            address=Address(
+                latitude=self.center.latitude + north_km / self.center.KM_PER_DEG_LAT,
+                longitude=self.center.longitude + east_km / km_per_deg_long,
+                **store_create.address.model_dump(),
+            ),
+            **store_create.model_dump(exclude={"address"}),
+        )
+
+    async def test_get_nearby_only_returns_stores_in_range(self) -> None:
+        # Given
+        self.db.add_all(
+            [
+                self.get_store("center", 0, 0, 1),
+                self.get_store("north", 5, 0, 10),
+                self.get_store("inside corner", 7, -7, 10),
+                # Inside the bounding box but out of range
+                self.get_store("outside corner", 8, 8, 10),
+                self.get_store("out of own range", 0, 5, 2),
+                self.get_store("far", -30, 0, 20),
+            ]
+        )
+        await self.db.flush()
+
+        # When
+        stores = await self.repository.get_nearby(self.center.latitude, self.center.longitude)
+        count = await self.repository.count_nearby(self.center.latitude, self.center.longitude)
+
+        # Then
+        assert {s.name for s, _ in stores} == {"center", "north", "inside corner"}
+        assert count == 3
+
+    async def test_get_nearby_sorted_by_distance_with_cursor(self) -> None:
+        # Given
+        same_place = [self.get_store("near 1", 3, 0, 10), self.get_store("near 2", 3, 0, 10)]
+        self.db.add_all(
+            [self.get_store("far", 0, 6, 10), *same_place, self.get_store("center", 0, 0, 10)]
+        )
+        await self.db.flush()
+        first_near, second_near = sorted(same_place, key=lambda s: s.id)
+
+        # When
+        first_page = await self.repository.get_nearby(
+            self.center.latitude, self.center.longitude, limit=2
+        )
+        last_store, last_distance = first_page[-1]
+        second_page = await self.repository.get_nearby(
+            self.center.latitude,
+            self.center.longitude,
+            cursor=(last_distance, last_store.id),
+            limit=2,
+        )
+
+        # Then
+        assert [(s.name, round(d)) for s, d in first_page] == [("center", 0), (first_near.name, 3)]
+        assert [(s.name, round(d)) for s, d in second_page] == [(second_near.name, 3), ("far", 6)]
+
+    async def test_saved_addresses_geohash_is_kept_in_sync(self) -> None:
+        # Given
+        store = self.get_store("store", 0, 0, 1)
+        self.db.add(store)
+        await self.db.flush()
+        assert store.address.geohash == encode(self.center.latitude, self.center.longitude)
+
+        # When
+        store.address.latitude = 10
+        self.db.add(store)
+        await self.db.flush()
+
+        # Then
+        assert store.address.geohash == encode(10, self.center.longitude)
+
+    async def test_get_nearby_with_large_range(self) -> None:
+        # Given
+        far, too_far = self.get_store("far", 150, 150, 1), self.get_store("too far", 300, 0, 1)
+        # Bigger than MAX_DELIVERY_RANGE, to use bigger cells
+        max_range = 250
+        far.delivery_range_km = too_far.delivery_range_km = max_range
+        self.db.add_all([self.get_store("center", 0, 0, 1), far, too_far])
+        await self.db.flush()
+
+        # When
+        stores = await self.db.exec(
+            select(Store).where(
+                store_distance_filter(self.center.latitude, self.center.longitude, max_range)
+            )
+        )
+
+        # Then
+        assert {s.name for s in stores.all()} == {"center", "far"}
+
+    async def test_get_nearby_agrees_with_checkout_and_spatial_index(self) -> None:
+        # Given
+        inside, outside = self.get_store("inside", 10, 10, 1), self.get_store("outside", 10, 10, 1)
+        distance = self.center.distance_to(inside.address)
+        inside.delivery_range_km = distance * (1 + 1e-9)
+        outside.delivery_range_km = distance * (1 - 1e-9)
+        self.db.add_all([inside, outside])
+        await self.db.flush()
+        index = SpatialIndex()
+        index.load(
+            (s.id, s.address.latitude, s.address.longitude, s.delivery_range_km)
+            for s in (inside, outside)
+        )
+
+        # When
+        stores = await self.repository.get_nearby(self.center.latitude, self.center.longitude)
+
+        # Then
+        assert [s.name for s, _ in stores] == ["inside"]
+        assert stores[0][1] == pytest.approx(distance)
+        assert self.center.within(inside.address, inside.delivery_range_km)
+        assert not self.center.within(outside.address, outside.delivery_range_km)
+        candidates = index.candidates(self.center.latitude, self.center.longitude)
+        assert candidates is not None and inside.id in candidates
+
+    async def test_get_nearby_with_candidates_only_checks_them(self) -> None:
+        # Given
+        center, near = self.get_store("center", 0, 0, 10), self.get_store("near", 1, 0, 10)
+        out_of_range = self.get_store("out of range", 0, 5, 2)
+        self.db.add_all([center, near, out_of_range])
+        await self.db.flush()
+        candidate_ids = [near.id, out_of_range.id]
+
+        # When
+        stores = await self.repository.get_nearby(
+            self.center.latitude, self.center.longitude, candidate_ids=candidate_ids
+        )
+        count = await self.repository.count_nearby(
+            self.center.latitude, self.center.longitude, candidate_ids=candidate_ids
+        )
+
+        # Then
+        assert [s.name for s, _ in stores] == ["near"]
+        assert count == 1
+
+    async def test_get_locations(self) -> None:
+        # Given
+        store = self.get_store("store", 1, 1, 5)
+        self.db.add(store)
+        await self.db.flush()
+
+        # When
+        locations = await self.repository.get_locations()
+
+        # Then
+        assert [tuple(location) for location in locations] == [
+            (store.id, store.address.latitude, store.address.longitude, 5)
+        ]
+
+    async def test_get_nearby_page_counts_every_nearby_store(self) -> None:
+        # Given
+        self.db.add_all(
+            [
+                self.get_store("center", 0, 0, 10),
+                self.get_store("near", 3, 0, 10),
+                self.get_store("far", 0, 6, 10),
+                self.get_store("out of range", 0, 5, 2),
+            ]
+        )
+        await self.db.flush()
+
+        # When
+        first_page, first_total = await self.repository.get_nearby_page(
+            self.center.latitude, self.center.longitude, limit=2
+        )
+        last_store, last_distance = first_page[-1]
+        second_page, second_total = await self.repository.get_nearby_page(
+            self.center.latitude,
+            self.center.longitude,
+            cursor=(last_distance, last_store.id),
+            limit=2,
+        )
+        past_end, past_end_total = await self.repository.get_nearby_page(
+            self.center.latitude, self.center.longitude, skip=5
+        )
+
+        # Then
+        assert [s.name for s, _ in first_page] == ["center", "near"]
+        assert [s.name for s, _ in second_page] == ["far"]
+        assert first_total == second_total == past_end_total == 3
+        assert not past_end
+
+    async def test_get_page_returns_page_and_total(self) -> None:
+        # Given
+        self.db.add_all([self.get_store(f"store {i}", i, 0, 10) for i in range(3)])
+        await self.db.flush()
+
+        # When
+        page = await self.repository.get_page(1, 1, sort_by="name")
+        past_end = await self.repository.get_page(5, 1)
+        filtered = await self.repository.get_page(0, 5, name="store 2")
+
+        # Then
+        assert [s.name for s in page.records] == ["store 1"]
+        assert page.total == past_end.total == 3
+        assert not past_end.records
+        assert [s.name for s in filtered.records] == ["store 2"]
+        assert filtered.total == 1
+
+    async def test_get_page_with_cursor_continues_after_ties(self) -> None:
+        # Given
+        ranges = [10, 5, 10, 5, 10]
+        self.db.add_all([self.get_store(f"store {i}", i, 0, r) for i, r in enumerate(ranges)])
+        await self.db.flush()
+        expected = await self.repository.get_all(
+            sort_by="delivery_range_km", sort_order=SortOrder.DESCENDING
+        )
+
+        # When
+        names: list[str] = []
+        cursor = None
+        for _ in range(3):
+            page = await self.repository.get_page(
+                0,
+                2,
+                "delivery_range_km",
+                SortOrder.DESCENDING,
+                cursor=cursor,
+                count=CountMode.NONE,
+            )
+            names.extend(s.name for s in page.records)
+            cursor = page.next_cursor
+
+        # Then
+        assert names == [s.name for s in expected]
+        assert [s.delivery_range_km for s in expected] == sorted(ranges, reverse=True)
+        assert cursor is None
+
+    async def test_get_page_with_invalid_cursor(self) -> None:
+        # When, Then
+        with pytest.raises(InvalidCursor):
+            await self.repository.get_page(cursor=[str(uuid4()), "extra"])
+        with pytest.raises(InvalidCursor):
+            await self.repository.get_page(cursor=["not an id"])
+
+    async def test_get_nearby_page_with_capped_count(self) -> None:
+        # Given
+        self.db.add_all([self.get_store(f"store {i}", 0, 0, 10) for i in range(CAPPED_COUNT + 5)])
+        self.db.add(self.get_store("out of range", 0, 5, 2))
+        await self.db.flush()
+
+        # When
+        page, capped = await self.repository.get_nearby_page(
+            self.center.latitude, self.center.longitude, limit=2, count=CountMode.CAPPED
+        )
+        _, all_in_page = await self.repository.get_nearby_page(
+            self.center.latitude, self.center.longitude, count=CountMode.CAPPED
+        )
+        _, not_counted = await self.repository.get_nearby_page(
+            self.center.latitude, self.center.longitude, limit=2, count=CountMode.NONE
+        )
+
+        # Then
+        assert len(page) == 2
+        assert capped == CAPPED_COUNT + 1
+        assert all_in_page == CAPPED_COUNT + 5
+        assert not_counted is None
+
+    async def test_count_with_mode(self) -> None:
+        # Given
+        self.db.add_all([self.get_store(f"store {i}", i, 0, 10) for i in range(CAPPED_COUNT + 5)])
+        await self.db.flush()
+
+        # When
+        exact = await self.repository.count_with_mode(CountMode.EXACT)
+        capped = await self.repository.count_with_mode(CountMode.CAPPED)
+        capped_filtered = await self.repository.count_with_mode(
+            CountMode.CAPPED, name=f"store {CAPPED_COUNT + 4}"
+        )
+        not_counted = await self.repository.count_with_mode(CountMode.NONE)
+
+        # Then
+        assert exact == CAPPED_COUNT + 5
+        assert capped == CAPPED_COUNT + 1
+        assert capped_filtered == 1
+        assert not_counted is None
+
+    async def test_get_all_ranks_name_searches(self) -> None:
+        # Given
+        names = ["my pet", "Pet shop", "PET", "other"]
+        self.db.add_all([self.get_store(name, 0, 0, 10) for name in names])
+        await self.db.flush()
+
+        # When
+        stores = await self.repository.get_all(name="pet")
+
+        # Then
+        assert [s.name for s in stores] == ["PET", "Pet shop", "my pet"]
@@ -1,11 +1,12 @@
 from decimal import Decimal
-from typing import Any
+from typing import Any, Awaitable, Callable
 from uuid import uuid4
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, call
 from datetime import datetime, time, timedelta, date
 from zoneinfo import ZoneInfo
 
 import pytest
+from pydantic import TypeAdapter
 
 from app.config import settings
 from app.exceptions.animals import InvalidAnimal
@@ -21,12 +22,20 @@ from app.models.services import (
     AvailableAppointmentsForSlots as AAFS,
     Appointment,
     AppointmentCreate,
+    AvailableAppointmentsList,
+    AvailableAppointmentsCount,
+    AvailabilitySummary,
     ServiceRead,
+    SlotOccupancy,
 )
 from app.models.addresses import Address
-from app.repositories.services import AppointmentsRepository
+from app.models.util import CountMode
+from app.repositories.base_repository import Page
+from app.repositories.services import AppointmentsRepository, SlotOccupancyRepository
 from app.services.animals import AnimalsService
 from app.services.services import AppointmentsService, ServicesService
+from app.services.services.availability import compute_slot_occupancy
+from app.services.services.availability_cache import AvailabilityCache, MemoryCacheBackend
 from app.services.users import Notification, UsersService
 from app.services.payments import PaymentsService
 from tests.factories.service_factories import ServiceCreateFactory
@@ -55,19 +64,27 @@ class TestServicesService:
         self.users_service = AsyncMock(spec=UsersService)
         self.payments_service = AsyncMock(spec=PaymentsService)
         self.animals_service = AsyncMock(spec=AnimalsService)
+        self.occupancy_repo = AsyncMock(spec=SlotOccupancyRepository)
+        self.availability_cache = AvailabilityCache(MemoryCacheBackend(max_size=16, ttl=60))
+        self.after_commit: list[Callable[[], Awaitable[None]]] = []
+        self.occupancy_repo.after_commit.side_effect = self.after_commit.append
+        self.repository.after_commit.side_effect = self.after_commit.append
+        self.occupancy_repo.get_by_id.return_value = None
         self.service = AppointmentsService(
             self.repository,
             self.services_service,
             self.users_service,
             self.payments_service,
             self.animals_service,
+            self.occupancy_repo,
+            self.availability_cache,
         )
 
     async def test_get_available_appointments_simple(self) -> None:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -101,7 +118,7 @@ class TestServicesService:
         # Given
         now = self.get_now(time(8, 15))  # It's 8:15AM
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -130,7 +147,7 @@ class TestServicesService:
         # Given
         now = self.get_now(time(8, 40))  # It's 8:40AM
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -159,12 +176,12 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = [
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
             self.get_appt(
                 datetime.combine(now.date(), time(8, 0), now.tzinfo),
                 datetime.combine(now.date(), time(8, 30), now.tzinfo),
             )
-        ]
+        )
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -198,12 +215,12 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now, max_per_slot=1)  # Only 1 appointment per slot
-        self.repository.get_all_by_range.return_value = [
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
             self.get_appt(
                 datetime.combine(now.date(), time(8, 0), now.tzinfo),
                 datetime.combine(now.date(), time(8, 30), now.tzinfo),
             )
-        ]
+        )
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -232,7 +249,7 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = [
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
             # this appointment overlaps with both slots,
             # which can happen if the service provider changes the
             # slots configuration after the appointment was made
@@ -240,7 +257,7 @@ class TestServicesService:
                 start=datetime.combine(now.date(), time(8, 0), now.tzinfo),
                 end=datetime.combine(now.date(), time(8, 45), now.tzinfo),
             )
-        ]
+        )
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -270,6 +287,39 @@ class TestServicesService:
             )
         ]
 
+    async def test_get_available_appointments_identical_appointments_are_counted(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now)
+        start = datetime.combine(now.date(), time(8, 0), now.tzinfo)
+        end = datetime.combine(now.date(), time(8, 30), now.tzinfo)
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
+            self.get_appt(start, end),
+            self.get_appt(start, end),
+        )
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When
+        available_appointments = await self.service.get_available_appointments(
+            self.service_model.id, now=now
+        )
+
+        # Then
+        self.assert_repo_get_all_by_range(now)
+        assert available_appointments == [
+            AAFS(
+                slots_configuration=self.service_model.appointment_slots[0],
+                available_appointments=[
+                    AA(start=start, end=end, amount=1),
+                    AA(
+                        start=datetime.combine(now.date(), time(8, 30), now.tzinfo),
+                        end=datetime.combine(now.date(), time(9, 0), now.tzinfo),
+                        amount=3,
+                    ),
+                ],
+            )
+        ]
+
     async def test_get_available_appointments_should_get_next_week(self) -> None:
         # Given
         now = self.get_now()
@@ -287,7 +337,7 @@ class TestServicesService:
                 max_appointments_per_slot=3,
             )
         ]
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -323,12 +373,12 @@ class TestServicesService:
         now = self.get_now()
         # I can make appointments for the next week:
         self.set_slots(now, advance=7, end=time(8, 30))
-        self.repository.get_all_by_range.return_value = [
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
             self.get_appt(
                 datetime.combine(now.date(), time(8, 0), now.tzinfo),
                 datetime.combine(now.date(), time(8, 30), now.tzinfo),
             )
-        ]
+        )
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -392,7 +442,7 @@ class TestServicesService:
                 max_appointments_per_slot=2,
             ),
         ]
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -482,12 +532,12 @@ class TestServicesService:
             ),
         ]
         tomorrow_date = now.date() + timedelta(days=1)
-        self.repository.get_all_by_range.return_value = [
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
             self.get_appt(
                 datetime.combine(now.date(), time(13, 30), now.tzinfo),
                 datetime.combine(tomorrow_date, time(14, 00), now.tzinfo),
             ),
-        ]
+        )
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -536,7 +586,7 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -565,7 +615,7 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -594,7 +644,7 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -628,12 +678,12 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = [
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
             self.get_appt(
                 start=datetime.combine(now.date(), time(7, 0), now.tzinfo),
                 end=datetime.combine(now.date(), time(8, 45), now.tzinfo),
             )
-        ]
+        )
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -675,7 +725,7 @@ class TestServicesService:
                 max_appointments_per_slot=3,
             ),
         ]
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.get_all_by_range.return_value = []
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When
@@ -706,11 +756,250 @@ class TestServicesService:
             )
         ]
 
+    async def test_stream_available_appointments(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, advance=7, end=time(8, 30))
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
+            self.get_appt(
+                datetime.combine(now.date(), time(8, 0), now.tzinfo),
+                datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            )
+        )
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When
+        available_appointments = await self.service.stream_available_appointments(
+            self.service_model.id, now=now
+        )
+
+        # Then
+        self.assert_repo_get_all_by_range(now, 7)
+        next_week = now.date() + timedelta(weeks=1)
+        # Every occurrence of the slots configuration is streamed as soon as it is computed
+        assert list(available_appointments) == [
+            AAFS(
+                slots_configuration=self.service_model.appointment_slots[0],
+                available_appointments=[
+                    AA(
+                        start=datetime.combine(now.date(), time(8, 0), now.tzinfo),
+                        end=datetime.combine(now.date(), time(8, 30), now.tzinfo),
+                        amount=2,
+                    ),
+                ],
+            ),
+            AAFS(
+                slots_configuration=self.service_model.appointment_slots[0],
+                available_appointments=[
+                    AA(
+                        start=datetime.combine(next_week, time(8, 0), now.tzinfo),
+                        end=datetime.combine(next_week, time(8, 30), now.tzinfo),
+                        amount=3,
+                    ),
+                ],
+            ),
+        ]
+
+    async def test_get_available_appointments_is_cached(self) -> None:
+        # Given
+        self.set_slots(self.get_now(), advance=7)
+        self.occupancy_repo.get_all_by_range.return_value = []
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When
+        first = await self.service.get_available_appointments(self.service_model.id)
+        second = await self.service.get_available_appointments(self.service_model.id)
+        other_range = await self.service.get_available_appointments(
+            self.service_model.id, include_partial=False
+        )
+
+        # Then
+        # Cached results are equal to the computed ones once serialized
+        adapter = TypeAdapter(list[AAFS])
+        assert adapter.dump_python(second, mode="json") == adapter.dump_python(first, mode="json")
+        assert other_range == first
+        assert self.services_service.get_service_by_id.call_count == 2
+        assert self.occupancy_repo.get_all_by_range.call_count == 2
+        assert self.availability_cache.metrics.hits == 1
+        assert self.availability_cache.metrics.misses == 2
+
+    async def test_get_available_appointments_with_now_is_not_cached(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now)
+        self.occupancy_repo.get_all_by_range.return_value = []
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When
+        await self.service.get_available_appointments(self.service_model.id, now=now)
+        await self.service.get_available_appointments(self.service_model.id, now=now)
+
+        # Then
+        assert self.occupancy_repo.get_all_by_range.call_count == 2
+        assert self.availability_cache.metrics.hits == 0
+
+    async def test_get_available_appointments_summary_per_day(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, advance=7, start=time(8, 0), end=time(10, 0))
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
+            self.get_appt(
+                datetime.combine(now.date(), time(8, 0), now.tzinfo),
+                datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            )
+        )
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When
+        summary = await self.service.get_available_appointments_summary(
+            self.service_model.id, AvailabilitySummary.DAY, now=now
+        )
+
+        # Then
+        self.assert_repo_get_all_by_range(now, 7)
+        next_week = now.date() + timedelta(weeks=1)
+        assert summary == [
+            AvailableAppointmentsCount(
+                start=datetime.combine(now.date(), time.min, now.tzinfo), amount=11
+            ),
+            AvailableAppointmentsCount(
+                start=datetime.combine(next_week, time.min, now.tzinfo), amount=12
+            ),
+        ]
+
+    async def test_get_available_appointments_summary_per_hour(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, start=time(8, 0), end=time(10, 0), max_per_slot=1)
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
+            self.get_appt(
+                datetime.combine(now.date(), time(8, 0), now.tzinfo),
+                datetime.combine(now.date(), time(9, 0), now.tzinfo),
+            )
+        )
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When
+        summary = await self.service.get_available_appointments_summary(
+            self.service_model.id, AvailabilitySummary.HOUR, now=now
+        )
+
+        # Then
+        self.assert_repo_get_all_by_range(now)
+        assert summary == [
+            AvailableAppointmentsCount(
+                start=datetime.combine(now.date(), time(9, 0), now.tzinfo), amount=2
+            ),
+        ]
+
+    async def test_get_services_available_appointments(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now)
+        other_service = self.service_model.model_copy(update={"id": uuid4()})
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
+            self.get_appt(
+                datetime.combine(now.date(), time(8, 0), now.tzinfo),
+                datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            )
+        )
+        self.services_service.get_services.return_value = [self.service_model, other_service]
+
+        # When
+        available = await self.service.get_services_available_appointments(
+            [other_service.id, uuid4(), self.service_model.id], now=now
+        )
+
+        # Then
+        self.services_service.get_service_by_id.assert_not_called()
+        self.services_service.get_services.assert_called_once()
+        self.occupancy_repo.get_all_by_range.assert_called_once_with(
+            CustomMatcher[datetime](lambda t: t - now < timedelta(seconds=2)),
+            datetime.combine(now.date(), time(0, 0), now.tzinfo) + timedelta(days=1),
+            service_id=[self.service_model.id, other_service.id],
+        )
+        assert [a.service_id for a in available] == [other_service.id, self.service_model.id]
+        # The existing appointment only belongs to self.service_model
+        other_available, service_available = (
+            AvailableAppointmentsList(a.available_appointments) for a in available
+        )
+        assert [a.amount for _, a in other_available.iterate_appointments()] == [3, 3]
+        assert [a.amount for _, a in service_available.iterate_appointments()] == [2, 3]
+
+    async def test_get_next_available_appointment_skips_full_slots(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, max_per_slot=1)
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
+            self.get_appt(
+                datetime.combine(now.date(), time(8, 0), now.tzinfo),
+                datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            )
+        )
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When
+        next_available = await self.service.get_next_available_appointment(
+            self.service_model.id, now=now
+        )
+
+        # Then
+        self.assert_repo_get_all_by_range(now)
+        assert next_available == AA(
+            start=datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            end=datetime.combine(now.date(), time(9, 0), now.tzinfo),
+            amount=1,
+        )
+
+    async def test_get_next_available_appointment_all_full(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, max_per_slot=1)
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
+            self.get_appt(
+                datetime.combine(now.date(), time(8, 0), now.tzinfo),
+                datetime.combine(now.date(), time(9, 0), now.tzinfo),
+            )
+        )
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When
+        next_available = await self.service.get_next_available_appointment(
+            self.service_model.id, now=now
+        )
+
+        # Then
+        assert next_available is None
+
+    async def test_get_services_next_available_appointment(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, max_per_slot=1)
+        other_service = self.service_model.model_copy(update={"id": uuid4()})
+        self.occupancy_repo.get_all_by_range.return_value = self.get_occupancy(
+            self.get_appt(
+                datetime.combine(now.date(), time(8, 0), now.tzinfo),
+                datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            )
+        )
+
+        # When
+        next_available = await self.service.get_services_next_available_appointment(
+            [self.service_model, other_service], now=now
+        )
+
+        # Then
+        self.occupancy_repo.get_all_by_range.assert_called_once()
+        assert {service_id: a.start if a else None for service_id, a in next_available.items()} == {
+            self.service_model.id: datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            other_service.id: datetime.combine(now.date(), time(8, 0), now.tzinfo),
+        }
+
     async def test_create_appointment_unmet_payment_conditions_should_raise(self) -> None:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.try_increment.return_value = True
         self.services_service.get_service_by_id.return_value = self.service_model
         self.payments_service.check_payment_conditions.side_effect = ValueError
 
@@ -731,6 +1020,7 @@ class TestServicesService:
         self.payments_service.check_payment_conditions.assert_called_once_with(
             self.service_model, customer_id, address_id, "token"
         )
+        self.occupancy_repo.try_increment.assert_not_called()
         self.repository.save.assert_not_called()
         self.users_service.send_notification.assert_not_called()
 
@@ -738,7 +1028,7 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.try_increment.return_value = True
         self.services_service.get_service_by_id.return_value = self.service_model
 
         # When, Then
@@ -755,15 +1045,89 @@ class TestServicesService:
                 now=now,
             )
         self.services_service.get_service_by_id.assert_called_once_with(self.service_model.id)
-        self.assert_repo_get_all_by_range(now, after=start)
+        # Not aligned with the slots, so no place is reserved
+        self.occupancy_repo.try_increment.assert_not_called()
         self.repository.save.assert_not_called()
         self.users_service.send_notification.assert_not_called()
 
+    async def test_create_appointment_full_slot_should_raise(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, max_per_slot=2)
+        start = datetime.combine(now.date(), time(8, 30), now.tzinfo)
+        end = datetime.combine(now.date(), time(9, 0), now.tzinfo)
+        self.occupancy_repo.try_increment.return_value = False  # e.g. booked concurrently
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When, Then
+        with pytest.raises(InvalidAppointment):
+            await self.service.create_appointment(
+                AppointmentCreate(start=start, animal_id=uuid4()),
+                self.service_model.id,
+                uuid4(),
+                uuid4(),
+                "token",
+                now=now,
+            )
+        self.occupancy_repo.try_increment.assert_called_once_with(
+            self.service_model.id, start, end, 2
+        )
+        self.payments_service.create_preference.assert_not_called()
+        self.repository.save.assert_not_called()
+        assert not self.after_commit
+
+    async def test_create_appointment_full_slot_should_raise_before_payment(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, max_per_slot=2)
+        start = datetime.combine(now.date(), time(8, 30), now.tzinfo)
+        end = datetime.combine(now.date(), time(9, 0), now.tzinfo)
+        self.occupancy_repo.get_by_id.return_value = SlotOccupancy(
+            service_id=self.service_model.id, slot_start=start, slot_end=end, amount=2
+        )
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When, Then
+        with pytest.raises(InvalidAppointment):
+            await self.service.create_appointment(
+                AppointmentCreate(start=start, animal_id=uuid4()),
+                self.service_model.id,
+                uuid4(),
+                uuid4(),
+                "token",
+                now=now,
+            )
+        self.occupancy_repo.get_by_id.assert_called_once_with((self.service_model.id, start))
+        self.payments_service.create_preference.assert_not_called()
+        self.occupancy_repo.try_increment.assert_not_called()
+        self.repository.save.assert_not_called()
+
+    async def test_create_appointment_finished_slot_should_raise(self) -> None:
+        # Given
+        now = self.get_now(time(8, 45))
+        self.set_slots(now)
+        self.occupancy_repo.try_increment.return_value = True
+        self.services_service.get_service_by_id.return_value = self.service_model
+
+        # When, Then
+        with pytest.raises(InvalidAppointment):
+            await self.service.create_appointment(
+                AppointmentCreate(
+                    start=datetime.combine(now.date(), time(8, 0), now.tzinfo), animal_id=uuid4()
+                ),
+                self.service_model.id,
+                uuid4(),
+                uuid4(),
+                "token",
+                now=now,
+            )
+        self.repository.save.assert_not_called()
+
     async def test_create_appointment_invalid_animal_should_raise(self) -> None:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.try_increment.return_value = True
         self.services_service.get_service_by_id.return_value = self.service_model
         self.animals_service.validate_animal.side_effect = InvalidAnimal
 
@@ -792,7 +1156,7 @@ class TestServicesService:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.try_increment.return_value = True
         self.services_service.get_service_by_id.return_value = self.service_model
         image_url = "http://image.url"
         self.services_service.get_services_read.return_value = [
@@ -808,6 +1172,9 @@ class TestServicesService:
         token = "token"
         result_url = "result url"
         self.payments_service.create_preference.return_value = result_url
+        await self.availability_cache.set(
+            self.service_model.id, None, None, True, AvailableAppointmentsList()
+        )
 
         service_reference: str
         fee = (
@@ -866,7 +1233,13 @@ class TestServicesService:
             }
 
         self.services_service.get_service_by_id.assert_called_once_with(self.service_model.id)
-        self.assert_repo_get_all_by_range(now, after=start)
+        self.occupancy_repo.get_all_by_range.assert_not_called()
+        self.occupancy_repo.try_increment.assert_called_once_with(
+            self.service_model.id,
+            start,
+            datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            self.service_model.appointment_slots[0].max_appointments_per_slot,
+        )
         self.animals_service.validate_animal.assert_called_once_with(
             customer_id, animal_id, "token"
         )
@@ -884,15 +1257,21 @@ class TestServicesService:
         assert created_appointment.customer_id == customer_id
         assert created_appointment.payment_url == result_url
         assert created_appointment.id == service_reference
+        self.users_service.send_notification.assert_not_called()
+        assert (
+            await self.availability_cache.get(self.service_model.id, None, None, True) is not None
+        )
+        await self.commit()
         self.users_service.send_notification.assert_called_once_with(
             self.service_model.owner_id, CustomMatcher(check_notification)
         )
+        assert await self.availability_cache.get(self.service_model.id, None, None, True) is None
 
     async def test_create_appointment_payment_exception(self) -> None:
         # Given
         now = self.get_now()
         self.set_slots(now)
-        self.repository.get_all_by_range.return_value = []
+        self.occupancy_repo.try_increment.return_value = True
         self.services_service.get_service_by_id.return_value = self.service_model
         image_url = "http://image.url"
         self.services_service.get_services_read.return_value = [
@@ -917,6 +1296,8 @@ class TestServicesService:
                 now=now,
             )
 
+        # The reservation is rolled back with the request's transaction
+        self.occupancy_repo.try_increment.assert_called_once()
         self.repository.save.assert_not_called()
         self.users_service.send_notification.assert_not_called()
 
@@ -976,6 +1357,9 @@ class TestServicesService:
                 **self.service_model.model_dump()
             )
         ]
+        await self.availability_cache.set(
+            self.service_model.id, None, None, True, AvailableAppointmentsList()
+        )
 
         # When
         await self.service.update_appointment_status(
@@ -997,10 +1381,173 @@ class TestServicesService:
             appointment, PaymentStatus.CANCELLED
         )
         self.repository.save.assert_called_once_with(appointment)
+        self.occupancy_repo.decrement_overlapping.assert_called_once_with(
+            self.service_model.id, appointment.start, appointment.end
+        )
+        assert (
+            await self.availability_cache.get(self.service_model.id, None, None, True) is not None
+        )
+        await self.commit()
+        assert await self.availability_cache.get(self.service_model.id, None, None, True) is None
         self.users_service.send_notification.assert_called_once_with(
             self.service_model.owner_id, CustomMatcher(check_notification)
         )
 
+    async def test_update_appointment_not_cancelled_keeps_occupancy(self) -> None:
+        # Given
+        appointment = self.get_appt(payment_status=PaymentStatus.CREATED)
+        self.repository.get_by_id.return_value = appointment
+
+        def update_payment_status(model: Appointment, status: PaymentStatus) -> bool:
+            model.payment_status = status
+            return True
+
+        self.payments_service.update_payment_status.side_effect = update_payment_status
+        self.services_service.get_services_read.return_value = [
+            ServiceRead(
+                address=self.service_model.address,
+                appointment_slots=self.service_model.appointment_slots,
+                image_url="http://image.url",
+                **self.service_model.model_dump()
+            )
+        ]
+
+        # When
+        await self.service.update_appointment_status(
+            self.service_model.id, appointment.id, PaymentStatus.COMPLETED
+        )
+
+        # Then
+        self.repository.save.assert_called_once_with(appointment)
+        self.occupancy_repo.decrement_overlapping.assert_not_called()
+
+    async def test_update_expired_appointment_to_completed_takes_back_slot(self) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now, max_per_slot=2)
+        start = datetime.combine(now.date(), time(8, 30), now.tzinfo)
+        end = datetime.combine(now.date(), time(9, 0), now.tzinfo)
+        appointment = self.get_appt(start, end, payment_status=PaymentStatus.EXPIRED)
+        self.repository.get_by_id.return_value = appointment
+        self.occupancy_repo.try_increment.return_value = True
+
+        def update_payment_status(model: Appointment, status: PaymentStatus) -> bool:
+            model.payment_status = status
+            return True
+
+        self.payments_service.update_payment_status.side_effect = update_payment_status
+        self.services_service.get_services_read.return_value = [
+            ServiceRead(
+                address=self.service_model.address,
+                appointment_slots=self.service_model.appointment_slots,
+                image_url="http://image.url",
+                **self.service_model.model_dump()
+            )
+        ]
+        await self.availability_cache.set(
+            self.service_model.id, None, None, True, AvailableAppointmentsList()
+        )
+
+        # When
+        await self.service.update_appointment_status(
+            self.service_model.id, appointment.id, PaymentStatus.COMPLETED
+        )
+
+        # Then
+        assert appointment.payment_status == PaymentStatus.COMPLETED
+        self.occupancy_repo.try_increment.assert_called_once_with(
+            self.service_model.id, start, end, 2
+        )
+        self.occupancy_repo.decrement_overlapping.assert_not_called()
+        assert (
+            await self.availability_cache.get(self.service_model.id, None, None, True) is not None
+        )
+        await self.commit()
+        assert await self.availability_cache.get(self.service_model.id, None, None, True) is None
+        self.repository.save.assert_called_once_with(appointment)
+
+    @pytest.mark.parametrize("full", [True, False])
+    async def test_update_expired_appointment_to_completed_without_slot_should_raise(
+        self, full: bool
+    ) -> None:
+        # Given
+        now = self.get_now()
+        self.set_slots(now)
+        # Either the slot was booked while it was expired, or it no longer exists
+        start = datetime.combine(now.date(), time(8, 30 if full else 45), now.tzinfo)
+        appointment = self.get_appt(
+            start, start + timedelta(minutes=30), payment_status=PaymentStatus.EXPIRED
+        )
+        self.repository.get_by_id.return_value = appointment
+        self.occupancy_repo.try_increment.return_value = False
+
+        def update_payment_status(model: Appointment, status: PaymentStatus) -> bool:
+            model.payment_status = status
+            return True
+
+        self.payments_service.update_payment_status.side_effect = update_payment_status
+
+        # When, Then
+        with pytest.raises(InvalidAppointment):
+            await self.service.update_appointment_status(
+                self.service_model.id, appointment.id, PaymentStatus.COMPLETED
+            )
+        assert self.occupancy_repo.try_increment.called == full
+        self.repository.save.assert_not_called()
+        self.users_service.send_notification.assert_not_called()
+        assert not self.after_commit
+
+    async def test_expire_appointments_should_expire_and_free_slots(self) -> None:
+        # Given
+        created_before = self.get_now()
+        appointments = [self.get_appt(payment_status=PaymentStatus.CREATED) for _ in range(2)]
+        for appointment in appointments:
+            appointment.service_id = self.service_model.id
+        self.repository.get_expired.return_value = appointments
+
+        def expire_payment(model: Appointment) -> None:
+            model.payment_status = PaymentStatus.EXPIRED
+
+        self.payments_service.expire_payment.side_effect = expire_payment
+
+        # When
+        expired = await self.service.expire_appointments(created_before, 10)
+
+        # Then
+        assert expired == appointments
+        self.repository.get_expired.assert_called_once_with(created_before, 10)
+        assert all(a.payment_status == PaymentStatus.EXPIRED for a in appointments)
+        self.repository.save.assert_has_calls([call(a) for a in appointments])
+        self.occupancy_repo.decrement_overlapping.assert_has_calls(
+            [call(a.service_id, a.start, a.end) for a in appointments]
+        )
+        self.users_service.send_notification.assert_not_called()
+
+    async def test_notify_expired_appointments_invalidates_and_notifies(self) -> None:
+        # Given
+        appointments = [self.get_appt(payment_status=PaymentStatus.EXPIRED) for _ in range(2)]
+        for appointment in appointments:
+            appointment.service_id = self.service_model.id
+        self.services_service.get_services_read.return_value = [
+            ServiceRead(
+                address=self.service_model.address,
+                appointment_slots=self.service_model.appointment_slots,
+                image_url="http://image.url",
+                **self.service_model.model_dump()
+            )
+        ]
+        self.users_service.send_notification.side_effect = [Exception("unavailable"), None]
+        await self.availability_cache.set(
+            self.service_model.id, None, None, True, AvailableAppointmentsList()
+        )
+
+        # When
+        await self.service.notify_expired_appointments(appointments)
+
+        # Then
+        assert await self.availability_cache.get(self.service_model.id, None, None, True) is None
+        assert self.users_service.send_notification.call_count == 2
+
     async def test_get_appointment_by_service_owner_should_call_repository_get_by_id(self) -> None:
         # Given
         appointment = self.get_appt()
@@ -1065,45 +1612,55 @@ class TestServicesService:
         # Given
         appointment = self.get_appt()
         self.services_service.get_service_by_id.return_value = self.service_model
-        self.repository.get_all_by_range.return_value = [appointment]
-        self.repository.count_all.return_value = 1
+        self.repository.get_page_by_range.return_value = Page([appointment], 1)
 
         # When
-        appointments, total = await self.service.get_service_appointments(
+        page = await self.service.get_service_appointments(
             self.service_model.id, self.service_model.owner_id, 5, 0
         )
 
         # Then
-        assert total == 1
-        assert appointments[0] == appointment
+        assert page.total == 1
+        assert page.records[0] == appointment
         self.services_service.get_service_by_id.assert_called_once_with(self.service_model.id)
-        self.repository.get_all_by_range.assert_called_once_with(
-            None, None, True, 5, 0, service_id=self.service_model.id
+        self.repository.get_page_by_range.assert_called_once_with(
+            None,
+            None,
+            True,
+            5,
+            0,
+            cursor=None,
+            count=CountMode.EXACT,
+            service_id=self.service_model.id,
         )
-        self.repository.count_all.assert_called_once_with(service_id=self.service_model.id)
 
     async def test_get_all_services_appointments_services_owner_user_should_return(self) -> None:
         # Given
         appointment = self.get_appt()
         self.services_service.get_service_by_id.return_value = self.service_model
-        self.repository.get_all_by_range.return_value = [appointment]
-        self.repository.count_all.return_value = 1
+        self.repository.get_page_by_range.return_value = Page([appointment], 1)
         self.services_service.get_services.return_value = [self.service_model]
         # When
-        appointments, total = await self.service.get_services_appointments_by_owner(
-            self.service_model.owner_id, 5, 0
+        page = await self.service.get_services_appointments_by_owner(
+            self.service_model.owner_id, 5, 0, count=CountMode.NONE
         )
 
         # Then
-        assert total == 1
-        assert appointments[0] == appointment
+        assert page.total == 1
+        assert page.records[0] == appointment
         self.services_service.get_services.assert_called_once_with(
             owner_id=self.service_model.owner_id
         )
-        self.repository.get_all_by_range.assert_called_once_with(
-            None, None, True, 5, 0, service_id=[self.service_model.id]
+        self.repository.get_page_by_range.assert_called_once_with(
+            None,
+            None,
+            True,
+            5,
+            0,
+            cursor=None,
+            count=CountMode.NONE,
+            service_id=[self.service_model.id],
         )
-        self.repository.count_all.assert_called_once_with(service_id=[self.service_model.id])
 
     def assert_repo_get_all_by_range(
         self,
@@ -1122,16 +1679,17 @@ class TestServicesService:
             if after
             else CustomMatcher[datetime](lambda t: t - now < timedelta(seconds=2))  # ~now
         )
-        self.repository.get_all_by_range.assert_called_once_with(
-            after_matcher,
-            before,
-            return_partial=True,
-            service_id=self.service_model.id,
-            payment_status=CustomMatcher[list[PaymentStatus]](
-                lambda s: len(set(s)) == 3 and PaymentStatus.CANCELLED not in s
-            ),
+        self.occupancy_repo.get_all_by_range.assert_called_once_with(
+            after_matcher, before, service_id=self.service_model.id
         )
 
+    def get_occupancy(self, *appointments: Appointment) -> list[SlotOccupancy]:
+        return compute_slot_occupancy(self.service_model, ((a.start, a.end) for a in appointments))
+
+    async def commit(self) -> None:
+        for callback in self.after_commit:
+            await callback()
+
     def set_slots(
         self,
         now: datetime,
@@ -0,0 +1,328 @@
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from decimal import Decimal
+from random import Random
+from uuid import uuid4
+
+from app.models.services import AppointmentSlots, DayOfWeek, Service, ServiceCategory
+from app.services.services.availability import (
+    CompiledSlots,
+    OccupancySweep,
+    SlotTemplateCache,
+    WeeklySlotTemplate,
+    compute_slot_occupancy,
+    from_wall_seconds,
+    slots_layout,
+    wall_seconds,
+)
+
+
+def get_slots(
+    start_day: DayOfWeek = DayOfWeek.MONDAY,
+    start_time: time = time(8, 0),
+    end_day: DayOfWeek = DayOfWeek.MONDAY,
+    end_time: time = time(9, 0),
+    duration: timedelta = timedelta(minutes=30),
+) -> AppointmentSlots:
+    return AppointmentSlots(
+        start_day=start_day,
+        start_time=start_time,
+        end_day=end_day,
+        end_time=end_time,
+        appointment_duration=duration,
+        appointment_price=Decimal(50),
+        max_appointments_per_slot=1,
+    )
+
+
+class TestWeeklySlotTemplate:
+    def test_compile_slots_offsets(self) -> None:
+        # Given
+        slots = get_slots(end_time=time(9, 10))
+
+        # When
+        compiled = CompiledSlots.compile(slots)
+
+        # Then
+        assert compiled.configuration == slots
+        assert compiled.offsets == (
+            (timedelta(hours=8), timedelta(hours=8, minutes=30)),
+            (timedelta(hours=8, minutes=30), timedelta(hours=9)),
+        )
+
+    def test_compile_multi_day_slots_offsets(self) -> None:
+        # Given
+        slots = get_slots(
+            start_day=DayOfWeek.SUNDAY,
+            start_time=time(23, 0),
+            end_day=DayOfWeek.MONDAY,
+            end_time=time(3, 0),
+            duration=timedelta(hours=2),
+        )
+
+        # When
+        compiled = CompiledSlots.compile(slots)
+
+        # Then
+        assert compiled.offsets == (
+            (timedelta(hours=23), timedelta(days=1, hours=1)),
+            (timedelta(days=1, hours=1), timedelta(days=1, hours=3)),
+        )
+
+    def test_template_groups_by_weekday_sorted_by_start_time(self) -> None:
+        # Given
+        afternoon = get_slots(start_time=time(13, 0), end_time=time(14, 0))
+        morning = get_slots(start_time=time(8, 0), end_time=time(9, 0))
+        tuesday = get_slots(start_day=DayOfWeek.TUESDAY, end_day=DayOfWeek.TUESDAY)
+
+        # When
+        template = WeeklySlotTemplate([afternoon, tuesday, morning])
+
+        # Then
+        monday = DayOfWeek.MONDAY.to_weekday()
+        assert [c.configuration for c in template.for_weekday(monday)] == [morning, afternoon]
+        assert [c.configuration for c in template.for_weekday(monday + 1)] == [tuesday]
+        assert not template.for_weekday(monday + 2)
+
+    def test_template_shift(self) -> None:
+        # Given
+        template = WeeklySlotTemplate([get_slots()])
+        day_start = datetime(2024, 4, 1, tzinfo=timezone.utc)  # a monday
+
+        # When
+        shifted = list(template.shift(template.for_weekday(0)[0], day_start))
+
+        # Then
+        assert shifted == [
+            (day_start + timedelta(hours=8), day_start + timedelta(hours=8, minutes=30)),
+            (day_start + timedelta(hours=8, minutes=30), day_start + timedelta(hours=9)),
+        ]
+
+    def test_template_find(self) -> None:
+        # Given
+        morning = get_slots(end_time=time(10, 0))
+        night = get_slots(
+            start_day=DayOfWeek.SUNDAY,
+            start_time=time(23, 0),
+            end_day=DayOfWeek.MONDAY,
+            end_time=time(3, 0),
+            duration=timedelta(hours=2),
+        )
+        template = WeeklySlotTemplate([morning, night])
+        monday = datetime(2024, 4, 1, tzinfo=timezone.utc)
+
+        # When, Then
+        assert template.find(monday + timedelta(hours=9, minutes=30)) == (
+            morning,
+            monday + timedelta(hours=9, minutes=30),
+            monday + timedelta(hours=10),
+        )
+        # Started on sunday
+        assert template.find(monday + timedelta(hours=1)) == (
+            night,
+            monday + timedelta(hours=1),
+            monday + timedelta(hours=3),
+        )
+        assert template.find(monday + timedelta(hours=8, minutes=15)) is None  # misaligned
+        assert template.find(monday + timedelta(hours=10)) is None  # after the last one
+        assert template.find(monday + timedelta(hours=7, minutes=30)) is None  # before the first
+        assert template.find(monday + timedelta(days=1, hours=8)) is None  # another weekday
+
+
+class TestWallSeconds:
+    def test_wall_seconds_ignore_timezone(self) -> None:
+        # Given
+        tz = ZoneInfo("America/Argentina/Buenos_Aires")
+        dt = datetime(2024, 4, 1, 8, 30, 15, tzinfo=tz)
+
+        # When
+        seconds = wall_seconds(dt)
+
+        # Then
+        assert seconds == wall_seconds(dt.replace(tzinfo=timezone.utc))
+        assert seconds % (24 * 60 * 60) == 8 * 60 * 60 + 30 * 60 + 15
+        assert from_wall_seconds(seconds, tz) == dt
+        assert from_wall_seconds(seconds, tz).tzinfo is tz
+
+
+class TestOccupancySweep:
+    def setup_method(self) -> None:
+        self.t0 = datetime(2024, 4, 1, tzinfo=timezone.utc)
+
+    def at(self, minutes: int) -> datetime:
+        return self.t0 + timedelta(minutes=minutes)
+
+    def test_count_overlaps(self) -> None:
+        # Given
+        sweep = OccupancySweep(
+            [
+                (self.at(0), self.at(30)),
+                (self.at(0), self.at(45)),  # spans two slots
+                (self.at(60), self.at(90)),
+            ]
+        )
+
+        # When
+        counts = [sweep.count(self.at(m), self.at(m + 30)) for m in (0, 30, 60, 90)]
+
+        # Then
+        assert counts == [2, 1, 1, 0]
+
+    def test_count_skipping_slots(self) -> None:
+        # Given
+        sweep = OccupancySweep([(self.at(0), self.at(30)), (self.at(120), self.at(150))])
+
+        # When, Then
+        assert sweep.count(self.at(120), self.at(150)) == 1
+        assert sweep.count(self.at(150), self.at(180)) == 0
+
+    def test_count_matches_naive_count(self) -> None:
+        # Given
+        rand = Random(42)
+        intervals = []
+        for _ in range(500):
+            minute = rand.randrange(0, 10_000)
+            intervals.append((self.at(minute), self.at(minute + rand.randrange(1, 120))))
+        sweep = OccupancySweep(intervals)
+
+        # When, Then
+        for m in range(0, 10_000, 15):
+            start, end = self.at(m), self.at(m + 15)
+            expected = sum(1 for s, e in intervals if s < end and e > start)
+            assert sweep.count(start, end) == expected
+
+
+class TestSlotTemplateCache:
+    def setup_method(self) -> None:
+        self.cache = SlotTemplateCache(max_size=2)
+
+    def get_service(self) -> Service:
+        return Service(
+            id=uuid4(),
+            owner_id=uuid4(),
+            name="service",
+            appointment_days_in_advance=1,
+            customer_range_km=1,
+            category=ServiceCategory.WALKING,
+            appointment_slots=[get_slots()],
+        )
+
+    def test_template_is_reused(self) -> None:
+        # Given
+        service = self.get_service()
+
+        # When
+        first = self.cache.get(service)
+        second = self.cache.get(service)
+
+        # Then
+        assert first is second
+
+    def test_template_is_recompiled_when_service_is_updated(self) -> None:
+        # Given
+        service = self.get_service()
+        first = self.cache.get(service)
+
+        # When
+        service.appointment_slots = [get_slots(start_time=time(10, 0), end_time=time(11, 0))]
+        service.updated_at = service.updated_at + timedelta(seconds=1)
+        second = self.cache.get(service)
+
+        # Then
+        assert first is not second
+        assert second.for_weekday(0)[0].offsets[0][0] == timedelta(hours=10)
+
+    def test_least_recently_used_template_is_evicted(self) -> None:
+        # Given
+        services = [self.get_service() for _ in range(3)]
+        first = self.cache.get(services[0])
+
+        # When
+        for service in services[1:]:
+            self.cache.get(service)
+
+        # Then
+        assert self.cache.get(services[0]) is not first
+
+
+class TestSlotOccupancy:
+    def get_service(self, *slots: AppointmentSlots) -> Service:
+        return Service(
+            id=uuid4(),
+            owner_id=uuid4(),
+            name="service",
+            appointment_days_in_advance=7,
+            customer_range_km=1,
+            category=ServiceCategory.WALKING,
+            appointment_slots=list(slots),
+        )
+
+    def test_compute_slot_occupancy(self) -> None:
+        # Given
+        service = self.get_service(get_slots(end_time=time(10, 0)))
+        tz = ZoneInfo(service.timezone)
+        monday = datetime(2024, 4, 1, tzinfo=tz)
+
+        # When
+        occupancy = compute_slot_occupancy(
+            service,
+            [
+                (monday + timedelta(hours=8), monday + timedelta(hours=8, minutes=30)),
+                (monday + timedelta(hours=8), monday + timedelta(hours=8, minutes=30)),
+                # Doesn't match the slots, e.g. booked before they were changed
+                (monday + timedelta(hours=8, minutes=15), monday + timedelta(hours=9)),
+            ],
+        )
+
+        # Then
+        assert [(o.service_id, o.slot_start, o.slot_end, o.amount) for o in occupancy] == [
+            (
+                service.id,
+                monday + timedelta(hours=8),
+                monday + timedelta(hours=8, minutes=30),
+                3,
+            ),
+            (
+                service.id,
+                monday + timedelta(hours=8, minutes=30),
+                monday + timedelta(hours=9),
+                1,
+            ),
+        ]
+
+    def test_compute_slot_occupancy_of_slots_started_on_previous_day(self) -> None:
+        # Given
+        service = self.get_service(
+            get_slots(
+                start_day=DayOfWeek.SUNDAY,
+                start_time=time(23, 0),
+                end_day=DayOfWeek.MONDAY,
+                end_time=time(3, 0),
+                duration=timedelta(hours=2),
+            )
+        )
+        monday = datetime(2024, 4, 1, tzinfo=ZoneInfo(service.timezone))
+
+        # When
+        occupancy = compute_slot_occupancy(
+            service, [(monday + timedelta(hours=1), monday + timedelta(hours=3))]
+        )
+
+        # Then
+        assert [(o.slot_start, o.amount) for o in occupancy] == [(monday + timedelta(hours=1), 1)]
+
+    def test_compute_slot_occupancy_without_appointments(self) -> None:
+        assert not compute_slot_occupancy(self.get_service(get_slots()), [])
+
+    def test_slots_layout_ignores_price_and_capacity(self) -> None:
+        # Given
+        slots = get_slots()
+        other_slots = slots.model_copy(
+            update={"appointment_price": Decimal(100), "max_appointments_per_slot": 5}
+        )
+
+        # When, Then
+        assert slots_layout(self.get_service(slots)) == slots_layout(self.get_service(other_slots))
+        assert slots_layout(self.get_service(slots)) != slots_layout(
+            self.get_service(get_slots(start_time=time(7, 30)))
+        )
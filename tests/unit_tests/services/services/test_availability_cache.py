@@ -0,0 +1,158 @@
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+from pydantic import TypeAdapter
+
+from app.models.services import (
+    AppointmentSlots,
+    AvailableAppointment,
+    AvailableAppointmentsForSlots,
+    AvailableAppointmentsList,
+    DayOfWeek,
+)
+from app.services.services.availability_cache import (
+    AvailabilityCache,
+    AvailabilityCacheBackend,
+    MemoryCacheBackend,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+class TestMemoryCacheBackend:
+    def setup_method(self) -> None:
+        self.clock = FakeClock()
+        self.backend = MemoryCacheBackend(max_size=2, ttl=10, clock=self.clock)
+
+    async def test_entries_expire(self) -> None:
+        # Given
+        await self.backend.set("service", "key", b"value")
+
+        # When
+        self.clock.time = 9
+        before_expiration = await self.backend.get("service", "key")
+        self.clock.time = 10
+        after_expiration = await self.backend.get("service", "key")
+
+        # Then
+        assert before_expiration == b"value"
+        assert after_expiration is None
+
+    async def test_least_recently_used_entry_is_evicted(self) -> None:
+        # Given
+        await self.backend.set("service", "first", b"1")
+        await self.backend.set("service", "second", b"2")
+        await self.backend.get("service", "first")
+
+        # When
+        await self.backend.set("other service", "third", b"3")
+
+        # Then
+        assert await self.backend.get("service", "first") == b"1"
+        assert await self.backend.get("service", "second") is None
+        assert await self.backend.get("other service", "third") == b"3"
+
+    async def test_invalidate_only_removes_the_service_entries(self) -> None:
+        # Given
+        await self.backend.set("service", "key", b"1")
+        await self.backend.set("other service", "key", b"2")
+
+        # When
+        await self.backend.invalidate("service")
+
+        # Then
+        assert await self.backend.get("service", "key") is None
+        assert await self.backend.get("other service", "key") == b"2"
+
+
+class TestAvailabilityCache:
+    def setup_method(self) -> None:
+        self.cache = AvailabilityCache(MemoryCacheBackend(max_size=16, ttl=60))
+        self.service_id = uuid4()
+        start = datetime(2024, 4, 1, 8, 0, tzinfo=timezone.utc)
+        self.available = AvailableAppointmentsList(
+            [
+                AvailableAppointmentsForSlots(
+                    slots_configuration=AppointmentSlots(
+                        start_day=DayOfWeek.MONDAY,
+                        start_time=time(8, 0),
+                        end_day=DayOfWeek.MONDAY,
+                        end_time=time(9, 0),
+                        appointment_duration=timedelta(minutes=30),
+                        appointment_price=Decimal(50),
+                        max_appointments_per_slot=2,
+                    ),
+                    available_appointments=[
+                        AvailableAppointment(
+                            start=start, end=start + timedelta(minutes=30), amount=2
+                        )
+                    ],
+                )
+            ]
+        )
+
+    async def test_cached_result_round_trips(self) -> None:
+        # Given
+        after = datetime(2024, 4, 1, tzinfo=timezone.utc)
+        await self.cache.set(self.service_id, after, None, True, self.available)
+
+        # When
+        hit = await self.cache.get(self.service_id, after, None, True)
+        other_range = await self.cache.get(self.service_id, after, None, False)
+
+        # Then
+        adapter = TypeAdapter(list[AvailableAppointmentsForSlots])
+        assert isinstance(hit, AvailableAppointmentsList)
+        assert adapter.dump_python(hit, mode="json") == adapter.dump_python(
+            self.available, mode="json"
+        )
+        assert other_range is None
+        assert self.cache.metrics.hits == 1
+        assert self.cache.metrics.misses == 1
+        assert self.cache.metrics.hit_ratio == 0.5
+
+    async def test_invalidate(self) -> None:
+        # Given
+        await self.cache.set(self.service_id, None, None, True, self.available)
+
+        # When
+        await self.cache.invalidate(self.service_id)
+
+        # Then
+        assert await self.cache.get(self.service_id, None, None, True) is None
+        assert self.cache.metrics.invalidations == 1
+
+    async def test_backend_failures_are_misses(self) -> None:
+        # Given
+        backend = AsyncMock(spec=AvailabilityCacheBackend)
+        backend.get.side_effect = ConnectionError
+        backend.set.side_effect = ConnectionError
+        cache = AvailabilityCache(backend)
+
+        # When
+        await cache.set(self.service_id, None, None, True, self.available)
+        result = await cache.get(self.service_id, None, None, True)
+
+        # Then
+        assert result is None
+        assert cache.metrics.misses == 1
+        assert cache.metrics.errors == 2
+
+    async def test_disabled_cache(self) -> None:
+        # Given
+        cache = AvailabilityCache(None)
+
+        # When
+        await cache.set(self.service_id, None, None, True, self.available)
+
+        # Then
+        assert await cache.get(self.service_id, None, None, True) is None
+        assert cache.metrics.misses == 0
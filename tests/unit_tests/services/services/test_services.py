@@ -1,15 +1,28 @@
-from typing import Any, Generator
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Generator
 from uuid import uuid4
-from unittest.mock import AsyncMock, patch
+from zoneinfo import ZoneInfo
+from unittest.mock import AsyncMock, Mock, call, patch
 
 import pytest
 
 from app.exceptions.services import ServiceNotFound
 from app.exceptions.users import Forbidden
-from app.models.services import Service, AppointmentSlots
+from app.models.payments import OPEN_PAYMENT_STATUSES, PaymentStatus
+from app.models.services import Appointment, AppointmentSlots, DayOfWeek, Service, SlotOccupancy
 from app.models.addresses import Address
-from app.repositories.services import ServicesRepository
+from app.models.util import Coordinates, CountMode
+from app.repositories.base_repository import Page
+from app.repositories.services import (
+    AppointmentsRepository,
+    ServicesRepository,
+    SlotOccupancyRepository,
+)
 from app.services.services import ServicesService
+from app.services.services.availability_cache import AvailabilityCache
+from app.services.spatial_index import SpatialIndex
+from app.services.users import UsersService
 from tests.factories.service_factories import ServiceCreateFactory
 from tests.util import CustomMatcher
 
@@ -32,7 +45,22 @@ class TestServicesService:
         )
 
         self.repository = AsyncMock(spec=ServicesRepository)
-        self.service = ServicesService(self.repository, AsyncMock(), AsyncMock())
+        self.appointments_repo = AsyncMock(spec=AppointmentsRepository)
+        self.occupancy_repo = AsyncMock(spec=SlotOccupancyRepository)
+        self.availability_cache = AsyncMock(spec=AvailabilityCache)
+        self.after_commit: list[Callable[[], Awaitable[None]]] = []
+        self.repository.after_commit.side_effect = self.after_commit.append
+        self.users_service = AsyncMock(spec=UsersService)
+        self.spatial_index = Mock(spec=SpatialIndex)
+        self.service = ServicesService(
+            self.repository,
+            AsyncMock(),
+            self.users_service,
+            self.appointments_repo,
+            self.occupancy_repo,
+            self.availability_cache,
+            self.spatial_index,
+        )
 
     @pytest.fixture
     def mock_get_address(self) -> Generator[AsyncMock, None, None]:
@@ -80,6 +108,9 @@ class TestServicesService:
 
         self.repository.save.assert_called_once_with(CustomMatcher(check_save))
         mock_get_address.assert_called_once_with(self.service_create.address)
+        self.spatial_index.set.assert_called_once_with(
+            self.service_model.id, 0, 0, self.service_model.customer_range_km
+        )
 
     async def test_get_services_should_call_repository_get_all(self) -> None:
         # Given
@@ -103,16 +134,21 @@ class TestServicesService:
         assert fetched_record == self.service_model
         self.repository.get_all.assert_called_once_with(skip=1, limit=1, owner_id=self.owner_id)
 
-    async def test_count_services_should_call_repository_count_all(self) -> None:
+    async def test_get_services_page_should_call_repository_get_page(self) -> None:
         # Given
-        self.repository.count_all = AsyncMock(return_value=1)
+        page = Page([self.service_model], 1)
+        self.repository.get_page = AsyncMock(return_value=page)
 
         # When
-        fetched_record = await self.service.count_services()
+        fetched_page = await self.service.get_services_page(
+            1, 1, count=CountMode.CAPPED, owner_id=self.owner_id
+        )
 
         # Then
-        assert fetched_record == 1
-        self.repository.count_all.assert_called_once_with()
+        assert fetched_page == page
+        self.repository.get_page.assert_called_once_with(
+            1, 1, cursor=None, count=CountMode.CAPPED, owner_id=self.owner_id
+        )
 
     async def test_get_service_by_id_should_call_repository_get_by_id(self) -> None:
         # Given
@@ -163,6 +199,82 @@ class TestServicesService:
             self.service_model.id, CustomMatcher(check_update)
         )
         mock_get_address.assert_called_once_with(self.service_create.address)
+        # The slots didn't change
+        self.occupancy_repo.replace.assert_not_called()
+        self.availability_cache.invalidate.assert_not_called()
+        for callback in self.after_commit:
+            await callback()
+        self.availability_cache.invalidate.assert_called_once_with(self.service_model.id)
+
+    async def test_update_service_slots_should_rebuild_slot_occupancy(
+        self, mock_get_address: AsyncMock
+    ) -> None:
+        # Given
+        tz = ZoneInfo(self.service_model.timezone)
+        today = datetime.now(tz).date() + timedelta(days=1)
+        weekday = DayOfWeek.from_weekday(today.weekday())
+        updated_service = self.service_model.model_copy(
+            update={
+                "appointment_slots": [
+                    AppointmentSlots(
+                        service_id=self.service_model.id,
+                        start_day=weekday,
+                        start_time=time(8, 15),
+                        end_day=weekday,
+                        end_time=time(9, 15),
+                        appointment_duration=timedelta(minutes=30),
+                        appointment_price=Decimal(50),
+                    )
+                ],
+                "updated_at": self.service_model.updated_at + timedelta(seconds=1),
+            }
+        )
+        self.repository.get_by_id = AsyncMock(return_value=self.service_model)
+        self.repository.update = AsyncMock(return_value=updated_service)
+        # Booked with the previous slots, overlaps with both new slots
+        self.appointments_repo.get_all_by_range.return_value = [
+            Appointment(
+                start=datetime.combine(today, time(8, 0), tz),
+                end=datetime.combine(today, time(9, 0), tz),
+                customer_id=uuid4(),
+                customer_address_id=uuid4(),
+                animal_id=uuid4(),
+                price=Decimal(50),
+                payment_status=PaymentStatus.COMPLETED,
+            )
+        ]
+
+        # When
+        await self.service.update_service(self.service_model.id, self.service_create, self.owner_id)
+
+        # Then
+        self.appointments_repo.get_all_by_range.assert_called_once_with(
+            CustomMatcher[datetime](
+                lambda t: datetime.now(timezone.utc) - t < timedelta(seconds=2)
+            ),
+            None,
+            return_partial=True,
+            service_id=self.service_model.id,
+            payment_status=OPEN_PAYMENT_STATUSES,
+        )
+
+        def check_occupancy(occupancy: list[SlotOccupancy]) -> None:
+            assert [(o.slot_start, o.slot_end, o.amount) for o in occupancy] == [
+                (
+                    datetime.combine(today, time(8, 15), tz),
+                    datetime.combine(today, time(8, 45), tz),
+                    1,
+                ),
+                (
+                    datetime.combine(today, time(8, 45), tz),
+                    datetime.combine(today, time(9, 15), tz),
+                    1,
+                ),
+            ]
+
+        self.occupancy_repo.replace.assert_called_once_with(
+            self.service_model.id, CustomMatcher(check_occupancy)
+        )
 
     async def test_cant_update_service_if_not_owner(self) -> None:
         # Given
@@ -199,6 +311,11 @@ class TestServicesService:
 
         # Then
         self.repository.delete.assert_called_once_with(self.service_model.id)
+        self.availability_cache.invalidate.assert_not_called()
+        for callback in self.after_commit:
+            await callback()
+        self.availability_cache.invalidate.assert_called_once_with(self.service_model.id)
+        self.spatial_index.remove.assert_called_once_with(self.service_model.id)
         # self.service.files_service.delete_file.assert_called_once_with(self.service_model.id)
 
     async def test_cant_delete_service_if_not_owner(self) -> None:
@@ -238,3 +355,175 @@ class TestServicesService:
         # Then
         self.repository.delete.assert_called_once_with(self.service_model.id)
         # self.service.files_service.delete_file.assert_called_once_with(self.service_model.id)
+
+    async def test_get_nearby_services_available_in_window(self) -> None:
+        # Given
+        tz = ZoneInfo(self.service_model.timezone)
+        tomorrow = datetime.now(tz).date() + timedelta(days=1)
+        weekday = DayOfWeek.from_weekday(tomorrow.weekday())
+
+        def with_slots(start: time, end: time, max_per_slot: int = 1) -> Service:
+            service_id = uuid4()
+            return self.service_model.model_copy(
+                update={
+                    "id": service_id,
+                    "appointment_days_in_advance": 2,
+                    "appointment_slots": [
+                        AppointmentSlots(
+                            service_id=service_id,
+                            start_day=weekday,
+                            start_time=start,
+                            end_day=weekday,
+                            end_time=end,
+                            appointment_duration=timedelta(minutes=30),
+                            appointment_price=Decimal(50),
+                            max_appointments_per_slot=max_per_slot,
+                        )
+                    ],
+                }
+            )
+
+        morning = with_slots(time(8, 0), time(9, 0))
+        full_morning = with_slots(time(9, 0), time(9, 30))
+        afternoon = with_slots(time(14, 0), time(15, 0))
+        other_morning = with_slots(time(9, 30), time(10, 0))
+        self.users_service.get_user_address_coordinates.return_value = Coordinates(
+            latitude=0, longitude=0
+        )
+        # Only used to narrow down the query
+        self.spatial_index.candidates_with_updates.return_value = [morning.id]
+        self.repository.get_nearby.return_value = [
+            (morning, 1.0),
+            (full_morning, 2.0),
+            (afternoon, 3.0),
+            (other_morning, 4.0),
+        ]
+        self.occupancy_repo.get_all_by_range.return_value = [
+            SlotOccupancy(
+                service_id=full_morning.id,
+                slot_start=datetime.combine(tomorrow, time(9, 0), tz),
+                slot_end=datetime.combine(tomorrow, time(9, 30), tz),
+                amount=1,
+            )
+        ]
+
+        # When
+        services, amount = await self.service.get_nearby_services(
+            "token",
+            1,
+            1,
+            uuid4(),
+            uuid4(),
+            available_after=datetime.combine(tomorrow, time(8, 0), tz),
+            available_before=datetime.combine(tomorrow, time(10, 0), tz),
+            name="name",
+        )
+
+        # Then
+        self.repository.get_nearby.assert_called_once_with(
+            0,
+            0,
+            cursor=None,
+            limit=None,
+            has_appointment_slots=True,
+            name="name",
+            candidate_ids=[morning.id],
+        )
+        self.repository.count_nearby.assert_not_called()
+        self.occupancy_repo.get_all_by_range.assert_called_once()
+        # Only morning and other_morning are available, and the second one is returned
+        assert services == [(other_morning, 4.0)]
+        assert amount == 2
+
+        # When
+        services, amount = await self.service.get_nearby_services(
+            "token",
+            1,
+            0,
+            uuid4(),
+            uuid4(),
+            cursor=(1.0, morning.id),
+            available_after=datetime.combine(tomorrow, time(8, 0), tz),
+            available_before=datetime.combine(tomorrow, time(10, 0), tz),
+        )
+
+        # Then
+        assert services == [(other_morning, 4.0)]
+        assert amount == 2
+
+    async def test_get_nearby_services_available_without_count_stops_early(self) -> None:
+        # Given
+        tz = ZoneInfo(self.service_model.timezone)
+        tomorrow = datetime.now(tz).date() + timedelta(days=1)
+        weekday = DayOfWeek.from_weekday(tomorrow.weekday())
+
+        def with_slots(start: time) -> Service:
+            service_id = uuid4()
+            return self.service_model.model_copy(
+                update={
+                    "id": service_id,
+                    "appointment_days_in_advance": 2,
+                    "appointment_slots": [
+                        AppointmentSlots(
+                            service_id=service_id,
+                            start_day=weekday,
+                            start_time=start,
+                            end_day=weekday,
+                            end_time=time(start.hour, 30),
+                            appointment_duration=timedelta(minutes=30),
+                            appointment_price=Decimal(50),
+                            max_appointments_per_slot=1,
+                        )
+                    ],
+                }
+            )
+
+        available = [with_slots(time(9, 0)) for _ in range(3)]
+        unavailable = with_slots(time(20, 0))
+        self.users_service.get_user_address_coordinates.return_value = Coordinates(
+            latitude=0, longitude=0
+        )
+        self.spatial_index.candidates_with_updates.return_value = None
+        self.repository.get_nearby.side_effect = [
+            [(available[0], 1.0), (unavailable, 2.0)],
+            [(available[1], 3.0), (available[2], 4.0)],
+        ]
+        self.occupancy_repo.get_all_by_range.return_value = []
+
+        # When
+        services, amount = await self.service.get_nearby_services(
+            "token",
+            1,
+            1,
+            uuid4(),
+            uuid4(),
+            count=CountMode.NONE,
+            available_after=datetime.combine(tomorrow, time(8, 0), tz),
+            available_before=datetime.combine(tomorrow, time(10, 0), tz),
+        )
+
+        # Then
+        assert services == [(available[1], 3.0)]
+        assert amount is None
+        # Only the batches needed to find skip + limit available services are checked
+        self.repository.get_nearby.assert_has_calls(
+            [
+                call(
+                    0,
+                    0,
+                    cursor=None,
+                    limit=2,
+                    has_appointment_slots=True,
+                    candidate_ids=None,
+                ),
+                call(
+                    0,
+                    0,
+                    cursor=(2.0, unavailable.id),
+                    limit=2,
+                    has_appointment_slots=True,
+                    candidate_ids=None,
+                ),
+            ]
+        )
+        assert self.repository.get_nearby.call_count == 2
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Any
 from uuid import uuid4
@@ -14,7 +15,8 @@ from app.models.preferences import PaymentType
 from app.models.stores import Store, Purchase, PurchaseItem, Product, ProductRead
 from app.models.payments import PaymentStatus
 from app.models.stores.stores import StoreRead
-from app.models.util import Id
+from app.models.util import CountMode, Id
+from app.repositories.base_repository import Page
 from app.repositories.stores import PurchasesRepository
 from app.services.payments import PaymentsService
 from app.services.stores import ProductsService, PurchasesService
@@ -173,20 +175,18 @@ class TestPurchasesService:
             delivery_address_id=uuid4(),
         )
         self.stores_service.get_store_by_id.return_value = self.store
-        self.repository.get_all.return_value = [purchase]
-        self.repository.count_all.return_value = 1
+        self.repository.get_page.return_value = Page([purchase], 1)
 
         # When
-        purchases, total = await self.service.get_store_purchases(
-            self.store.id, self.store.owner_id, 5, 0
-        )
+        page = await self.service.get_store_purchases(self.store.id, self.store.owner_id, 5, 0)
 
         # Then
-        assert total == 1
-        assert purchases[0] == purchase
+        assert page.total == 1
+        assert page.records[0] == purchase
         self.stores_service.get_store_by_id.assert_called_once_with(self.store.id)
-        self.repository.get_all.assert_called_once_with(store_id=self.store.id, limit=5, skip=0)
-        self.repository.count_all.assert_called_once_with(store_id=self.store.id)
+        self.repository.get_page.assert_called_once_with(
+            0, 5, cursor=None, count=CountMode.EXACT, store_id=self.store.id
+        )
 
     async def test_purchase_no_products_should_raise(self) -> None:
         # Given
@@ -471,3 +471,118 @@ class TestPurchasesService:
         self.users_service.send_notification.assert_called_once_with(
             self.store.owner_id, CustomMatcher(check_notification)
         )
+
+    async def test_update_expired_purchase_to_completed_takes_back_stock(self) -> None:
+        # Given
+        other_product_id = uuid4()
+        purchase = Purchase(
+            store=self.store,
+            id=uuid4(),
+            items=[
+                PurchaseItem(product_id=self.product.id, quantity=1, unit_price=10),  # type: ignore # noqa
+                PurchaseItem(product_id=other_product_id, quantity=2, unit_price=20),  # type: ignore # noqa
+            ],
+            buyer_id=uuid4(),
+            payment_status=PaymentStatus.EXPIRED,
+            delivery_address_id=uuid4(),
+        )
+        self.repository.get_by_id.return_value = purchase
+
+        def update_payment_status(model: Purchase, status: PaymentStatus) -> bool:
+            model.payment_status = status
+            return True
+
+        self.payments_service.update_payment_status.side_effect = update_payment_status
+        self.stores_service.get_stores_read.return_value = [
+            StoreRead(
+                image_url="http://image.url", address=self.store.address, **self.store.model_dump()
+            )
+        ]
+        self.users_service.get_by_id.return_value = {"name": "Buyer"}
+
+        # When
+        await self.service.update_purchase_status(
+            self.store.id, purchase.id, PaymentStatus.COMPLETED
+        )
+
+        # Then
+        assert purchase.payment_status == PaymentStatus.COMPLETED
+        self.products_service.restore_stock.assert_called_once_with(
+            {self.product.id: -1, other_product_id: -2}
+        )
+        self.products_service.update_stock.assert_not_called()
+        self.repository.save.assert_called_once_with(purchase)
+
+    async def test_expire_purchases_should_expire_and_restore_stock(self) -> None:
+        # Given
+        created_before = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        other_product_id = uuid4()
+        purchases = [
+            Purchase(
+                store=self.store,
+                id=uuid4(),
+                items=[
+                    PurchaseItem(product_id=self.product.id, quantity=1, unit_price=10),  # type: ignore # noqa
+                    PurchaseItem(product_id=other_product_id, quantity=2, unit_price=20),  # type: ignore # noqa
+                ],
+                buyer_id=uuid4(),
+                payment_status=PaymentStatus.CREATED,
+                payment_url="http://payment.url",
+                delivery_address_id=uuid4(),
+            ),
+            Purchase(
+                store=self.store,
+                id=uuid4(),
+                items=[PurchaseItem(product_id=self.product.id, quantity=3, unit_price=10)],  # type: ignore # noqa
+                buyer_id=uuid4(),
+                payment_status=PaymentStatus.CREATED,
+                payment_url="http://payment.url",
+                delivery_address_id=uuid4(),
+            ),
+        ]
+        self.repository.get_expired.return_value = purchases
+
+        def expire_payment(model: Purchase) -> None:
+            model.payment_status = PaymentStatus.EXPIRED
+
+        self.payments_service.expire_payment.side_effect = expire_payment
+
+        # When
+        expired = await self.service.expire_purchases(created_before, 10)
+
+        # Then
+        assert expired == purchases
+        self.repository.get_expired.assert_called_once_with(created_before, 10)
+        assert all(p.payment_status == PaymentStatus.EXPIRED for p in purchases)
+        self.repository.save.assert_has_calls([call(p) for p in purchases])
+        self.products_service.restore_stock.assert_called_once_with(
+            {self.product.id: 4, other_product_id: 2}
+        )
+        self.products_service.update_stock.assert_not_called()
+        self.users_service.send_notification.assert_not_called()
+
+    async def test_notify_expired_purchases_notifies_every_purchase(self) -> None:
+        # Given
+        purchases = [
+            Purchase(
+                store=self.store,
+                id=uuid4(),
+                items=[PurchaseItem(product_id=self.product.id, quantity=1, unit_price=10)],  # type: ignore # noqa
+                buyer_id=uuid4(),
+                payment_status=PaymentStatus.EXPIRED,
+                delivery_address_id=uuid4(),
+            )
+            for _ in range(2)
+        ]
+        self.stores_service.get_stores_read.return_value = [
+            StoreRead(
+                image_url="http://image.url", address=self.store.address, **self.store.model_dump()
+            )
+        ]
+        self.users_service.send_notification.side_effect = [Exception("unavailable"), None]
+
+        # When
+        await self.service.notify_expired_purchases(purchases)
+
+        # Then
+        assert self.users_service.send_notification.call_count == 2
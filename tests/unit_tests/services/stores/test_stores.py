@@ -1,6 +1,7 @@
-from typing import Generator
+from datetime import datetime
+from typing import Any, Generator
 from uuid import uuid4
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
@@ -8,7 +9,10 @@ from app.exceptions.stores import StoreAlreadyExists, StoreNotFound
 from app.exceptions.users import Forbidden
 from app.models.stores import Store
 from app.models.addresses import Address
+from app.models.util import CountMode
+from app.repositories.base_repository import Page
 from app.repositories.stores import StoresRepository
+from app.services.spatial_index import SpatialIndex
 from app.services.stores import StoresService
 from tests.factories.store_factories import StoreCreateFactory
 from tests.util import CustomMatcher
@@ -27,7 +31,8 @@ class TestStoresService:
 
         self.async_session = AsyncMock()
         self.repository = AsyncMock(spec=StoresRepository)
-        self.service = StoresService(self.repository)
+        self.spatial_index = Mock(spec=SpatialIndex)
+        self.service = StoresService(self.repository, AsyncMock(), AsyncMock(), self.spatial_index)
 
     @pytest.fixture
     def mock_get_address(self) -> Generator[AsyncMock, None, None]:
@@ -62,6 +67,9 @@ class TestStoresService:
 
         self.repository.save.assert_called_once_with(CustomMatcher(check_save))
         mock_get_address.assert_called_once_with(self.store_create.address)
+        self.spatial_index.set.assert_called_once_with(
+            self.store.id, 0, 0, self.store.delivery_range_km
+        )
 
     async def test_create_store_with_existing_name_should_raise_store_already_exists(self) -> None:
         # Given
@@ -74,32 +82,31 @@ class TestStoresService:
         # Then
         self.repository.get_by_name.assert_called_once_with(self.store_create.name)
 
-    async def test_get_stores_should_call_repository_get_all(self) -> None:
+    async def test_get_stores_page_should_call_repository_get_page(self) -> None:
         # Given
-        self.repository.get_all = AsyncMock(return_value=self.store)
+        page = Page([self.store], 1)
+        self.repository.get_page = AsyncMock(return_value=page)
         # When
-        fetched_record = await self.service.get_stores(1, 1)
+        fetched_page = await self.service.get_stores_page(1, 1)
         # Then
-        assert fetched_record == self.store
-        self.repository.get_all.assert_called_once_with(skip=1, limit=1)
-
-    async def test_get_stores_by_owner_should_call_repository_get_all_with_owner_id(self) -> None:
-        # Given
-        self.repository.get_all = AsyncMock(return_value=self.store)
-        # When
-        fetched_record = await self.service.get_stores(1, 1, owner_id=self.owner_id)
-        # Then
-        assert fetched_record == self.store
-        self.repository.get_all.assert_called_once_with(skip=1, limit=1, owner_id=self.owner_id)
+        assert fetched_page == page
+        self.repository.get_page.assert_called_once_with(1, 1, cursor=None, count=CountMode.EXACT)
 
-    async def test_count_stores_should_call_repository_count_all(self) -> None:
+    async def test_get_stores_page_by_owner_should_call_repository_get_page_with_owner_id(
+        self,
+    ) -> None:
         # Given
-        self.repository.count_all = AsyncMock(return_value=1)
+        page = Page([self.store], 1)
+        self.repository.get_page = AsyncMock(return_value=page)
         # When
-        fetched_record = await self.service.count_stores()
+        fetched_page = await self.service.get_stores_page(
+            1, 1, cursor=["store", self.store.id], count=CountMode.NONE, owner_id=self.owner_id
+        )
         # Then
-        assert fetched_record == 1
-        self.repository.count_all.assert_called_once_with()
+        assert fetched_page == page
+        self.repository.get_page.assert_called_once_with(
+            1, 1, cursor=["store", self.store.id], count=CountMode.NONE, owner_id=self.owner_id
+        )
 
     async def test_get_store_by_id_should_call_repository_get_by_id(self) -> None:
         # Given
@@ -126,8 +133,17 @@ class TestStoresService:
         assert fetched_record == self.store
         expected_update = self.store_create.model_dump(exclude={"address"})
         expected_update["address"] = mock_get_address.return_value
-        self.repository.update.assert_called_once_with("1", expected_update)
+
+        def check_update(update: dict[str, Any]) -> None:
+            # Moved stores are found by other replicas by their update time
+            assert isinstance(update["updated_at"], datetime)
+            assert {k: v for k, v in update.items() if k != "updated_at"} == expected_update
+
+        self.repository.update.assert_called_once_with("1", CustomMatcher(check_update))
         mock_get_address.assert_called_once_with(self.store_create.address)
+        self.spatial_index.set.assert_called_once_with(
+            self.store.id, 0, 0, self.store.delivery_range_km
+        )
 
     async def test_cant_update_store_if_not_owner(self) -> None:
         # Given
@@ -164,6 +180,7 @@ class TestStoresService:
         assert fetched_record is None
         self.repository.delete.assert_called_once_with("1")
         self.service.files_service.delete_file.assert_called_once_with("1")
+        self.spatial_index.remove.assert_called_once_with("1")
 
     async def test_cant_delete_store_if_not_owner(self) -> None:
         # Given
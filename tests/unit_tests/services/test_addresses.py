@@ -41,6 +41,7 @@ class TestAddressesService:
         assert AddressRead(**saved_record.model_dump()) == AddressRead(
             **self.address_create.model_dump(), latitude=lat, longitude=long
         )
+        assert saved_record.geohash == "69y7pk"
 
     async def test_get_invalid_address_should_raise(self, httpx_mock: HTTPXMock) -> None:
         # Given
@@ -0,0 +1,68 @@
+# mypy: disable-error-code="method-assign"
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, call
+
+from httpx import AsyncClient
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.services.expiry import ExpiryClients, ExpirySweeper, build_expiry_services
+from app.services.files import FilesService
+
+
+class TestExpirySweeper:
+    def setup_method(self) -> None:
+        self.clients = ExpiryClients(
+            users=MagicMock(spec=AsyncClient),
+            animals=MagicMock(spec=AsyncClient),
+            stores_images=MagicMock(spec=FilesService),
+            products_images=MagicMock(spec=FilesService),
+            services_images=MagicMock(spec=FilesService),
+        )
+        self.sweeper = ExpirySweeper(
+            timedelta(minutes=60), batch_size=100, interval=300, clients=self.clients
+        )
+        self.expire_batch = AsyncMock()
+        self.sweeper.expire_batch = self.expire_batch
+
+    async def test_sweep_expires_batches_until_incomplete(self) -> None:
+        # Given
+        now = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+        self.expire_batch.side_effect = [(100, 3), (2, 0)]
+
+        # When
+        expired = await self.sweeper.sweep(now)
+
+        # Then
+        assert expired == (102, 3)
+        created_before = datetime(2024, 5, 1, 11, tzinfo=timezone.utc)
+        self.expire_batch.assert_has_calls([call(created_before), call(created_before)])
+
+    async def test_sweep_without_expired_records(self) -> None:
+        # Given
+        self.expire_batch.return_value = (0, 0)
+
+        # When
+        expired = await self.sweeper.sweep()
+
+        # Then
+        assert expired == (0, 0)
+        self.expire_batch.assert_called_once()
+
+    def test_build_expiry_services_share_clients_and_repositories(self) -> None:
+        # Given
+        session = AsyncMock(spec=AsyncSession)
+
+        # When
+        appointments_service, purchases_service = build_expiry_services(session, self.clients)
+
+        # Then
+        services_service = appointments_service.services_service
+        assert appointments_service.occupancy_repo is services_service.occupancy_repo
+        assert appointments_service.appointments_repo is services_service.appointments_repo
+        assert appointments_service.users_service.client is self.clients.users
+        assert appointments_service.animals_service.client is self.clients.animals
+        assert services_service.files_service is self.clients.services_images
+        assert purchases_service.stores_service.files_service is self.clients.stores_images
+        assert purchases_service.products_service.files_service is self.clients.products_images
+        assert purchases_service.products_service.stores_service is purchases_service.stores_service
+        assert purchases_service.purchases_repo.db is session
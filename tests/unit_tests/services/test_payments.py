@@ -1,7 +1,8 @@
 from decimal import Decimal
 from uuid import uuid4
 from unittest.mock import AsyncMock
-from datetime import datetime, timezone, time
+from datetime import datetime, timedelta, timezone, time
+import json
 
 from httpx import URL
 import pytest
@@ -223,6 +224,59 @@ class TestPurchasesService:
 
         assert prev == purchase.model_dump(mode="json")
 
+    async def test_expire_payment_should_remove_url(self) -> None:
+        # Given
+        purchase = Purchase(
+            store=self.store,
+            id=uuid4(),
+            items=[],
+            buyer_id=uuid4(),
+            payment_status=PaymentStatus.CREATED,
+            payment_url="http://payment.url",
+            delivery_address_id=uuid4(),
+        )
+
+        # When
+        self.service.expire_payment(purchase)
+
+        # Then
+        assert purchase.payment_status == PaymentStatus.EXPIRED
+        assert purchase.payment_url is None
+
+    async def test_update_expired_payment_to_completed_should_update(self) -> None:
+        # Given
+        now = datetime.now(timezone.utc)
+        appointment = Appointment(
+            animal_id=uuid4(),
+            start=datetime.combine(now.date(), time(8, 0), now.tzinfo),
+            end=datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            payment_status=PaymentStatus.EXPIRED,
+            customer_id=uuid4(),
+            customer_address_id=uuid4(),
+            price=Decimal(100),
+        )
+
+        # When, Then
+        assert await self.service.update_payment_status(appointment, PaymentStatus.COMPLETED)
+        assert appointment.payment_status == PaymentStatus.COMPLETED
+
+    async def test_update_expired_payment_to_cancelled_should_not_update(self) -> None:
+        # Given
+        now = datetime.now(timezone.utc)
+        appointment = Appointment(
+            animal_id=uuid4(),
+            start=datetime.combine(now.date(), time(8, 0), now.tzinfo),
+            end=datetime.combine(now.date(), time(8, 30), now.tzinfo),
+            payment_status=PaymentStatus.EXPIRED,
+            customer_id=uuid4(),
+            customer_address_id=uuid4(),
+            price=Decimal(100),
+        )
+
+        # When, Then
+        assert not await self.service.update_payment_status(appointment, PaymentStatus.CANCELLED)
+        assert appointment.payment_status == PaymentStatus.EXPIRED
+
     async def test_make_payment_from_self_should_raise(self) -> None:
         # Given
         self.users_service.get_user_address_coordinates.return_value = Coordinates(
@@ -344,3 +398,13 @@ class TestPurchasesService:
 
         # When, Then
         assert payment_url == await self.service.create_preference(data, self.store.owner_id, token)
+
+        request = httpx_mock.get_request()
+        assert request is not None
+        preference_data = json.loads(request.content)["preference_data"]
+        assert preference_data["expires"] is True
+        expiration = datetime.fromisoformat(preference_data["expiration_date_to"])
+        expected = datetime.now(timezone.utc) + timedelta(
+            minutes=settings.PAYMENT_EXPIRATION_MINUTES
+        )
+        assert abs(expiration - expected) < timedelta(minutes=1)
@@ -11,7 +11,8 @@ from app.models.payments import PaymentStatus
 from app.models.stores import Purchase, PurchaseItem
 from app.models.services import ServiceReview, Appointment
 from app.models.stores import StoreReview, ProductReview
-from app.models.util import SortOrder
+from app.models.util import CountMode, SortOrder
+from app.repositories.base_repository import Page
 from app.repositories.reviews import (
     ServiceReviewsRepository,
     StoreReviewsRepository,
@@ -379,19 +380,26 @@ class TestReviewsServices:
             payment_status=PaymentStatus.COMPLETED,
         )
 
-    async def test_get_reviews_should_call_repository_get_all(self) -> None:
+    async def test_get_reviews_should_call_repository_get_page(self) -> None:
         # Given
-        self.repository.get_all = AsyncMock(return_value=[self.review])
+        page = Page([self.review], None)
+        self.repository.get_page = AsyncMock(return_value=page)
 
         # When
-        fetched_record = await self.service.get_reviews(
+        fetched_page = await self.service.get_reviews(
             1, 1, sort_by="created_at", sort_order=SortOrder.DESCENDING, filter_name="filter_value"
         )
 
         # Then
-        assert fetched_record == [self.review]
-        self.repository.get_all.assert_called_once_with(
-            1, 1, "created_at", SortOrder.DESCENDING, filter_name="filter_value"
+        assert fetched_page == page
+        self.repository.get_page.assert_called_once_with(
+            1,
+            1,
+            "created_at",
+            SortOrder.DESCENDING,
+            cursor=None,
+            count=CountMode.NONE,
+            filter_name="filter_value",
         )
 
     async def test_count_and_average_reviews_should_call_repository_count_all(self) -> None:
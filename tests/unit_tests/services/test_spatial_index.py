@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+from app.models.util import Coordinates, Id
+from app.repositories.stores import StoresRepository
+from app.services.spatial_index import MAX_CANDIDATES, SpatialIndex
+
+
+class TestSpatialIndex:
+    def setup_method(self) -> None:
+        self.index = SpatialIndex()
+        self.center = Coordinates(latitude=-34.6, longitude=-58.4)
+
+    def entry(
+        self, north_km: float, east_km: float, range_km: float
+    ) -> tuple[Id, float, float, float]:
+        km_per_deg_long = self.center.KM_PER_DEG_LAT * 0.823  # cos(-34.6°)
+        return (
+            uuid4(),
+            self.center.latitude + north_km / self.center.KM_PER_DEG_LAT,
+            self.center.longitude + east_km / km_per_deg_long,
+            range_km,
+        )
+
+    def candidates(self) -> set[Id]:
+        candidates = self.index.candidates(self.center.latitude, self.center.longitude)
+        assert candidates is not None
+        return set(candidates)
+
+    def test_not_loaded_index_has_no_candidates(self) -> None:
+        # When
+        self.index.set(*self.entry(0, 0, 10))
+
+        # Then
+        assert self.index.candidates(self.center.latitude, self.center.longitude) is None
+
+    def test_candidates_are_in_their_own_range(self) -> None:
+        # Given
+        center, north, corner = self.entry(0, 0, 10), self.entry(5, 0, 10), self.entry(7, -7, 10)
+        out_of_range, far = self.entry(0, 5, 2), self.entry(-30, 0, 20)
+        self.index.load([center, north, corner, out_of_range, far])
+
+        # When
+        candidates = self.candidates()
+
+        # Then
+        assert candidates == {center[0], north[0], corner[0]}
+
+    def test_candidates_with_large_range(self) -> None:
+        # Given
+        far, too_far = self.entry(150, 150, 250), self.entry(300, 0, 250)
+        # The sign of the range is ignored
+        negative = self.entry(-100, 0, -250)
+        self.index.load([self.entry(30, 0, 10), far, too_far, negative])
+
+        # When
+        candidates = self.candidates()
+
+        # Then
+        assert candidates == {far[0], negative[0]}
+
+    def test_set_and_remove_update_the_candidates(self) -> None:
+        # Given
+        moved, removed = self.entry(0, 0, 10), self.entry(1, 1, 10)
+        self.index.load([moved, removed])
+
+        # When
+        _, latitude, longitude, range_km = self.entry(50, 0, 10)
+        self.index.set(moved[0], latitude, longitude, range_km)
+        self.index.remove(removed[0])
+        added = self.entry(2, 2, 5)
+        self.index.set(*added)
+
+        # Then
+        assert self.candidates() == {added[0]}
+
+    async def test_candidates_with_updates_include_updated_records(self) -> None:
+        # Given
+        indexed = self.entry(0, 0, 10)
+        updated_since = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        self.index.load([indexed], updated_since)
+        updated_elsewhere = uuid4()
+        repository = AsyncMock(spec=StoresRepository)
+        repository.get_ids_updated_since.return_value = [updated_elsewhere]
+
+        # When
+        candidates = await self.index.candidates_with_updates(
+            self.center.latitude, self.center.longitude, repository
+        )
+
+        # Then
+        assert candidates == [indexed[0], updated_elsewhere]
+        repository.get_ids_updated_since.assert_called_once_with(updated_since)
+
+    async def test_candidates_with_updates_not_loaded(self) -> None:
+        # Given
+        repository = AsyncMock(spec=StoresRepository)
+
+        # When
+        candidates = await self.index.candidates_with_updates(
+            self.center.latitude, self.center.longitude, repository
+        )
+
+        # Then
+        assert candidates is None
+        repository.get_ids_updated_since.assert_not_called()
+
+    async def test_candidates_with_updates_above_the_cap(self) -> None:
+        # Given
+        updated_since = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        self.index.load([self.entry(0, 0, 10) for _ in range(MAX_CANDIDATES)], updated_since)
+        repository = AsyncMock(spec=StoresRepository)
+        repository.get_ids_updated_since.return_value = [uuid4()]
+
+        # When
+        candidates = await self.index.candidates_with_updates(
+            self.center.latitude, self.center.longitude, repository
+        )
+
+        # Then
+        assert candidates is None